@@ -0,0 +1,88 @@
+import numpy as np
+
+from step_types import Step
+
+# action names by action code, 'nop' is returned when no matching step is left
+ACTIONS = ['place', 'upgrade', 'retarget', 'special', 'sell', 'remove', 'await_round', 'speed', 'click', 'press', 'nop']
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+NOP_STEP: Step = {'action': 'nop', 'cost': 0}
+
+
+class ActionPlan:
+    """
+    The steps of a map config compiled into columns with a cursor pointing at the next step.
+
+    Queries the INGAME loop performs every tick (next non sell step, next costing step, sum of adjacent sells) are precomputed per position, so they don't depend on the number of remaining steps.
+    The steps themselves are kept unchanged and returned by current() and pop(), the list passed in is not modified.
+
+    Args:
+        steps (list[Step]): The steps of a map config (map_config['steps']).
+    """
+
+    def __init__(self, steps: list[Step]):
+        self.steps = steps
+        self.cursor = 0
+        n = len(steps)
+
+        self.action = np.array([ACTION_CODES.get(step['action'], ACTION_CODES['nop']) for step in steps], dtype=np.int8)
+        self.cost = np.array([step.get('cost', 0) for step in steps], dtype=np.int64)
+        self.pos = np.array([step.get('pos', (-1, -1)) for step in steps], dtype=np.int32).reshape(n, 2)
+        self.key = np.empty(n, dtype=object)
+        self.key[:] = [step.get('key') for step in steps]
+        self.round = np.array([step.get('round', -1) for step in steps], dtype=np.int32)
+
+        # index of the next step at or after each position (n if there is none)
+        self.next_non_sell = np.full(n + 1, n, dtype=np.int64)
+        self.next_costing = np.full(n + 1, n, dtype=np.int64)
+        # money gained by selling the monkeys of the consecutive sell steps starting at each position
+        self.adjacent_sells = np.zeros(n + 1, dtype=np.int64)
+        for i in range(n - 1, -1, -1):
+            is_sell = self.action[i] == ACTION_CODES['sell']
+            self.next_non_sell[i] = i if not is_sell and self.action[i] != ACTION_CODES['await_round'] else self.next_non_sell[i + 1]
+            self.next_costing[i] = i if self.cost[i] > 0 else self.next_costing[i + 1]
+            self.adjacent_sells[i] = -self.cost[i] + self.adjacent_sells[i + 1] if is_sell else 0
+
+        # whether a step is performed together with the previous one (retarget, special or click of the same monkey)
+        chainable = {ACTION_CODES['retarget'], ACTION_CODES['special'], ACTION_CODES['click']}
+        self.continues_previous = np.array([i > 0 and self.action[i] in chainable and 'name' in steps[i] and steps[i]['name'] == steps[i - 1].get('name') for i in range(n)], dtype=bool)
+
+    def __len__(self) -> int:
+        """Returns the number of remaining steps."""
+        return len(self.steps) - self.cursor
+
+    def current(self) -> Step:
+        """Returns the next step without consuming it."""
+        return self.steps[self.cursor]
+
+    def current_action(self) -> str:
+        """Returns the action of the next step or 'nop' if no step is left."""
+        return ACTIONS[self.action[self.cursor]] if self.cursor < len(self.steps) else 'nop'
+
+    def pop(self) -> Step:
+        """Consumes and returns the next step."""
+        step = self.steps[self.cursor]
+        self.cursor += 1
+        return step
+
+    def next_continues_current(self) -> bool:
+        """Returns whether the next step is performed together with the step consumed last."""
+        return self.cursor < len(self.steps) and bool(self.continues_previous[self.cursor])
+
+    def clear(self):
+        """Consumes all remaining steps."""
+        self.cursor = len(self.steps)
+
+    def get_next_non_sell_action(self) -> Step:
+        """Returns the first remaining step that is neither a sell nor awaiting a round."""
+        i = self.next_non_sell[self.cursor]
+        return self.steps[i] if i < len(self.steps) else dict(NOP_STEP)
+
+    def get_next_costing_action(self) -> Step:
+        """Returns the first remaining step with a positive cost."""
+        i = self.next_costing[self.cursor]
+        return self.steps[i] if i < len(self.steps) else dict(NOP_STEP)
+
+    def sum_adjacent_sells(self) -> int:
+        """Returns the money gained by the sell steps directly at the cursor."""
+        return int(self.adjacent_sells[self.cursor])
@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+import time
+from os.path import exists
+
+import cv2
+import numpy as np
+
+from ocr import OCR_KERAS_MODEL_FILE, extract_glyphs, get_glyph_atlas_path, load_ocr_model, predictions_to_string
+
+# checks the ocr backends read the same strings as the original keras model and compares their time per ocr area
+# ocr areas are e. g. the "_area.png" files written by ocr_image.py, if an area is named after its value (like for build_glyph_atlas.py) the strings are also checked against it
+# exits with status 1 if any backend reads a different string than keras
+
+argv = sys.argv
+if len(argv) < 3 or not re.fullmatch(r'\d+x\d+', argv[1]):
+    print('Usage: py ' + argv[0] + ' <resolution(e. g. 2560x1440)> <ocr area images (.png)...> [-n <repetitions>]')
+    exit()
+if not exists(OCR_KERAS_MODEL_FILE):
+    print(OCR_KERAS_MODEL_FILE + ' not found!')
+    exit()
+
+resolution = [int(x) for x in argv[1].split('x')]
+
+repetitions = 100
+filenames = argv[2:]
+if '-n' in filenames:
+    i_arg = filenames.index('-n')
+    repetitions = int(filenames[i_arg + 1])
+    filenames = filenames[:i_arg] + filenames[i_arg + 2 :]
+
+backends = ['keras', 'numpy']
+if exists(get_glyph_atlas_path(resolution)):
+    backends.append('template')
+models = {backend: load_ocr_model(backend, resolution) for backend in backends}
+
+totals = dict.fromkeys(backends, 0.0)
+areas = 0
+mismatches = 0
+label_mismatches = 0
+
+for filename in filenames:
+    img = cv2.imread(filename)
+    if img is None:
+        print(f'skipping {filename}: not an image!')
+        continue
+
+    # extract_glyphs blackens pixels in place
+    glyphs = np.array(extract_glyphs(img.copy(), resolution))
+    if not len(glyphs):
+        print(f'skipping {filename}: no glyphs found!')
+        continue
+
+    results = {}
+    for backend, model in models.items():
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            predictions = model.predict(glyphs)
+        totals[backend] += time.perf_counter() - start
+        results[backend] = predictions_to_string(predictions)
+    areas += repetitions
+
+    differing = [backend for backend in backends if results[backend] != results['keras']]
+    if differing:
+        mismatches += 1
+
+    label = re.split(r'[_.]', os.path.basename(filename))[0].replace('-', '/')
+    if re.fullmatch(r'[0-9/]+', label) and label != results['keras']:
+        label_mismatches += 1
+        differing.append(f'label: {label}')
+
+    print(f'{filename}: {results["keras"]}' + (' (' + ', '.join(f'{backend}: {results[backend]}' if backend in results else backend for backend in differing) + ')' if differing else ''))
+
+if areas:
+    for backend, total in totals.items():
+        print(f'{backend}: {total / areas * 1e6:.1f} µs per ocr area')
+    print(f'{mismatches} ocr areas read differently than keras, {label_mismatches} differently than their label')
+
+if mismatches:
+    sys.exit(1)
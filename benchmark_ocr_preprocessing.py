@@ -0,0 +1,133 @@
+import glob
+import os
+import re
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from ocr import extract_glyphs, mask_non_white_pixels
+
+# checks that the vectorized preprocessing of ocr.py (whitening and glyph binarization) gives bit-identical results to the original per pixel loops and compares their time per ocr area
+# the resolution of an ocr area is taken from the start of its filename (e. g. "1920x1080_ingame_money.png"), the default areas are crops of the money and round display of the reference screenshots
+# exits with status 1 if any result differs. doesn't require Keras/TensorFlow
+
+
+def reference_mask_non_white_pixels(img):
+    """Original whitening loop of custom_ocr."""
+    h = img.shape[0]
+    w = img.shape[1]
+
+    white = np.array([255, 255, 255])
+    black = np.array([0, 0, 0])
+
+    for y in range(0, h):
+        for x in range(0, w):
+            if not (img[y][x] == white).all():
+                img[y][x] = black
+
+    return img
+
+
+def reference_extract_glyphs(img, resolution):
+    """Original preprocessing of custom_ocr up to the model input."""
+    reference_mask_non_white_pixels(img)
+
+    gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    thresh_img = cv2.threshold(gray_img, 60, 255, cv2.THRESH_BINARY)[1]
+    contours, _ = cv2.findContours(thresh_img.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    char_images = []
+
+    for contour in contours:
+        min_x = contour[0][0][0]
+        min_y = contour[0][0][1]
+        max_x = contour[0][0][0]
+        max_y = contour[0][0][1]
+
+        for point in contour:
+            if point[0][0] < min_x:
+                min_x = point[0][0]
+            if point[0][0] > max_x:
+                max_x = point[0][0]
+            if point[0][1] < min_y:
+                min_y = point[0][1]
+            if point[0][1] > max_y:
+                max_y = point[0][1]
+
+        char_img = img[min_y:max_y, min_x:max_x]
+
+        if char_img.shape[0] >= 25 * resolution[0] / 2560 and char_img.shape[0] <= 60 * resolution[0] / 2560 and char_img.shape[1] >= 14 * resolution[1] / 1440 and char_img.shape[1] <= 40 * resolution[1] / 1440:
+            char_img = cv2.resize(char_img, (50, 50))
+            char_img = cv2.copyMakeBorder(char_img, 5, 5, 5, 5, cv2.BORDER_CONSTANT, value=(0, 0, 0))
+            char_img = char_img[:, :, 0]
+
+            for y in range(0, 60):
+                for x in range(0, 60):
+                    char_img[y][x] = int(char_img[y][x] / 255)
+
+            char_images.append([min_x, char_img])
+
+    char_images.sort(key=lambda item: item[0])
+    filtered_char_images = []
+    current_x = 0
+
+    for entry in char_images:
+        if current_x + 50 >= entry[0]:
+            current_x = entry[0]
+            filtered_char_images.append(entry)
+
+    return [item[1] for item in filtered_char_images]
+
+
+argv = sys.argv
+if len(argv) > 1 and argv[1] in ['-h', '--help']:
+    print('Usage: py ' + argv[0] + ' [<ocr area images (.png)...>] [-n <repetitions>]')
+    exit()
+
+repetitions = 10
+filenames = argv[1:]
+if '-n' in filenames:
+    i_arg = filenames.index('-n')
+    repetitions = int(filenames[i_arg + 1])
+    filenames = filenames[:i_arg] + filenames[i_arg + 2 :]
+filenames = filenames or sorted(glob.glob('images/ocr_samples/*.png'))
+
+reference_total = 0
+vectorized_total = 0
+areas = 0
+mismatches = 0
+
+for filename in filenames:
+    matches = re.match(r'(\d+)x(\d+)_', os.path.basename(filename))
+    img = cv2.imread(filename)
+    if not matches or img is None:
+        print(f'skipping {filename}: not an image named <resolution>_<name>.png!')
+        continue
+    resolution = (int(matches.group(1)), int(matches.group(2)))
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        reference_glyphs = reference_extract_glyphs(img.copy(), resolution)
+    reference_total += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        glyphs = extract_glyphs(img.copy(), resolution)
+    vectorized_total += time.perf_counter() - start
+    areas += repetitions
+
+    masks_identical = np.array_equal(reference_mask_non_white_pixels(img.copy()), mask_non_white_pixels(img.copy()))
+    glyphs_identical = len(glyphs) == len(reference_glyphs) and all(a.dtype == b.dtype and np.array_equal(a, b) for a, b in zip(glyphs, reference_glyphs))
+    if not masks_identical or not glyphs_identical:
+        mismatches += 1
+    print(f'{filename}: {len(glyphs)} glyphs' + ('' if masks_identical else ', whitened image differs') + ('' if glyphs_identical else f', glyphs differ ({len(reference_glyphs)} glyphs in reference)'))
+
+if areas:
+    print(f'loops: {reference_total / areas * 1000:.2f} ms per ocr area')
+    print(f'vectorized: {vectorized_total / areas * 1000:.2f} ms per ocr area ({reference_total / vectorized_total:.0f}x faster)')
+    print(f'{mismatches} ocr areas preprocessed differently')
+
+if mismatches:
+    sys.exit(1)
@@ -0,0 +1,79 @@
+import sys
+import time
+
+import cv2
+
+from helper import get_image_areas
+from replay import SCREEN_COMPARISONS, Screen, get_resolution_dependent_data
+from utils.image import cut_image
+
+# compares the per tick cost of the screen classifier used by replay.py with matching all reference areas using cv2.matchTemplate
+# screenshots are classified in the given order (so transitions are learned like during a game), each screenshot is classified <repetitions> times in a row
+
+argv = sys.argv
+if len(argv) < 2:
+    print('Usage: py ' + argv[0] + ' <screenshots (.png)...> [-n <repetitions>]')
+    exit()
+
+repetitions = 100
+filenames = argv[1:]
+if '-n' in filenames:
+    i_arg = filenames.index('-n')
+    repetitions = int(filenames[i_arg + 1])
+    filenames = filenames[:i_arg] + filenames[i_arg + 2 :]
+
+rd_data_by_resolution = {}
+legacy_total = 0
+classifier_total = 0
+ticks = 0
+mismatches = 0
+last_screen = Screen.UNKNOWN
+
+for filename in filenames:
+    screenshot = cv2.imread(filename)
+    if screenshot is None:
+        print(f'skipping {filename}: not an image!')
+        continue
+
+    resolution = (screenshot.shape[1], screenshot.shape[0])
+    if resolution not in rd_data_by_resolution:
+        rd_data_by_resolution[resolution] = get_resolution_dependent_data(resolution)
+    rd_data = rd_data_by_resolution[resolution]
+    if not rd_data:
+        print(f'skipping {filename}: unsupported resolution!')
+        continue
+
+    screens = rd_data['comparisonImages']['screens']
+    areas = get_image_areas(resolution)['compare']['screens']
+    classifier = rd_data['screenClassifier']
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        legacy_screen = Screen.UNKNOWN
+        best_match_diff = None
+        for screen, name in SCREEN_COMPARISONS:
+            if name not in screens:
+                continue
+            diff = cv2.matchTemplate(cut_image(screenshot, areas[name]), screens[name], cv2.TM_SQDIFF_NORMED)[0][0]
+            if diff < 0.05 and (best_match_diff is None or diff < best_match_diff):
+                best_match_diff = diff
+                legacy_screen = screen
+    legacy_total += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        last_screen = classifier.classify(screenshot, last_screen, Screen.UNKNOWN)
+    classifier_total += time.perf_counter() - start
+
+    ticks += repetitions
+    if legacy_screen != last_screen:
+        mismatches += 1
+    print(f'{filename}: {legacy_screen.name}' + (f' (classifier: {last_screen.name})' if legacy_screen != last_screen else ''))
+
+if ticks:
+    print(f'matchTemplate: {legacy_total / ticks * 1e6:.1f} µs per tick')
+    print(f'classifier: {classifier_total / ticks * 1e6:.1f} µs per tick')
+    for resolution, rd_data in rd_data_by_resolution.items():
+        if rd_data:
+            print(f'classifier stats for {resolution[0]}x{resolution[1]}: {rd_data["screenClassifier"].stats}')
+    print(f'{mismatches} screenshots classified differently')
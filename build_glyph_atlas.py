@@ -0,0 +1,53 @@
+import os
+import re
+import sys
+
+import cv2
+import numpy as np
+
+from ocr import extract_glyphs, get_glyph_atlas_path
+
+# builds the glyph atlas used by the "template" ocr backend from labelled ocr areas
+# the label is the part of the filename before the first "_" or ".", "/" is written as "-" (e. g. "12345.png", "40-100_round.png")
+
+argv = sys.argv
+if len(argv) < 3 or not re.fullmatch(r'\d+x\d+', argv[1]):
+    print('Usage: py ' + argv[0] + ' <resolution(e. g. 2560x1440)> <labelled ocr area images (.png)...>')
+    exit()
+
+resolution = [int(x) for x in argv[1].split('x')]
+
+glyph_sums = np.zeros((11, 60, 60), dtype=np.float64)
+counts = np.zeros(11, dtype=np.int64)
+
+for filename in argv[2:]:
+    label = re.split(r'[_.]', os.path.basename(filename))[0].replace('-', '/')
+    if not re.fullmatch(r'[0-9/]+', label):
+        print(f'skipping {filename}: no label in filename!')
+        continue
+    img = cv2.imread(filename)
+    if img is None:
+        print(f'skipping {filename}: not an image!')
+        continue
+
+    glyphs = extract_glyphs(img, resolution)
+    if len(glyphs) != len(label):
+        print(f'skipping {filename}: {len(glyphs)} glyphs found but label "{label}" has {len(label)} characters!')
+        continue
+
+    for char, glyph in zip(label, glyphs, strict=True):
+        glyph_class = 10 if char == '/' else int(char)
+        glyph_sums[glyph_class] += glyph
+        counts[glyph_class] += 1
+
+if not counts.any():
+    print('no usable images provided!')
+    exit()
+
+missing = [('/' if i == 10 else str(i)) for i in np.flatnonzero(counts == 0)]
+if missing:
+    print('no samples for: ' + ', '.join(missing) + '! these characters will never be detected')
+
+glyphs = glyph_sums / np.maximum(counts, 1)[:, None, None]
+np.savez(get_glyph_atlas_path(resolution), glyphs=glyphs.astype(np.float32), counts=counts)
+print(f'glyph atlas with {counts.sum()} samples saved as {get_glyph_atlas_path(resolution)}')
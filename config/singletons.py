@@ -10,7 +10,7 @@ from json_types.maps_types import Maps
 from json_types.playthrough_stats_types import PlaythroughStats
 from json_types.towers_types import Towers
 from json_types.userconfig_types import UserConfig
-from utils.utils import create_resolution_string, load_json_file, save_json_file
+from utils.utils import create_resolution_string, get_for_resolution, load_json_file, save_json_file
 
 T = TypeVar('T', bound=BaseModel)
 
@@ -168,15 +168,14 @@ class ImageAreasConfig(BaseConfigSingleton):
         return cast(ImageAreas, super().get_data())
 
     def get_for_resolution(self, resolution=None):
-        """Get image areas for a specific resolution"""
-        areas = self.get_data().model_dump()
-        res_string = create_resolution_string(resolution or pyautogui.size())
+        """Get image areas for a specific resolution, scaled from 2560x1440 if not available"""
+        resolution = resolution or pyautogui.size()
+        areas = self.get_data().root
 
-        if res_string in areas:
-            return areas[res_string]
+        if create_resolution_string(resolution) in areas:
+            return areas[create_resolution_string(resolution)].model_dump()
 
-        # Default to 2560x1440 if not available
-        return areas.get('2560x1440', {})
+        return get_for_resolution(self.__class__._file_path, resolution, model_cls=ImageAreas)
 
 
 class PlaythroughStatsConfig(BaseConfigSingleton):
@@ -0,0 +1,47 @@
+import sys
+from os.path import exists
+
+import cv2
+import numpy as np
+
+from ocr import OCR_KERAS_MODEL_FILE, OCR_NUMPY_MODEL_FILE, KerasOcrModel, extract_glyphs
+from utils.numpy_net import NumpyNet, export_keras_model
+
+# exports btd6_ocr_net.h5 to btd6_ocr_net.npz and checks both backends predict the same digits
+# glyphs are taken from the provided OCR areas (e. g. "_area.png" files written by ocr_image.py) plus a set of random glyphs
+
+argv = sys.argv
+if len(argv) > 1 and argv[1] in ['-h', '--help']:
+    print('Usage: py ' + argv[0] + ' [<ocr area images (.png)...>]')
+    exit()
+if not exists(OCR_KERAS_MODEL_FILE):
+    print(OCR_KERAS_MODEL_FILE + ' not found!')
+    exit()
+
+keras_model = KerasOcrModel()
+export_keras_model(keras_model.model, OCR_NUMPY_MODEL_FILE)
+numpy_model = NumpyNet.load(OCR_NUMPY_MODEL_FILE)
+print(f'exported {OCR_KERAS_MODEL_FILE} to {OCR_NUMPY_MODEL_FILE}')
+
+glyphs = []
+for filename in argv[1:]:
+    img = cv2.imread(filename)
+    if img is None:
+        print(f'skipping {filename}: not an image!')
+        continue
+    glyphs += extract_glyphs(img)
+
+rng = np.random.default_rng(0)
+glyphs += list(rng.integers(0, 2, (100, 60, 60), dtype=np.uint8))
+glyphs = np.array(glyphs)
+
+keras_predictions = keras_model.predict(glyphs)
+numpy_predictions = numpy_model.predict(glyphs)
+
+mismatches = np.flatnonzero(np.argmax(keras_predictions, axis=1) != np.argmax(numpy_predictions, axis=1))
+print(f'compared {len(glyphs)} glyphs, max probability difference: {np.abs(keras_predictions - numpy_predictions).max():.2e}')
+
+if len(mismatches):
+    print(f'{len(mismatches)} glyphs classified differently: {mismatches.tolist()}')
+    sys.exit(1)
+print('both backends predict identical digits!')
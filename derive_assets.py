@@ -0,0 +1,63 @@
+import re
+import sys
+from os.path import exists
+
+import cv2
+import numpy as np
+
+from replay import derive_asset_bundle, get_derived_asset_bundle_path, get_resolution_dependent_data
+from utils.asset_bundle import AssetBundle
+from utils.image import cut_image
+from utils.screen_classifier import sqdiff_normed
+from utils.utils import create_resolution_string
+
+# derives the reference images of a resolution from the master resolutions (replay.py does this automatically on first start)
+# self-test: derived comparison images are compared to the captured reference images of the resolution (if there are any) and to the provided screenshots
+
+argv = sys.argv
+if len(argv) < 2 or not re.fullmatch(r'\d+x\d+', argv[1]):
+    print('Usage: py ' + argv[0] + ' <resolution(e. g. 3440x1440)> [<screenshots of that resolution (.png)...>]')
+    exit()
+
+resolution = tuple(int(x) for x in argv[1].split('x'))
+# maximum difference accepted by the screen recognition
+tolerance = 0.05
+
+bundle_path = get_derived_asset_bundle_path(resolution)
+print(f'{derive_asset_bundle(resolution, bundle_path)} images derived into {bundle_path}')
+bundle = AssetBundle(bundle_path)
+
+
+def get_diff(crop: np.ndarray, key: str) -> float:
+    """Difference between a crop and a derived comparison image as computed by the screen recognition."""
+    derived = bundle.get(key).astype(np.float32)
+    if crop.shape != derived.shape:
+        return 1.0
+    return sqdiff_normed(crop.astype(np.float32), derived, float(np.vdot(derived, derived)))
+
+
+failed = False
+
+captured = get_resolution_dependent_data(resolution, use_asset_bundle=False) if exists(f'images/{create_resolution_string(resolution)}/') else None
+if captured:
+    print('comparing with captured reference images:')
+    for key in bundle.keys('compare/'):
+        category, name = key.split('/')[1:]
+        if name in captured['comparisonImages'].get(category, {}):
+            diff = get_diff(captured['comparisonImages'][category][name], key)
+            print(f'{name}: {diff:.4f}' + (' FAILED' if diff >= tolerance else ''))
+            failed |= diff >= tolerance
+
+for filename in argv[2:]:
+    screenshot = cv2.imread(filename)
+    if screenshot is None or (screenshot.shape[1], screenshot.shape[0]) != resolution:
+        print(f'skipping {filename}: not an image of resolution {argv[1]}!')
+        continue
+    diffs = {key.removeprefix('compare/screens/'): get_diff(cut_image(screenshot, tuple(bundle.get_metadata(key)['area'])), key) for key in bundle.keys('compare/screens/')}
+    best = min(diffs, key=diffs.get)
+    print(f'{filename}: best match {best} ({diffs[best]:.4f})' + (' FAILED' if diffs[best] >= tolerance else ''))
+    failed |= diffs[best] >= tolerance
+
+if failed:
+    print(f'derived images differ by {tolerance} or more from captured ones!')
+    sys.exit(1)
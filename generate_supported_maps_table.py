@@ -9,7 +9,7 @@ from helper import (
     get_monkey_upgrade_requirements,
     maps,
     monkey_upgrades_to_string,
-    playthrough_stats,
+    stats_store,
 )
 from instructions_file_manager import parse_btd6_instructions_file
 
@@ -110,40 +110,8 @@ for category in maps_by_category:
                     for extra_comment in extra_comments[playthrough['filename']]:
                         description += ', ' + extra_comment
 
-                description += (
-                    ', native: '
-                    + playthrough['fileConfig']['resolution']
-                    + (
-                        ', tested for: '
-                        + ', '.join(
-                            filter(
-                                lambda x: type(
-                                    playthrough_stats[playthrough['filename']][x],
-                                )
-                                is dict
-                                and 'validation_result' in playthrough_stats[playthrough['filename']][x]
-                                and playthrough_stats[playthrough['filename']][x]['validation_result'] == True,
-                                playthrough_stats[playthrough['filename']].keys(),
-                            ),
-                        )
-                        if playthrough['filename'] in playthrough_stats
-                        and len(playthrough_stats[playthrough['filename']].keys())
-                        and len(
-                            list(
-                                filter(
-                                    lambda x: type(
-                                        playthrough_stats[playthrough['filename']][x],
-                                    )
-                                    is dict
-                                    and 'validation_result' in playthrough_stats[playthrough['filename']][x]
-                                    and playthrough_stats[playthrough['filename']][x]['validation_result'] == True,
-                                    playthrough_stats[playthrough['filename']].keys(),
-                                ),
-                            ),
-                        )
-                        else ''
-                    )
-                )
+                validated_resolutions = stats_store.get_validated_resolutions(playthrough['filename'])
+                description += ', native: ' + playthrough['fileConfig']['resolution'] + (', tested for: ' + ', '.join(validated_resolutions) if validated_resolutions else '')
 
                 title = ''
                 monkey_upgrade_requirements = get_monkey_upgrade_requirements(
@@ -1,8 +1,14 @@
 import copy
+import hashlib
+import io
 import json
 import math
 import os
+import pickle
 import re
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import redirect_stdout, suppress
 from enum import Enum
 from os.path import exists
 
@@ -11,9 +17,13 @@ import pyautogui
 from ahk import AHK
 
 from consts import SANDBOX_GAMEMODES
+from json_types.image_areas_types import ImageAreas
+from step_types import Step, map_config_from_dataclasses, map_config_to_dataclasses
+from utils.stats_journal import StatsJournal
+from utils.stats_store import StatsStore
 
 # from instructions_file_manager import parse_btd6_instruction_file_name, parse_btd6_instructions_file # TODO: temporarily moved back here
-from utils.utils import create_resolution_string, custom_print, load_json_file, save_json_file, scale_string_coordinate_pairs, tuple_to_str
+from utils.utils import create_resolution_string, custom_print, get_for_resolution, load_json_file, save_json_file, scale_string_coordinate_pairs, tuple_to_str
 
 # TODO: fix circular imports!!
 
@@ -80,7 +90,8 @@ def write_btd6_instructions_file(this_config, folder='own_playthroughs', resolut
                 fp.write('round ' + str(action['round']) + '\n')
 
 
-def parse_btd6_instructions_file(filename, target_resolution=pyautogui.size(), gamemode=None):
+def create_btd6_map_config(filename, target_resolution=pyautogui.size(), gamemode=None):
+    """Returns the map config of a playthrough file without steps of the file (see iter_btd6_steps) or None if the file can't be used."""
     file_config = parse_btd6_instruction_file_name(filename)
 
     if not file_config:
@@ -102,23 +113,9 @@ def parse_btd6_instructions_file(filename, target_resolution=pyautogui.size(), g
         print('unknown file: ' + str(filename))
         return None
 
-    with open(filename, 'r') as fp:
-        raw_input_file = fp.read()
-
     if not target_resolution and file_config['resolution'] != create_resolution_string():
         custom_print('tried parsing playthrough for non native resolution with rescaling disabled!')
         return None
-    elif file_config['resolution'] != create_resolution_string(target_resolution):
-        # customPrint("rescaling " + filename + " from " + fileConfig['resolution'] + " to " + getResolutionString(targetResolution))
-        raw_input_file = scale_string_coordinate_pairs(
-            raw_input_file,
-            [int(x) for x in file_config['resolution'].split('x')],
-            target_resolution,
-        )
-
-    config_lines = raw_input_file.splitlines()
-
-    monkeys = {}
 
     new_map_config = {
         'category': maps[map_name]['category'],
@@ -130,6 +127,7 @@ def parse_btd6_instructions_file(filename, target_resolution=pyautogui.size(), g
         'steps': [],
         'extrainstructions': 0,
         'filename': filename,
+        'monkeys': {},
     }
 
     if gamemode == 'deflation' or gamemode == 'half_cash' or gamemode == 'impoppable' or gamemode == 'chimps' or gamemode in SANDBOX_GAMEMODES:
@@ -142,234 +140,394 @@ def parse_btd6_instructions_file(filename, target_resolution=pyautogui.size(), g
         )
         new_map_config['extrainstructions'] = 1
 
-    for line in config_lines:
-        matches = re.search(
-            r'^(?P<action>place|upgrade|retarget|special|sell|remove|round|speed) ?(?P<type>[a-z_]+)? (?P<name>\w+)(?: (?:(?:at|to) (?P<x>\d+), (?P<y>\d+))?(?:path (?P<path>[0-2]))?)?(?: for (?P<price>\d+|\?\?\?))?(?: with (?P<discount>\d{1,2}|100)% discount)?$',
-            line,
-        )
-        if not matches:
-            continue
+    return new_map_config
 
-        new_step = None
-        new_steps = []
 
-        if matches.group('action') == 'place':
-            if monkeys.get(matches.group('name')):
-                print(filename + ': monkey ' + matches.group('name') + ' placed twice! skipping!')
+INSTRUCTION_PATTERN = re.compile(
+    r'^(?P<action>place|upgrade|retarget|special|sell|remove|round|speed) ?(?P<type>[a-z_]+)? (?P<name>\w+)(?: (?:(?:at|to) (?P<x>\d+), (?P<y>\d+))?(?:path (?P<path>[0-2]))?)?(?: for (?P<price>\d+|\?\?\?))?(?: with (?P<discount>\d{1,2}|100)% discount)?$',
+)
+
+
+def iter_btd6_steps(filename, target_resolution=pyautogui.size(), gamemode=None, map_config=None) -> Iterator[Step]:
+    """
+    Reads a playthrough file line by line and yields its steps, coordinates are rescaled to the target resolution per line.
+
+    Only the placed monkeys are kept, so files of any length are parsed in constant memory and callers may stop early.
+
+    Args:
+        filename (str): The playthrough file.
+        target_resolution (tuple[int, int], optional): The resolution to rescale coordinates to.
+        gamemode (str | None, optional): The gamemode to calculate prices for, defaults to the gamemode of the file.
+        map_config (dict | None, optional): The map config created by create_btd6_map_config, its 'monkeys' (and 'hero') are updated while reading. Created if not provided.
+    """
+    if map_config is None:
+        map_config = create_btd6_map_config(filename, target_resolution, gamemode)
+        if map_config is None:
+            return
+    gamemode = map_config['gamemode']
+    monkeys = map_config['monkeys']
+
+    file_config = parse_btd6_instruction_file_name(filename)
+    native_resolution = (int(file_config['resolution_x']), int(file_config['resolution_y']))
+    scale_resolution = target_resolution if target_resolution and tuple(target_resolution) != native_resolution else None
+
+    with open(filename, 'r') as fp:
+        for line in fp:
+            line = line.rstrip('\n')
+            matches = INSTRUCTION_PATTERN.search(line)
+            if not matches:
                 continue
-            if matches.group('type') in towers['monkeys']:
+
+            pos = None
+            if matches.group('x'):
+                pos = (int(matches.group('x')), int(matches.group('y')))
+                if scale_resolution:
+                    pos = (round(pos[0] * scale_resolution[0] / native_resolution[0]), round(pos[1] * scale_resolution[1] / native_resolution[1]))
+
+            new_step = None
+            new_steps = []
+
+            if matches.group('action') == 'place':
+                if monkeys.get(matches.group('name')):
+                    print(filename + ': monkey ' + matches.group('name') + ' placed twice! skipping!')
+                    continue
+                if matches.group('type') in towers['monkeys']:
+                    new_step = {
+                        'action': 'place',
+                        'type': matches.group('type'),
+                        'name': matches.group('name'),
+                        'key': keybinds['monkeys'][matches.group('type')],
+                        'pos': pos,
+                        'cost': calculate_adjusted_price(
+                            towers['monkeys'][matches.group('type')]['base'],
+                            map_config['difficulty'],
+                            gamemode,
+                            {'action': 'place'},
+                            {
+                                'type': matches.group('type'),
+                                'name': matches.group('name'),
+                                'upgrades': [0, 0, 0],
+                            },
+                            matches.group('discount'),
+                        ),
+                    }
+                    if matches.group('discount'):
+                        new_step['discount'] = matches.group('discount')
+                    monkeys[matches.group('name')] = {
+                        'type': matches.group('type'),
+                        'name': matches.group('name'),
+                        'upgrades': [0, 0, 0],
+                        'pos': pos,
+                        'value': calculate_adjusted_price(
+                            towers['monkeys'][matches.group('type')]['base'],
+                            map_config['difficulty'],
+                            gamemode,
+                            {'action': 'place'},
+                            {
+                                'type': matches.group('type'),
+                                'name': matches.group('name'),
+                                'upgrades': [0, 0, 0],
+                            },
+                            matches.group('discount'),
+                        ),
+                    }
+                    new_steps.append(new_step)
+                elif matches.group('type') in towers['heroes']:
+                    new_step = {
+                        'action': 'place',
+                        'type': 'hero',
+                        'name': matches.group('name'),
+                        'key': keybinds['monkeys']['hero'],
+                        'pos': pos,
+                        'cost': calculate_adjusted_price(
+                            towers['heroes'][matches.group('type')]['base'],
+                            map_config['difficulty'],
+                            gamemode,
+                            {'action': 'place'},
+                            {
+                                'type': 'hero',
+                                'name': matches.group('name'),
+                                'upgrades': [0, 0, 0],
+                            },
+                            matches.group('discount'),
+                        ),
+                    }
+                    if matches.group('discount'):
+                        new_step['discount'] = matches.group('discount')
+                    map_config['hero'] = matches.group('type')
+                    monkeys[matches.group('name')] = {
+                        'type': 'hero',
+                        'name': matches.group('name'),
+                        'upgrades': [0, 0, 0],
+                        'pos': pos,
+                        'value': calculate_adjusted_price(
+                            towers['heroes'][matches.group('type')]['base'],
+                            map_config['difficulty'],
+                            gamemode,
+                            {'action': 'place'},
+                            {
+                                'type': 'hero',
+                                'name': matches.group('name'),
+                                'upgrades': [0, 0, 0],
+                            },
+                            matches.group('discount'),
+                        ),
+                    }
+                    new_steps.append(new_step)
+                else:
+                    print(filename + ': monkey/hero ' + matches.group('name') + ' has unknown type: ' + matches.group('type') + '! skipping!')
+                    continue
+            elif matches.group('action') == 'upgrade':
+                if not monkeys.get(matches.group('name')):
+                    print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
+                    continue
+                if monkeys[matches.group('name')]['type'] == 'hero':
+                    print(filename + ': tried to upgrade hero ' + matches.group('name') + '! skipping instruction!')
+                    continue
+                monkey_upgrades = monkeys[matches.group('name')]['upgrades']
+                monkey_upgrades[int(matches.group('path'))] += 1
+                if sum(map(lambda x: x > 2, monkey_upgrades)) > 1 or sum(map(lambda x: x > 0, monkey_upgrades)) > 2 or monkey_upgrades[int(matches.group('path'))] > 5:
+                    print(filename + ': monkey ' + matches.group('name') + ' has invalid upgrade path! skipping!')
+                    monkey_upgrades[int(matches.group('path'))] -= 1
+                    continue
                 new_step = {
-                    'action': 'place',
-                    'type': matches.group('type'),
+                    'action': 'upgrade',
                     'name': matches.group('name'),
-                    'key': keybinds['monkeys'][matches.group('type')],
-                    'pos': (int(matches.group('x')), int(matches.group('y'))),
+                    'key': keybinds['path'][str(matches.group('path'))],
+                    'pos': monkeys[matches.group('name')]['pos'],
+                    'path': int(matches.group('path')),
                     'cost': calculate_adjusted_price(
-                        towers['monkeys'][matches.group('type')]['base'],
-                        new_map_config['difficulty'],
+                        towers['monkeys'][monkeys[matches.group('name')]['type']]['upgrades'][int(matches.group('path'))][monkey_upgrades[int(matches.group('path'))] - 1],
+                        map_config['difficulty'],
                         gamemode,
-                        {'action': 'place'},
-                        {
-                            'type': matches.group('type'),
-                            'name': matches.group('name'),
-                            'upgrades': [0, 0, 0],
-                        },
+                        {'action': 'upgrade', 'path': int(matches.group('path'))},
+                        monkeys[matches.group('name')],
                         matches.group('discount'),
                     ),
                 }
                 if matches.group('discount'):
                     new_step['discount'] = matches.group('discount')
-                monkeys[matches.group('name')] = {
-                    'type': matches.group('type'),
-                    'name': matches.group('name'),
-                    'upgrades': [0, 0, 0],
-                    'pos': (int(matches.group('x')), int(matches.group('y'))),
-                    'value': calculate_adjusted_price(
-                        towers['monkeys'][matches.group('type')]['base'],
-                        new_map_config['difficulty'],
-                        gamemode,
-                        {'action': 'place'},
+                monkeys[matches.group('name')]['value'] += calculate_adjusted_price(
+                    towers['monkeys'][monkeys[matches.group('name')]['type']]['upgrades'][int(matches.group('path'))][monkey_upgrades[int(matches.group('path'))] - 1],
+                    map_config['difficulty'],
+                    gamemode,
+                    {'action': 'upgrade', 'path': int(matches.group('path'))},
+                    monkeys[matches.group('name')],
+                    matches.group('discount'),
+                )
+                new_steps.append(new_step)
+                if upgrade_requires_confirmation(monkeys[matches.group('name')], int(matches.group('path'))):
+                    new_steps.append(
                         {
-                            'type': matches.group('type'),
+                            'action': 'click',
                             'name': matches.group('name'),
-                            'upgrades': [0, 0, 0],
+                            'pos': image_areas['click']['paragon_message_confirmation'],
+                            'cost': 0,
                         },
-                        matches.group('discount'),
-                    ),
+                    )
+            elif matches.group('action') == 'retarget':
+                if not monkeys.get(matches.group('name')):
+                    print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
+                    continue
+                new_step = {
+                    'action': 'retarget',
+                    'name': matches.group('name'),
+                    'key': keybinds['others']['retarget'],
+                    'pos': monkeys[matches.group('name')]['pos'],
+                    'cost': 0,
                 }
+                if matches.group('x'):
+                    new_step['to'] = pos
+                elif monkeys[matches.group('name')]['type'] == 'mortar':
+                    print('mortar can only be retargeted to a position! skipping!')
+                    continue
                 new_steps.append(new_step)
-            elif matches.group('type') in towers['heroes']:
+            elif matches.group('action') == 'special':
+                if not monkeys.get(matches.group('name')):
+                    print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
+                    continue
                 new_step = {
-                    'action': 'place',
-                    'type': 'hero',
+                    'action': 'special',
                     'name': matches.group('name'),
-                    'key': keybinds['monkeys']['hero'],
-                    'pos': (int(matches.group('x')), int(matches.group('y'))),
-                    'cost': calculate_adjusted_price(
-                        towers['heroes'][matches.group('type')]['base'],
-                        new_map_config['difficulty'],
-                        gamemode,
-                        {'action': 'place'},
-                        {
-                            'type': 'hero',
-                            'name': matches.group('name'),
-                            'upgrades': [0, 0, 0],
-                        },
-                        matches.group('discount'),
-                    ),
+                    'key': keybinds['others']['special'],
+                    'pos': monkeys[matches.group('name')]['pos'],
+                    'cost': 0,
                 }
-                if matches.group('discount'):
-                    new_step['discount'] = matches.group('discount')
-                new_map_config['hero'] = matches.group('type')
-                monkeys[matches.group('name')] = {
-                    'type': 'hero',
+                new_steps.append(new_step)
+            elif matches.group('action') == 'sell':
+                if not monkeys.get(matches.group('name')):
+                    print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
+                    continue
+                new_step = {
+                    'action': 'sell',
                     'name': matches.group('name'),
-                    'upgrades': [0, 0, 0],
-                    'pos': (int(matches.group('x')), int(matches.group('y'))),
-                    'value': calculate_adjusted_price(
-                        towers['heroes'][matches.group('type')]['base'],
-                        new_map_config['difficulty'],
-                        gamemode,
-                        {'action': 'place'},
-                        {
-                            'type': 'hero',
-                            'name': matches.group('name'),
-                            'upgrades': [0, 0, 0],
-                        },
-                        matches.group('discount'),
-                    ),
+                    'key': keybinds['others']['sell'],
+                    'pos': monkeys[matches.group('name')]['pos'],
+                    'cost': -get_monkey_sell_value(monkeys[matches.group('name')]['value']),
                 }
                 new_steps.append(new_step)
-            else:
-                print(filename + ': monkey/hero ' + matches.group('name') + ' has unknown type: ' + matches.group('type') + '! skipping!')
-                continue
-        elif matches.group('action') == 'upgrade':
-            if not monkeys.get(matches.group('name')):
-                print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
-                continue
-            if monkeys[matches.group('name')]['type'] == 'hero':
-                print(filename + ': tried to upgrade hero ' + matches.group('name') + '! skipping instruction!')
-                continue
-            monkey_upgrades = monkeys[matches.group('name')]['upgrades']
-            monkey_upgrades[int(matches.group('path'))] += 1
-            if sum(map(lambda x: x > 2, monkey_upgrades)) > 1 or sum(map(lambda x: x > 0, monkey_upgrades)) > 2 or monkey_upgrades[int(matches.group('path'))] > 5:
-                print(filename + ': monkey ' + matches.group('name') + ' has invalid upgrade path! skipping!')
-                monkey_upgrades[int(matches.group('path'))] -= 1
-                continue
-            new_step = {
-                'action': 'upgrade',
-                'name': matches.group('name'),
-                'key': keybinds['path'][str(matches.group('path'))],
-                'pos': monkeys[matches.group('name')]['pos'],
-                'path': int(matches.group('path')),
-                'cost': calculate_adjusted_price(
-                    towers['monkeys'][monkeys[matches.group('name')]['type']]['upgrades'][int(matches.group('path'))][monkey_upgrades[int(matches.group('path'))] - 1],
-                    new_map_config['difficulty'],
-                    gamemode,
-                    {'action': 'upgrade', 'path': int(matches.group('path'))},
-                    monkeys[matches.group('name')],
-                    matches.group('discount'),
-                ),
-            }
-            if matches.group('discount'):
-                new_step['discount'] = matches.group('discount')
-            monkeys[matches.group('name')]['value'] += calculate_adjusted_price(
-                towers['monkeys'][monkeys[matches.group('name')]['type']]['upgrades'][int(matches.group('path'))][monkey_upgrades[int(matches.group('path'))] - 1],
-                new_map_config['difficulty'],
-                gamemode,
-                {'action': 'upgrade', 'path': int(matches.group('path'))},
-                monkeys[matches.group('name')],
-                matches.group('discount'),
-            )
-            new_steps.append(new_step)
-            if upgrade_requires_confirmation(monkeys[matches.group('name')], int(matches.group('path'))):
-                new_steps.append(
-                    {
-                        'action': 'click',
-                        'name': matches.group('name'),
-                        'pos': image_areas['click']['paragon_message_confirmation'],
-                        'cost': 0,
-                    },
-                )
-        elif matches.group('action') == 'retarget':
-            if not monkeys.get(matches.group('name')):
-                print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
-                continue
-            new_step = {
-                'action': 'retarget',
-                'name': matches.group('name'),
-                'key': keybinds['others']['retarget'],
-                'pos': monkeys[matches.group('name')]['pos'],
-                'cost': 0,
-            }
-            if matches.group('x'):
-                new_step['to'] = (int(matches.group('x')), int(matches.group('y')))
-            elif monkeys[matches.group('name')]['type'] == 'mortar':
-                print('mortar can only be retargeted to a position! skipping!')
-                continue
-            new_steps.append(new_step)
-        elif matches.group('action') == 'special':
-            if not monkeys.get(matches.group('name')):
-                print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
-                continue
-            new_step = {
-                'action': 'special',
-                'name': matches.group('name'),
-                'key': keybinds['others']['special'],
-                'pos': monkeys[matches.group('name')]['pos'],
-                'cost': 0,
-            }
-            new_steps.append(new_step)
-        elif matches.group('action') == 'sell':
-            if not monkeys.get(matches.group('name')):
-                print(filename + ': monkey ' + matches.group('name') + ' unplaced! skipping!')
-                continue
-            new_step = {
-                'action': 'sell',
-                'name': matches.group('name'),
-                'key': keybinds['others']['sell'],
-                'pos': monkeys[matches.group('name')]['pos'],
-                'cost': -get_monkey_sell_value(monkeys[matches.group('name')]['value']),
-            }
-            new_steps.append(new_step)
-        elif matches.group('action') == 'remove':
-            if matches.group('price') == '???':
-                print('remove obstacle without price specified: ' + line)
-                continue
-            new_step = {
-                'action': 'remove',
-                'pos': (int(matches.group('x')), int(matches.group('y'))),
-                'cost': int(matches.group('price')),
-            }
-            new_steps.append(new_step)
-        elif matches.group('action') == 'round':
-            try:
-                if int(matches.group('name')) < 1:
-                    print(f'Invalid round {matches.group("name")}, skipping!')
+            elif matches.group('action') == 'remove':
+                if matches.group('price') == '???':
+                    print('remove obstacle without price specified: ' + line)
                     continue
-            except ValueError:
-                print(f'NaN round {matches.group("name")}, skipping!')
-            new_step = {
-                'action': 'await_round',
-                'round': int(matches.group('name')),
-                'cost': 0,
-            }
-            new_steps.append(new_step)
-        elif matches.group('action') == 'speed':
-            new_step = {
-                'action': 'speed',
-                'speed': matches.group('name'),
-                'cost': 0,
-            }
-            new_steps.append(new_step)
+                new_step = {
+                    'action': 'remove',
+                    'pos': pos,
+                    'cost': int(matches.group('price')),
+                }
+                new_steps.append(new_step)
+            elif matches.group('action') == 'round':
+                try:
+                    if int(matches.group('name')) < 1:
+                        print(f'Invalid round {matches.group("name")}, skipping!')
+                        continue
+                except ValueError:
+                    print(f'NaN round {matches.group("name")}, skipping!')
+                new_step = {
+                    'action': 'await_round',
+                    'round': int(matches.group('name')),
+                    'cost': 0,
+                }
+                new_steps.append(new_step)
+            elif matches.group('action') == 'speed':
+                new_step = {
+                    'action': 'speed',
+                    'speed': matches.group('name'),
+                    'cost': 0,
+                }
+                new_steps.append(new_step)
+
+            yield from new_steps
 
-        if len(new_steps):
-            new_map_config['steps'] += new_steps
 
-    new_map_config['monkeys'] = monkeys
+def parse_btd6_instructions_file(filename, target_resolution=pyautogui.size(), gamemode=None):
+    new_map_config = create_btd6_map_config(filename, target_resolution, gamemode)
+    if new_map_config is None:
+        return None
+
+    new_map_config['steps'] += iter_btd6_steps(filename, target_resolution, gamemode, new_map_config)
     return new_map_config
 
 
+COMPILED_PLAYTHROUGHS_DIR = 'cache/playthroughs'
+COMPILED_PLAYTHROUGHS_MAX_SIZE = 256
+# increase when changing the format of the stored map configs
+COMPILED_PLAYTHROUGHS_VERSION = 3
+compiled_playthroughs = OrderedDict()
+compiled_playthroughs_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+_config_fingerprint = None
+
+
+def get_config_fingerprint() -> str:
+    """Returns a hash of the configuration parse_btd6_instructions_file depends on besides the file itself."""
+    global _config_fingerprint
+    if _config_fingerprint is None:
+        config = [version, maps, gamemodes, SANDBOX_GAMEMODES, keybinds, towers, image_areas['click']]
+        _config_fingerprint = hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=16).hexdigest()
+    return _config_fingerprint
+
+
+def get_monkey_knowledge_state() -> list[str] | None:
+    """Returns the names of the monkey knowledge considered for prices or None if monkey knowledge is disabled."""
+    return sorted(name for name, enabled in user_config.get('monkey_knowledge', {}).items() if enabled) if is_monkey_knowledge_enabled else None
+
+
+def get_compiled_playthrough_prefix(filename: str) -> str:
+    return hashlib.blake2b(filename.encode(), digest_size=8).hexdigest() + '-'
+
+
+def get_compiled_playthrough_key(filename: str, target_resolution=pyautogui.size(), gamemode=None) -> str | None:
+    """
+    Returns the key of the compiled map config of a playthrough file or None if the file doesn't exist.
+
+    The key covers the name and content of the file, the target resolution, the gamemode, the monkey knowledge state (monkey knowledge changes prices) and the configuration files.
+    It consists of hashes of the name, the content and everything else, so the stored map configs of a file can be pruned by prefix.
+    """
+    if not exists(filename):
+        return None
+
+    with open(filename, 'rb') as fp:
+        content_digest = hashlib.blake2b(fp.read(), digest_size=8).hexdigest()
+
+    settings = [COMPILED_PLAYTHROUGHS_VERSION, filename, list(target_resolution) if target_resolution else None, gamemode, get_monkey_knowledge_state(), get_config_fingerprint()]
+    return get_compiled_playthrough_prefix(filename) + content_digest + '-' + hashlib.blake2b(json.dumps(settings).encode(), digest_size=16).hexdigest()
+
+
+def prune_compiled_playthroughs(filename: str, key: str | None = None) -> None:
+    """
+    Deletes the map configs of a playthrough file stored in cache/playthroughs that were compiled from a different content of the file than key (all if key is None, e. g. for deleted files).
+    Entries of previous versions of the cache are deleted as well.
+    """
+    if not exists(COMPILED_PLAYTHROUGHS_DIR):
+        return
+
+    prefix = get_compiled_playthrough_prefix(filename)
+    content_prefix = key.rsplit('-', 1)[0] + '-' if key else None
+    for name in os.listdir(COMPILED_PLAYTHROUGHS_DIR):
+        if (name.startswith(prefix) and not (content_prefix and name.startswith(content_prefix))) or not re.fullmatch(r'[0-9a-f]{16}-[0-9a-f]{16}-[0-9a-f]{32}\.pickle(\.tmp)?', name):
+            # may have been pruned by another process
+            with suppress(FileNotFoundError):
+                os.remove(f'{COMPILED_PLAYTHROUGHS_DIR}/{name}')
+
+
+def clear_compiled_playthroughs():
+    """Empties the in-process cache of compiled map configs, required after changing the loaded configuration (e. g. towers)."""
+    global _config_fingerprint
+    compiled_playthroughs.clear()
+    _config_fingerprint = None
+
+
+def get_compiled_playthrough(filename, target_resolution=pyautogui.size(), gamemode=None):
+    """
+    Cached version of parse_btd6_instructions_file. Returns a copy of the compiled map config, callers may modify it.
+    The cache holds steps and monkeys as the dataclasses of step_types, which need less memory than the dictionaries.
+
+    Compiled map configs are kept in an in-process LRU and stored in cache/playthroughs, keyed by get_compiled_playthrough_key, so changed files or settings are compiled again.
+    The warnings printed by the parser are stored with the map config and printed again on every cache hit. Storing a file's map config deletes the ones compiled from its previous content.
+    """
+    key = get_compiled_playthrough_key(filename, target_resolution, gamemode)
+    if key is None:
+        return parse_btd6_instructions_file(filename, target_resolution, gamemode)
+
+    if key in compiled_playthroughs:
+        compiled_playthroughs.move_to_end(key)
+        compiled_playthroughs_stats['hits'] += 1
+        map_config, warnings = compiled_playthroughs[key]
+        print(warnings, end='')
+        return map_config_from_dataclasses(map_config)
+
+    cache_file = f'{COMPILED_PLAYTHROUGHS_DIR}/{key}.pickle'
+    entry = None
+    if exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as fp:
+                entry = pickle.load(fp)
+            compiled_playthroughs_stats['disk_hits'] += 1
+            print(entry[1], end='')
+        except (OSError, pickle.UnpicklingError, EOFError):
+            entry = None
+
+    if entry is None:
+        compiled_playthroughs_stats['misses'] += 1
+        output = io.StringIO()
+        with redirect_stdout(output):
+            map_config = parse_btd6_instructions_file(filename, target_resolution, gamemode)
+        print(output.getvalue(), end='')
+        if map_config is None:
+            return None
+        entry = (map_config_to_dataclasses(map_config), output.getvalue())
+        os.makedirs(COMPILED_PLAYTHROUGHS_DIR, exist_ok=True)
+        with open(cache_file + '.tmp', 'wb') as fp:
+            pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + '.tmp', cache_file)
+        prune_compiled_playthroughs(filename, key)
+
+    compiled_playthroughs[key] = entry
+    if len(compiled_playthroughs) > COMPILED_PLAYTHROUGHS_MAX_SIZE:
+        compiled_playthroughs.popitem(last=False)
+    return map_config_from_dataclasses(entry[0])
+
+
 def convert_btd6_instructions_file(filename: str, target_resolution: tuple[int, int]) -> bool:
     file_config = parse_btd6_instruction_file_name(filename)
     if not file_config:
@@ -477,19 +635,11 @@ def get_had_defeats(playthrough, playthrough_log):
 
 
 def get_average_playthrough_time(playthrough):
-    if playthrough['filename'] not in playthrough_stats:
-        return -1
+    return stats_store.get_average_win_time(playthrough['filename'], playthrough['gamemode'])
 
-    times = []
-    for resolution in playthrough_stats[playthrough['filename']]:
-        if not re.search(r'\d+x\d+', resolution):
-            continue
-        if playthrough['gamemode'] in playthrough_stats[playthrough['filename']][resolution]:
-            times = [
-                *times,
-                *playthrough_stats[playthrough['filename']][resolution][playthrough['gamemode']]['win_times'],
-            ]
-    return np.average(times or [-1])
+
+def get_recent_playthrough_time(playthrough):
+    return stats_store.get_recent_win_time(playthrough['filename'], playthrough['gamemode'])
 
 
 def get_highest_value_playthrough(all_available_playthroughs, map_name, playthrough_log, prefer_no_mk=True):
@@ -546,34 +696,18 @@ def get_highest_value_playthrough(all_available_playthroughs, map_name, playthro
     return highest_value_no_defeats_playthrough or highest_value_playthrough
 
 
-def update_playthrough_validation_status(playthrough_file, validation_status, resolution=create_resolution_string()):
-    global playthrough_stats
-
-    if playthrough_file not in playthrough_stats:
-        playthrough_stats[playthrough_file] = {}
-    if resolution not in playthrough_stats[playthrough_file]:
-        playthrough_stats[playthrough_file][resolution] = {'validation_result': False}
+def record_stats_event(event):
+    stats_journal.append(event)
+    stats_store.apply_event(event)
 
-    playthrough_stats[playthrough_file][resolution]['validation_result'] = validation_status
 
-    save_json_file('playthrough_stats.json', playthrough_stats)
+def update_playthrough_validation_status(playthrough_file, validation_status, resolution=create_resolution_string()):
+    record_stats_event({'type': 'validation', 'file': playthrough_file, 'resolution': resolution, 'result': validation_status})
 
 
 def update_stats_file(playthrough_file, this_playthrough_stats, resolution=create_resolution_string()):
-    global playthrough_stats
-
-    if playthrough_file not in playthrough_stats:
-        playthrough_stats[playthrough_file] = {}
-    if resolution not in playthrough_stats[playthrough_file]:
-        playthrough_stats[playthrough_file][resolution] = {'validation_result': False}
-    if this_playthrough_stats['gamemode'] not in playthrough_stats[playthrough_file][resolution]:
-        playthrough_stats[playthrough_file][resolution][this_playthrough_stats['gamemode']] = {'attempts': 0, 'wins': 0, 'win_times': []}
-
+    total_time = 0
     if this_playthrough_stats['result'] == PlaythroughResult.WIN:
-        playthrough_stats[playthrough_file][resolution][this_playthrough_stats['gamemode']]['attempts'] += 1
-        playthrough_stats[playthrough_file][resolution][this_playthrough_stats['gamemode']]['wins'] += 1
-        playthrough_stats[playthrough_file]['version'] = version
-        total_time = 0
         last_start = -1
         for state_change in this_playthrough_stats['time']:
             if state_change[0] == 'start' and last_start == -1:
@@ -581,11 +715,18 @@ def update_stats_file(playthrough_file, this_playthrough_stats, resolution=creat
             elif state_change[0] == 'stop' and last_start != -1:
                 total_time += state_change[1] - last_start
                 last_start = -1
-        playthrough_stats[playthrough_file][resolution][this_playthrough_stats['gamemode']]['win_times'].append(total_time)
-    else:
-        playthrough_stats[playthrough_file][resolution][this_playthrough_stats['gamemode']]['attempts'] += 1
 
-    save_json_file('playthrough_stats.json', playthrough_stats)
+    record_stats_event(
+        {
+            'type': 'game',
+            'file': playthrough_file,
+            'resolution': resolution,
+            'gamemode': this_playthrough_stats['gamemode'],
+            'win': this_playthrough_stats['result'] == PlaythroughResult.WIN,
+            'time': total_time,
+            'version': version,
+        },
+    )
 
 
 def check_for_single_monkey_group(monkeys):
@@ -623,7 +764,7 @@ def check_for_single_monkey_type(monkeys):
 
 def list_btd6_instructions_file_compatibility(filename):
     file_config = parse_btd6_instruction_file_name(filename)
-    map_config = parse_btd6_instructions_file(filename)
+    map_config = get_compiled_playthrough(filename)
     single_monkey_group = check_for_single_monkey_group(map_config['monkeys'])
 
     compatible_gamemodes = []
@@ -675,12 +816,19 @@ def check_btd6_instructions_file_compatibility(filename, gamemode):
     return gamemode in list_btd6_instructions_file_compatibility(filename)
 
 
+def get_playthrough_hero(filename: str) -> str | None:
+    """Returns the hero used by a playthrough, taken from the playthrough index if the file is indexed."""
+    if filename in playthrough_index.entries:
+        return playthrough_index.entries[filename]['hero']
+    return get_compiled_playthrough(filename).get('hero')
+
+
 # doesn't yet consider unlocked_monkey_upgrades
 def can_user_use_playthrough(playthrough):
     if playthrough['fileConfig']['map'] not in user_config['unlocked_maps'] or not user_config['unlocked_maps'][playthrough['fileConfig']['map']]:
         return False
-    map_config = parse_btd6_instructions_file(playthrough['filename'])
-    return not ('hero' in map_config and (map_config['hero'] not in user_config['heroes'] or not user_config['heroes'][map_config['hero']]))
+    hero = get_playthrough_hero(playthrough['filename'])
+    return not (hero and (hero not in user_config['heroes'] or not user_config['heroes'][hero]))
 
 
 def is_medal_unlocked(map_name: str, gamemode: str) -> bool:
@@ -730,33 +878,138 @@ def is_sandbox_unlocked(map_name: str, restricted_to: list[str] | None) -> str |
     return None
 
 
+PLAYTHROUGH_INDEX_FILE = 'cache/playthrough_index.json'
+# increase when the fields of the index entries change
+PLAYTHROUGH_INDEX_VERSION = 3
+STATS_STORE_FILE = 'cache/playthrough_stats.sqlite'
+
+
+class PlaythroughIndex:
+    """
+    Metadata of all playthrough files persisted to disk, files are only parsed again if their modification time or size changed.
+
+    Per file: parsed filename fields (fileConfig), hero, monkey types, single monkey group, compatible gamemodes and total cost of all steps.
+    The index is rebuilt if the configuration or the monkey knowledge state it was built with changed.
+
+    Args:
+        file_path (str, optional): Path of the persisted index.
+    """
+
+    def __init__(self, file_path: str = PLAYTHROUGH_INDEX_FILE):
+        self.file_path = file_path
+        self.entries: dict[str, dict] = {}
+        self.by_map_gamemode: dict[str, dict[str, list[str]]] = {}
+        self.fingerprint = None
+        self.stats = {'parsed': 0, 'unchanged': 0}
+
+    def get_fingerprint(self) -> str:
+        return get_config_fingerprint() + json.dumps(get_monkey_knowledge_state())
+
+    def load(self):
+        data = load_json_file(self.file_path)
+        self.fingerprint = self.get_fingerprint()
+        self.entries = data.get('files', {}) if data.get('version') == PLAYTHROUGH_INDEX_VERSION and data.get('fingerprint') == self.fingerprint else {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        save_json_file(self.file_path + '.tmp', {'version': PLAYTHROUGH_INDEX_VERSION, 'fingerprint': self.fingerprint, 'files': self.entries})
+        os.replace(self.file_path + '.tmp', self.file_path)
+
+    def create_entry(self, filename: str, stat: os.stat_result) -> dict | None:
+        """Parses a playthrough file and returns its metadata or None if it isn't a valid playthrough."""
+        file_config = parse_btd6_instruction_file_name(filename)
+        map_config = get_compiled_playthrough(filename) if file_config else None
+        if not map_config:
+            return None
+
+        return {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'fileConfig': file_config,
+            'hero': map_config.get('hero'),
+            'monkeys': sorted({monkey['type'] for monkey in map_config['monkeys'].values()}),
+            'singleMonkeyGroup': check_for_single_monkey_group(map_config['monkeys']),
+            'compatibleGamemodes': list_btd6_instructions_file_compatibility(filename),
+            'totalCost': sum(step['cost'] for step in map_config['steps']),
+        }
+
+    def update(self, dirs: list[str]) -> list[str]:
+        """
+        Brings the index up to date with the playthrough files in dirs and saves it if anything changed.
+        Afterwards get_playthroughs only returns files of dirs.
+
+        Returns:
+            list[str]: The valid playthrough files in dirs in listing order.
+        """
+        if self.fingerprint != self.get_fingerprint():
+            self.load()
+
+        changed = False
+        filenames = []
+        for dir_name in dirs:
+            if not exists(dir_name):
+                continue
+            for name in os.listdir(dir_name):
+                filename = dir_name + '/' + name
+                stat = os.stat(filename)
+                entry = self.entries.get(filename)
+                if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    self.stats['unchanged'] += 1
+                else:
+                    self.stats['parsed'] += 1
+                    entry = self.create_entry(filename, stat)
+                    changed = True
+                    if entry:
+                        self.entries[filename] = entry
+                    else:
+                        self.entries.pop(filename, None)
+                        continue
+                filenames.append(filename)
+
+        # drop files deleted from the listed directories
+        for filename in [x for x in self.entries if os.path.dirname(x) in dirs and not exists(x)]:
+            del self.entries[filename]
+            prune_compiled_playthroughs(filename)
+            changed = True
+
+        self.by_map_gamemode = {}
+        for filename in filenames:
+            entry = self.entries[filename]
+            for gamemode in entry['compatibleGamemodes']:
+                self.by_map_gamemode.setdefault(entry['fileConfig']['map'], {}).setdefault(gamemode, []).append(filename)
+
+        if changed:
+            self.save()
+        return filenames
+
+    def get_playthroughs(self, map_name: str, gamemode: str) -> list[str]:
+        """Returns the playthrough files of the directories of the last update usable for a map and gamemode in listing order."""
+        return self.by_map_gamemode.get(map_name, {}).get(gamemode, [])
+
+
+playthrough_index = PlaythroughIndex()
+
+
 def get_all_available_playthroughs(additional_dirs=[], consider_user_config=False):
     playthroughs = {}
-    files = []
-    for dir_list in ['playthroughs', *additional_dirs]:
-        if exists(dir_list):
-            files = [*files, *[dir_list + '/' + x for x in os.listdir(dir_list)]]
+    playthrough_index.update(['playthroughs', *additional_dirs])
 
-    for filename in files:
-        file_config = parse_btd6_instruction_file_name(filename)
-        if consider_user_config and not can_user_use_playthrough({'filename': filename, 'fileConfig': file_config}):
-            continue
-        if file_config['map'] not in playthroughs:
-            playthroughs[file_config['map']] = {}
-        compatible_gamemodes = list_btd6_instructions_file_compatibility(filename)
-        for gamemode in compatible_gamemodes:
-            if consider_user_config and not can_user_access_gamemode(file_config['map'], gamemode):
+    for map_name, map_gamemodes in playthrough_index.by_map_gamemode.items():
+        for gamemode in map_gamemodes:
+            if consider_user_config and not can_user_access_gamemode(map_name, gamemode):
                 continue
-            if gamemode not in playthroughs[file_config['map']]:
-                playthroughs[file_config['map']][gamemode] = []
-            playthroughs[file_config['map']][gamemode].append(
-                {
-                    'filename': filename,
-                    'fileConfig': file_config,
-                    'gamemode': gamemode,
-                    'isOriginalGamemode': gamemode == file_config['gamemode'],
-                },
-            )
+            for filename in playthrough_index.get_playthroughs(map_name, gamemode):
+                file_config = playthrough_index.entries[filename]['fileConfig']
+                if consider_user_config and not can_user_use_playthrough({'filename': filename, 'fileConfig': file_config}):
+                    continue
+                playthroughs.setdefault(map_name, {}).setdefault(gamemode, []).append(
+                    {
+                        'filename': filename,
+                        'fileConfig': file_config,
+                        'gamemode': gamemode,
+                        'isOriginalGamemode': gamemode == file_config['gamemode'],
+                    },
+                )
 
     return playthroughs
 
@@ -784,22 +1037,15 @@ def filter_all_available_playthroughs(
                 if playthrough['fileConfig']['noMK'] == False and monkey_knowledge_enabled == False:
                     continue
                 if hero_whitelist:
-                    map_config = parse_btd6_instructions_file(playthrough['filename'])
-                    if 'hero' in map_config and map_config['hero'] not in hero_whitelist:
+                    hero = get_playthrough_hero(playthrough['filename'])
+                    if hero and hero not in hero_whitelist:
                         continue
                 if required_flags and not all([x in playthrough['fileConfig'] for x in required_flags]):
                     continue
                 if only_original_gamemodes and not playthrough['isOriginalGamemode']:
                     continue
                 if handle_playthrough_validation != ValidatedPlaythroughs.INCLUDE_ALL and (
-                    (
-                        handle_playthrough_validation == ValidatedPlaythroughs.EXCLUDE_NON_VALIDATED
-                        and (playthrough['filename'] not in playthrough_stats or resolution not in playthrough_stats[playthrough['filename']] or 'validation_result' not in playthrough_stats[playthrough['filename']][resolution] or playthrough_stats[playthrough['filename']][resolution]['validation_result'] == False)
-                    )
-                    or (
-                        handle_playthrough_validation == ValidatedPlaythroughs.EXCLUDE_VALIDATED
-                        and (playthrough['filename'] in playthrough_stats and resolution in playthrough_stats[playthrough['filename']] and 'validation_result' in playthrough_stats[playthrough['filename']][resolution] and playthrough_stats[playthrough['filename']][resolution]['validation_result'] == True)
-                    )
+                    (handle_playthrough_validation == ValidatedPlaythroughs.EXCLUDE_NON_VALIDATED and not stats_store.is_validated(playthrough['filename'], resolution)) or (handle_playthrough_validation == ValidatedPlaythroughs.EXCLUDE_VALIDATED and stats_store.is_validated(playthrough['filename'], resolution))
                 ):
                     continue
                 if map_name not in filtered_playthroughs:
@@ -876,14 +1122,14 @@ def get_playthrough_monkey_money(gamemode, map_category):
 
 
 def get_playthrough_xp_per_hour(playthrough):
-    average_time = get_average_playthrough_time(playthrough)
+    average_time = get_recent_playthrough_time(playthrough)
     if average_time == -1:
         return 0
     return 3600 / average_time * get_playthrough_xp(playthrough['gamemode'], maps[playthrough['fileConfig']['map']]['category'])
 
 
 def get_playthrough_monkey_money_per_hour(playthrough):
-    average_time = get_average_playthrough_time(playthrough)
+    average_time = get_recent_playthrough_time(playthrough)
     if average_time == -1:
         return 0
     return 3600 / average_time * get_playthrough_monkey_money(playthrough['gamemode'], maps[playthrough['fileConfig']['map']]['category'])
@@ -1000,12 +1246,30 @@ for name in names:
     loaded.append(load_json_file(f'{name}.json'))
 maps, gamemodes, keybinds, towers, all_image_areas = loaded
 
-if create_resolution_string() in all_image_areas:
-    image_areas = all_image_areas[create_resolution_string()]
-else:
-    image_areas = json.loads(scale_string_coordinate_pairs(json.dumps(all_image_areas['2560x1440']), (2560, 1440), pyautogui.size()))
 
-playthrough_stats = load_json_file('playthrough_stats.json')
+def get_image_areas(resolution=pyautogui.size()) -> dict:
+    """Returns the image areas for the resolution, scaled from 2560x1440 if the resolution has no areas of its own (see utils.utils.get_for_resolution)."""
+    if create_resolution_string(resolution) in all_image_areas:
+        return all_image_areas[create_resolution_string(resolution)]
+    return get_for_resolution('image_areas.json', resolution, model_cls=ImageAreas)
+
+
+# a copy, so set_image_areas_resolution can replace the content without changing all_image_areas
+image_areas = dict(get_image_areas())
+
+
+def set_image_areas_resolution(resolution):
+    """Replaces the content of image_areas (also for modules that imported it) by the areas of another resolution, e.g. of recorded frames."""
+    image_areas.clear()
+    image_areas.update(get_image_areas(resolution))
+
+
+# changes are appended to playthrough_stats.journal.jsonl and compacted into playthrough_stats.json (see utils.stats_journal)
+stats_journal = StatsJournal('playthrough_stats.json')
+playthrough_stats = stats_journal.load()
+# indexed copy of the stats for queries, rebuilt when playthrough_stats.json changed
+stats_store = StatsStore(STATS_STORE_FILE)
+stats_store.import_json(playthrough_stats, stats_journal.get_snapshot_hash())
 
 user_config = {
     'monkey_knowledge': {},
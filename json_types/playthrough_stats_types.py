@@ -9,7 +9,9 @@ class ModeStats(BaseModel):
     wins: int
     """Number of successful wins for this gamemode."""
     win_times: list[float]
-    """List of completion times in seconds for successful runs."""
+    """List of completion times in seconds for successful runs (the most recent ones)."""
+    win_time_sketch: dict | None = None
+    """Quantile sketch of all completion times (see utils.quantile_sketch.QuantileSketch.to_dict)."""
 
 
 class ResolutionData(BaseModel):
@@ -44,6 +46,8 @@ class ResolutionData(BaseModel):
 class PlaythroughEntry(BaseModel):
     version: float | None = None
     """BTD6 version number when this playthrough was recorded."""
+    win_time_stats: dict[str, dict] = {}
+    """Running aggregates of all win times per gamemode across all resolutions (see utils.running_stats.RunningStats.to_dict)."""
     resolutions: dict[str, ResolutionData]
 
     @model_validator(mode='before')
@@ -52,13 +56,15 @@ class PlaythroughEntry(BaseModel):
         if not isinstance(data, dict):
             raise TypeError('PlaythroughEntry must be a dict.')
         v = data.get('version')
-        resolutions = {k: v for k, v in data.items() if k != 'version'}
-        return {'version': v, 'resolutions': resolutions}
+        resolutions = {k: v for k, v in data.items() if k not in ['version', 'win_time_stats']}
+        return {'version': v, 'win_time_stats': data.get('win_time_stats', {}), 'resolutions': resolutions}
 
     def model_dump(self, **kwargs):
         out = super().model_dump(**kwargs)
         # flatten: version, then all resolution keys at top level
         flat = {'version': out['version']}
+        if out['win_time_stats']:
+            flat['win_time_stats'] = out['win_time_stats']
         flat.update(out['resolutions'])
         return flat
 
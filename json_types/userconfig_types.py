@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
@@ -44,6 +45,8 @@ class UserConfig(BaseModel):
     unlocked_maps: dict[str, bool]
     unlocked_monkey_upgrades: dict[str, list[int]]
     medals: dict[str, MapMedals]
+    ocr_backend: Literal['numpy', 'keras', 'template'] = 'numpy'
+    """Glyph classifier used for reading money and round: exported network (numpy), original network (keras) or glyph atlas matching (template)."""
 
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from os.path import exists
+
+from helper import parse_btd6_instruction_file_name, parse_btd6_instructions_file
+from utils.utils import save_json_file
+
+# parses all playthrough files of the given directories in parallel and writes a report containing the warnings printed by the parser for every file
+# playthroughs are parsed in their own resolution, the game isn't required
+
+DEFAULT_DIRS = ['playthroughs', 'own_playthroughs', 'unvalidated_playthroughs', 'unsuccessful_playthroughs']
+
+
+def lint_playthrough(filename: str) -> dict:
+    """Parses a playthrough file and returns the result including all warnings printed by the parser."""
+    result = {'valid': False, 'warnings': []}
+
+    if not parse_btd6_instruction_file_name(os.path.basename(filename)):
+        result['warnings'].append('invalid filename, expected <map>#<gamemode>#<resolution>[#<comment>].btd6')
+        return result
+    file_config = parse_btd6_instruction_file_name(filename)
+    if not file_config:
+        result['warnings'].append('unsupported directory, expected one of ' + ', '.join(DEFAULT_DIRS))
+        return result
+    result['fileConfig'] = file_config
+
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            map_config = parse_btd6_instructions_file(filename, (int(file_config['resolution_x']), int(file_config['resolution_y'])))
+    except Exception as e:
+        # a single broken file mustn't prevent the report of all other files
+        map_config = None
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['warnings'] += [line.removeprefix(filename + ': ') for line in output.getvalue().splitlines()]
+
+    if map_config:
+        result['valid'] = True
+        result['steps'] = len(map_config['steps']) - map_config['extrainstructions']
+        result['hero'] = map_config.get('hero')
+
+    return result
+
+
+if __name__ == '__main__':
+    argv = sys.argv
+    report_file = 'playthrough_lint.json'
+    workers = None
+    dirs = []
+
+    i_arg = 1
+    while i_arg < len(argv):
+        if argv[i_arg] == '-o' and i_arg + 1 < len(argv):
+            report_file = argv[i_arg + 1]
+            i_arg += 2
+        elif argv[i_arg] == '-j' and i_arg + 1 < len(argv) and argv[i_arg + 1].isdigit():
+            workers = int(argv[i_arg + 1])
+            i_arg += 2
+        elif argv[i_arg].startswith('-'):
+            print('Usage: py ' + argv[0] + ' [<playthrough directories...>] [-o <report file>] [-j <number of processes>]')
+            exit()
+        else:
+            dirs.append(argv[i_arg].rstrip('/\\'))
+            i_arg += 1
+
+    files = [dir_name + '/' + x for dir_name in dirs or DEFAULT_DIRS if exists(dir_name) for x in sorted(os.listdir(dir_name)) if x.endswith('.btd6')]
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = dict(zip(files, executor.map(lint_playthrough, files, chunksize=max(1, len(files) // ((workers or os.cpu_count() or 1) * 4)))))
+
+    report = {
+        'summary': {
+            'files': len(results),
+            'invalid': sum(not result['valid'] for result in results.values()),
+            'errors': sum('error' in result for result in results.values()),
+            'with_warnings': sum(bool(result['warnings']) for result in results.values()),
+            'warnings': sum(len(result['warnings']) for result in results.values()),
+        },
+        'files': results,
+    }
+    save_json_file(report_file, report)
+
+    for filename, result in results.items():
+        for warning in result['warnings']:
+            print(filename + ': ' + warning)
+        if 'error' in result:
+            print(filename + ': parser failed: ' + result['error'])
+
+    print(f'{report["summary"]["files"]} files checked in {time.time() - start:.1f}s, {report["summary"]["invalid"]} invalid ({report["summary"]["errors"]} parser errors), {report["summary"]["with_warnings"]} with warnings. report saved to {report_file}')
+
+    if report['summary']['invalid'] or report['summary']['with_warnings']:
+        sys.exit(1)
@@ -0,0 +1,148 @@
+import os
+import sys
+from collections.abc import Iterator
+from os.path import exists
+
+from json_types.playthrough_stats_types import ModeStats, PlaythroughEntry, ResolutionData
+from utils.running_stats import RunningStats
+from utils.stats_journal import MAX_WIN_TIMES, StatsJournal, apply_stats_event, get_win_time_sketch, get_win_time_stats
+from utils.stats_store import StatsStore
+from utils.utils import iter_json_object_items, save_json_file
+
+# combines the playthrough stats of several machines into a single playthrough_stats.json
+# inputs are read one playthrough entry (or journal event) at a time, only the merged stats are kept in memory. their size only depends on the number of playthroughs as win_times is limited to MAX_WIN_TIMES and the win time sketches are bounded
+
+VALIDATION_MODES = ['latest', 'majority']
+
+
+def iter_stats_entries(file_path: str) -> Iterator[tuple[str, dict]]:
+    """Yields the entries of a stats file (playthrough_stats.json format), a stats journal (.jsonl) or a stats store (.sqlite) in the format of playthrough_stats.json."""
+    if file_path.endswith('.sqlite'):
+        store = StatsStore(file_path, read_only=True)
+        yield from store.iter_json()
+        store.close()
+    elif file_path.endswith('.jsonl'):
+        # events of a journal whose snapshot is present are only merged if they weren't compacted into it yet
+        snapshot_path = file_path.removesuffix('.journal.jsonl') + '.json'
+        for event in StatsJournal(snapshot_path, file_path).iter_journal(check_base=exists(snapshot_path)):
+            stats = {}
+            apply_stats_event(stats, event)
+            if event['type'] == 'game':
+                # a game doesn't say anything about the validation of the playthrough
+                del stats[event['file']][event['resolution']]['validation_result']
+            yield event['file'], stats[event['file']]
+    else:
+        yield from iter_json_object_items(file_path)
+
+
+def merge_mode_stats(a: ModeStats, b: ModeStats) -> ModeStats:
+    sketch = get_win_time_sketch(a.model_dump())
+    sketch.merge(get_win_time_sketch(b.model_dump()))
+    return ModeStats(attempts=a.attempts + b.attempts, wins=a.wins + b.wins, win_times=[*a.win_times, *b.win_times][-MAX_WIN_TIMES:], win_time_sketch=sketch.to_dict())
+
+
+class StatsMerger:
+    """
+    Merges playthrough stats entry by entry.
+
+    Attempts and wins are summed, win times are concatenated (keeping the most recent MAX_WIN_TIMES) and their sketches and running aggregates merged, the highest version is kept.
+
+    Args:
+        validation_mode (str, optional): How conflicting validation results of a resolution are resolved. 'latest': the result of the input added last, 'majority': the result of most inputs (ties are resolved by the latest).
+
+    Call finish_input after all entries of an input were added, in 'majority' mode each input only votes with its latest validation result of a resolution (a journal may contain many).
+    """
+
+    def __init__(self, validation_mode: str = 'latest'):
+        self.validation_mode = validation_mode
+        self.entries: dict[str, PlaythroughEntry] = {}
+        # number of (successful, failed) validation results by (file, resolution)
+        self.validation_votes: dict[tuple[str, str], list[int]] = {}
+        # latest validation result by (file, resolution) of the current input
+        self.input_validation_results: dict[tuple[str, str], bool] = {}
+
+    def add(self, file: str, data: dict) -> None:
+        entry = PlaythroughEntry.model_validate(data)
+        merged = self.entries.setdefault(file, PlaythroughEntry.model_validate({}))
+
+        if entry.version is not None and (merged.version is None or entry.version > merged.version):
+            merged.version = entry.version
+
+        for resolution, resolution_data in entry.resolutions.items():
+            merged_resolution = merged.resolutions.setdefault(resolution, ResolutionData.model_validate({}))
+            if resolution_data.validation_result is not None:
+                if self.validation_mode == 'majority':
+                    self.input_validation_results[(file, resolution)] = resolution_data.validation_result
+                else:
+                    merged_resolution.validation_result = resolution_data.validation_result
+            for gamemode, mode_stats in resolution_data.modes.items():
+                merged_resolution.modes[gamemode] = merge_mode_stats(merged_resolution.modes[gamemode], mode_stats) if gamemode in merged_resolution.modes else mode_stats
+
+        # inputs are added oldest first, so the win times of this entry are the most recent ones
+        for gamemode in {gamemode for resolution_data in entry.resolutions.values() for gamemode, mode_stats in resolution_data.modes.items() if mode_stats.wins}:
+            win_time_stats = RunningStats.from_dict(merged.win_time_stats[gamemode]) if gamemode in merged.win_time_stats else RunningStats()
+            win_time_stats.merge(get_win_time_stats(data, gamemode))
+            if win_time_stats.count:
+                merged.win_time_stats[gamemode] = win_time_stats.to_dict()
+
+    def finish_input(self) -> None:
+        """Counts the latest validation result of each resolution of the input added since the last call as one vote."""
+        for (file, resolution), validation_result in self.input_validation_results.items():
+            votes = self.validation_votes.setdefault((file, resolution), [0, 0])
+            votes[0 if validation_result else 1] += 1
+            self.entries[file].resolutions[resolution].validation_result = votes[0] > votes[1] if votes[0] != votes[1] else validation_result
+        self.input_validation_results = {}
+
+    def to_json(self) -> dict:
+        """Returns the merged stats in the format of playthrough_stats.json."""
+        self.finish_input()
+        stats = {}
+        for file, entry in self.entries.items():
+            stats[file] = {}
+            for resolution, resolution_data in entry.resolutions.items():
+                stats[file][resolution] = {} if resolution_data.validation_result is None else {'validation_result': resolution_data.validation_result}
+                stats[file][resolution].update({gamemode: mode_stats.model_dump(exclude_none=True) for gamemode, mode_stats in resolution_data.modes.items()})
+            if entry.version is not None:
+                stats[file]['version'] = entry.version
+            if entry.win_time_stats:
+                stats[file]['win_time_stats'] = entry.win_time_stats
+        return stats
+
+
+if __name__ == '__main__':
+    argv = sys.argv
+    validation_mode = 'latest'
+    input_files = []
+    output_file = None
+
+    i_arg = 1
+    while i_arg < len(argv):
+        if argv[i_arg] == '-v' and i_arg + 1 < len(argv) and argv[i_arg + 1] in VALIDATION_MODES:
+            validation_mode = argv[i_arg + 1]
+            i_arg += 2
+        elif argv[i_arg] == '-o' and i_arg + 1 < len(argv):
+            output_file = argv[i_arg + 1]
+            i_arg += 2
+        elif argv[i_arg].startswith('-') or not exists(argv[i_arg]):
+            input_files = []
+            break
+        else:
+            input_files.append(argv[i_arg])
+            i_arg += 1
+
+    if not input_files or not output_file:
+        print('Usage: py ' + argv[0] + ' <stats files, journals or stores (oldest first)...> -o <output file> [-v <' + '|'.join(VALIDATION_MODES) + '>]')
+        exit()
+
+    merger = StatsMerger(validation_mode)
+    for input_file in input_files:
+        entries = 0
+        for file, data in iter_stats_entries(input_file):
+            merger.add(file, data)
+            entries += 1
+        merger.finish_input()
+        print(f'{input_file}: {entries} entries merged')
+
+    save_json_file(output_file + '.tmp', merger.to_json())
+    os.replace(output_file + '.tmp', output_file)
+    print(f'stats of {len(merger.entries)} playthroughs saved to {output_file}')
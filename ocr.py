@@ -1,26 +1,161 @@
+import hashlib
 import os
+from collections import OrderedDict
+from os.path import exists
 
 import cv2
 import numpy as np
 import pyautogui
 
-os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
-import keras
+from utils.numpy_net import NumpyNet
+from utils.utils import create_resolution_string, load_json_file
 
-ocr_model = keras.models.load_model('btd6_ocr_net.h5')
+OCR_KERAS_MODEL_FILE = 'btd6_ocr_net.h5'
+OCR_NUMPY_MODEL_FILE = 'btd6_ocr_net.npz'
+OCR_GLYPH_ATLAS_FILE = 'ocr_glyphs.npz'
 
 
-def custom_ocr(img, resolution=pyautogui.size()):
-    h = img.shape[0]
-    w = img.shape[1]
+class KerasOcrModel:
+    """Fallback backend using the original Keras model. Importing Keras/TensorFlow is slow, so it is only imported when required."""
 
-    white = np.array([255, 255, 255])
-    black = np.array([0, 0, 0])
+    def __init__(self, file_path: str = OCR_KERAS_MODEL_FILE):
+        os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+        import keras
 
-    for y in range(0, h):
-        for x in range(0, w):
-            if not (img[y][x] == white).all():
-                img[y][x] = black
+        self.model = keras.models.load_model(file_path)
+
+    def predict(self, glyphs: np.ndarray) -> np.ndarray:
+        return self.model.predict(glyphs, verbose=0)
+
+
+class TemplateOcrModel:
+    """
+    Backend without neural network: compares glyphs to the per resolution glyph atlas created by build_glyph_atlas.py using normalized correlation.
+
+    Args:
+        file_path (str): Path to the glyph atlas containing the averaged glyph for each class ('0'-'9' and '/').
+    """
+
+    def __init__(self, file_path: str):
+        with np.load(file_path, allow_pickle=False) as data:
+            self.templates = normalize_glyphs(data['glyphs'])
+            self.missing_classes = np.flatnonzero(data['counts'] == 0)
+
+    def predict(self, glyphs: np.ndarray) -> np.ndarray:
+        scores = normalize_glyphs(glyphs) @ self.templates.T
+        scores[:, self.missing_classes] = -np.inf
+        return scores
+
+
+def normalize_glyphs(glyphs: np.ndarray) -> np.ndarray:
+    """Flattens glyphs to zero mean, unit length vectors so their dot product equals their normalized correlation."""
+    vectors = np.asarray(glyphs, dtype=np.float32).reshape((len(glyphs), -1))
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def get_glyph_atlas_path(resolution=pyautogui.size()) -> str:
+    return f'images/{create_resolution_string(resolution)}/{OCR_GLYPH_ATLAS_FILE}'
+
+
+def load_ocr_model(backend: str = 'numpy', resolution=pyautogui.size()) -> NumpyNet | KerasOcrModel | TemplateOcrModel:
+    """
+    Loads the glyph classifier for the given backend.
+
+    The 'template' backend falls back to 'numpy' if no glyph atlas exists for the resolution.
+    The 'numpy' backend evaluates the weights exported by convert_ocr_model.py without Keras and falls back to 'keras' if the export is missing.
+    """
+    if backend == 'template':
+        if exists(get_glyph_atlas_path(resolution)):
+            return TemplateOcrModel(get_glyph_atlas_path(resolution))
+        print(f'{get_glyph_atlas_path(resolution)} missing! falling back to numpy. run "py build_glyph_atlas.py" to create it')
+        backend = 'numpy'
+    if backend == 'numpy':
+        if exists(OCR_NUMPY_MODEL_FILE):
+            return NumpyNet.load(OCR_NUMPY_MODEL_FILE)
+        print(f'{OCR_NUMPY_MODEL_FILE} missing! falling back to keras. run "py convert_ocr_model.py" to create it')
+    return KerasOcrModel()
+
+
+# loaded glyph classifiers by resolution, the glyph atlas of the template backend is resolution specific
+_ocr_models: dict[str, NumpyNet | KerasOcrModel | TemplateOcrModel] = {}
+
+
+def get_ocr_model(resolution=pyautogui.size()) -> NumpyNet | KerasOcrModel | TemplateOcrModel:
+    """Returns the glyph classifier of the backend configured in userconfig.json ("ocr_backend") for the resolution of the OCR areas (e. g. of recorded frames), loading it on first use."""
+    key = create_resolution_string(resolution)
+    if key not in _ocr_models:
+        _ocr_models[key] = load_ocr_model(load_json_file('userconfig.json').get('ocr_backend', 'numpy'), resolution)
+    return _ocr_models[key]
+
+
+class OcrCache:
+    """
+    LRU cache of recognized text keyed by a hash of the OCR area pixels, so unchanged HUD segments (e. g. while waiting for a round to end) skip segmentation and inference.
+
+    Args:
+        max_size (int, optional): Number of entries kept before the least recently used one is dropped.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self.entries: OrderedDict[bytes, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(img: np.ndarray, resolution) -> bytes:
+        digest = hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16)
+        digest.update(repr((img.shape, tuple(resolution))).encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> str | None:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, value: str) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0, 'size': len(self.entries)}
+
+
+ocr_cache = OcrCache()
+
+
+def mask_non_white_pixels(img: np.ndarray) -> np.ndarray:
+    """Turns every pixel of a BGR image that isn't pure white black (in place) and returns the image."""
+    img[(img != 255).any(axis=2)] = 0
+    return img
+
+
+def binarize_glyph(char_img: np.ndarray) -> np.ndarray:
+    """Maps a grayscale glyph to 1 for pure white pixels and 0 for everything else (in place) and returns it."""
+    char_img //= 255
+    return char_img
+
+
+def extract_glyphs(img, resolution=pyautogui.size()) -> list[np.ndarray]:
+    """
+    Segments an OCR area into binarized 60x60 glyphs ordered from left to right.
+
+    Pixels that aren't pure white are blackened in place, glyphs after a horizontal gap (e. g. explosion particles) are dropped.
+    """
+    mask_non_white_pixels(img)
 
     gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     thresh_img = cv2.threshold(gray_img, 60, 255, cv2.THRESH_BINARY)[1]
@@ -30,31 +165,15 @@ def custom_ocr(img, resolution=pyautogui.size()):
 
     for contour in contours:
         # TODO: isn't this wrong?
-        min_x = contour[0][0][0]
-        min_y = contour[0][0][1]
-        max_x = contour[0][0][0]
-        max_y = contour[0][0][1]
-
-        for point in contour:
-            if point[0][0] < min_x:
-                min_x = point[0][0]
-            if point[0][0] > max_x:
-                max_x = point[0][0]
-            if point[0][1] < min_y:
-                min_y = point[0][1]
-            if point[0][1] > max_y:
-                max_y = point[0][1]
+        min_x, min_y = contour[:, 0].min(axis=0)
+        max_x, max_y = contour[:, 0].max(axis=0)
 
         char_img = img[min_y:max_y, min_x:max_x]
 
         if char_img.shape[0] >= 25 * resolution[0] / 2560 and char_img.shape[0] <= 60 * resolution[0] / 2560 and char_img.shape[1] >= 14 * resolution[1] / 1440 and char_img.shape[1] <= 40 * resolution[1] / 1440:
             char_img = cv2.resize(char_img, (50, 50))
             char_img = cv2.copyMakeBorder(char_img, 5, 5, 5, 5, cv2.BORDER_CONSTANT, value=(0, 0, 0))
-            char_img = char_img[:, :, 0]
-
-            for y in range(0, 60):
-                for x in range(0, 60):
-                    char_img[y][x] = int(char_img[y][x] / 255)
+            char_img = binarize_glyph(char_img[:, :, 0])
 
             char_images.append([min_x, char_img])
 
@@ -68,21 +187,72 @@ def custom_ocr(img, resolution=pyautogui.size()):
             current_x = entry[0]
             filtered_char_images.append(entry)
 
-    if len(filtered_char_images) == 0:
-        return '-1'
-
-    char_images = list(map(lambda item: item[1], filtered_char_images))
-    char_images = np.array(char_images)
+    return [item[1] for item in filtered_char_images]
 
-    predictions = ocr_model.predict(char_images, verbose=0)
 
+def predictions_to_string(predictions) -> str:
     number = ''
 
     for prediction in predictions:
-        value = np.argmax_(prediction)
+        value = np.argmax(prediction)
         if value == 10:
             number += '/'
         else:
             number += str(value)
 
     return number
+
+
+def custom_ocr(img, resolution=pyautogui.size(), use_cache: bool = True):
+    if use_cache:
+        key = OcrCache.key(img, resolution)
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            return cached
+
+    char_images = extract_glyphs(img, resolution)
+
+    result = predictions_to_string(get_ocr_model(resolution).predict(np.array(char_images))) if char_images else '-1'
+
+    if use_cache:
+        ocr_cache.put(key, result)
+    return result
+
+
+def ocr_segments(screenshot, segments: dict[str, list[int]], resolution=pyautogui.size(), use_cache: bool = True) -> dict[str, str]:
+    """
+    Recognizes the text of multiple OCR segments of a screenshot with a single model inference.
+
+    Args:
+        screenshot (np.ndarray): The BGR screenshot containing all segments. OCR areas of segments not found in the cache are blackened in place.
+        segments (dict[str, list[int]]): Segment name to area (x1, y1, x2, y2), e. g. the result of get_ingame_ocr_segments.
+        resolution (tuple[int, int], optional): The screen resolution, used to scale the accepted glyph size.
+        use_cache (bool, optional): Whether to look up and store the results per segment in ocr_cache.
+    Returns:
+        dict[str, str]: The detected text per segment, '-1' for segments without any glyphs (same as custom_ocr).
+    """
+    results = {}
+    keys = {}
+    glyphs_by_segment = {}
+
+    for name, area in segments.items():
+        segment_img = screenshot[area[1] : area[3], area[0] : area[2]]
+        if use_cache:
+            keys[name] = OcrCache.key(segment_img, resolution)
+            cached = ocr_cache.get(keys[name])
+            if cached is not None:
+                results[name] = cached
+                continue
+        glyphs_by_segment[name] = extract_glyphs(segment_img, resolution)
+
+    all_glyphs = [glyph for glyphs in glyphs_by_segment.values() for glyph in glyphs]
+    predictions = get_ocr_model(resolution).predict(np.array(all_glyphs)) if all_glyphs else []
+
+    offset = 0
+    for name, glyphs in glyphs_by_segment.items():
+        results[name] = predictions_to_string(predictions[offset : offset + len(glyphs)]) if glyphs else '-1'
+        offset += len(glyphs)
+        if use_cache:
+            ocr_cache.put(keys[name], results[name])
+
+    return {name: results[name] for name in segments}
@@ -0,0 +1,60 @@
+import re
+import sys
+
+import numpy as np
+import pyautogui
+
+from helper import get_image_areas
+from replay import ASSET_BUNDLE_FILE, get_comparison_area, get_reference_images_fingerprint, get_resolution_dependent_data
+from utils.asset_bundle import AssetBundle, save_asset_bundle
+from utils.utils import create_resolution_string
+
+# packs the compared areas of all comparison images, all locate images (including masks) and collection event images of a resolution into a single file
+# replay.py memory maps this file instead of reading every png. rerun after changing reference images or their areas in image_areas.json, until then replay.py reads the png files
+
+argv = sys.argv
+if len(argv) > 2 or (len(argv) == 2 and not re.fullmatch(r'\d+x\d+', argv[1])):
+    print('Usage: py ' + argv[0] + ' [<resolution(e. g. 2560x1440)>]')
+    exit()
+
+resolution = tuple(int(x) for x in argv[1].split('x')) if len(argv) == 2 else pyautogui.size()
+
+rd_data = get_resolution_dependent_data(resolution, use_asset_bundle=False)
+if not rd_data:
+    print('unsupported resolution! reference images missing!')
+    exit()
+
+image_areas = get_image_areas(resolution)
+images = {}
+metadata = {}
+errors = []
+
+for category, crops in rd_data['comparisonImages'].items():
+    for name, crop in crops.items():
+        key = f'compare/{category}/{name}'
+        area = get_comparison_area(image_areas, category, name)
+        if crop.shape[:2] != (area[3] - area[1] + 1, area[2] - area[0] + 1):
+            errors.append(f'{name}.png: compared area {area} from image_areas.json exceeds the image')
+        images[key] = crop
+        metadata[key] = {'area': list(area)}
+
+for name, img in rd_data['locateImages'].items():
+    if name == 'collection':
+        images.update({f'collection/{event}': event_img for event, event_img in img.items()})
+    else:
+        images[f'locate/{name}'] = img
+
+if errors:
+    print('\n'.join(errors))
+    sys.exit(1)
+
+images_dir = f'images/{create_resolution_string(resolution)}/'
+file_path = images_dir + ASSET_BUNDLE_FILE
+save_asset_bundle(file_path, images, metadata, info={'source': get_reference_images_fingerprint(images_dir)})
+
+bundle = AssetBundle(file_path)
+if set(bundle.keys()) != set(images) or any(not np.array_equal(bundle.get(key), img) for key, img in images.items()):
+    print(f'{file_path} differs from the reference images!')
+    sys.exit(1)
+
+print(f'{len(images)} images packed into {file_path} ({bundle.data.nbytes / 1e6:.1f} MB)')
@@ -26,20 +26,12 @@ from helper import (
     towers,
 )
 from instructions_file_manager import get_btd6_instructions_file_name_by_config, parse_btd6_instructions_file, write_btd6_instructions_file
+from step_types import MonkeyData
 from utils.utils import tuple_to_str
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-# TODO: investigate and optimize
-class MonkeyType(TypedDict):
-    name: str
-    type: str  # what is the type vs name?
-    pos: tuple[int, int]  # TODO: check if we should use Point instead
-    upgrades: list[int]
-    value: int | float  # TODO: what is this for?
-
-
 @dataclass
 class RecordingEventData:
     action: str
@@ -114,9 +106,9 @@ class PlaythroughRecorder(BaseRecorder):
         for monkey_type in keybinds['monkeys']:
             self.monkeys_by_type_count[monkey_type] = 0
 
-        self.placed_monkeys: dict[str, MonkeyType] = config.get('monkeys', {})
+        self.placed_monkeys: dict[str, MonkeyData] = {name: MonkeyData.from_dict(monkey) for name, monkey in config.get('monkeys', {}).items()}
         for monkey_name in self.placed_monkeys:
-            self.monkeys_by_type_count[self.placed_monkeys[monkey_name]['type']] += 1
+            self.monkeys_by_type_count[self.placed_monkeys[monkey_name].type] += 1
 
         self.file_name = get_btd6_instructions_file_name_by_config(self.config)
 
@@ -187,7 +179,7 @@ class PlaythroughRecorder(BaseRecorder):
             logging.warning('No monkeys placed yet!')
             return
         self.selected_monkey = monkey
-        self._record('select_monkey', name=monkey['name'], pos=pos)
+        self._record('select_monkey', name=monkey.name, pos=pos)
 
     @BaseRecorder.on(Action.REMOVE_OBSTACLE)
     def _handle_remove_obstacle(self, pos: Point, e: RecordingEventData) -> None:
@@ -198,21 +190,21 @@ class PlaythroughRecorder(BaseRecorder):
         if not self.selected_monkey:
             logging.warning('selectedMonkey unassigned!')
             return
-        name = self.selected_monkey['name']
+        name = self.selected_monkey.name
         if keyboard.is_pressed('space'):
             self._record('retarget', name=name, to=pos)
-        elif self.selected_monkey['type'] == 'mortar':
+        elif self.selected_monkey.type == 'mortar':
             logging.warning('mortar can only be retargeted to a position(tab + space)!')
         else:
             self._record('retarget', name=name)
 
     @BaseRecorder.on(Action.MONKEY_SPECIAL, requires_selected_monkey=True)
-    def _handle_special(self, pos: Point, e: RecordingEventData, selected_monkey: dict[str, str]) -> None:
-        self._record('special', name=selected_monkey['name'])
+    def _handle_special(self, pos: Point, e: RecordingEventData, selected_monkey: MonkeyData) -> None:
+        self._record('special', name=selected_monkey.name)
 
     @BaseRecorder.on(Action.SELL, requires_selected_monkey=True)
-    def _handle_sell(self, pos: Point, e: RecordingEventData, selected_monkey: dict[str, str]) -> None:
-        name = selected_monkey['name']
+    def _handle_sell(self, pos: Point, e: RecordingEventData, selected_monkey: MonkeyData) -> None:
+        name = selected_monkey.name
         self._record('sell', name=name)
         self.placed_monkeys.pop(name, None)
         self.selected_monkey = None
@@ -223,15 +215,15 @@ class PlaythroughRecorder(BaseRecorder):
         idx = self.monkeys_by_type_count.get(placement_type, 0)
         name = f'{placement_type}{idx}'
         self.monkeys_by_type_count[placement_type] = idx + 1
-        self.placed_monkeys[name] = {'name': name, 'type': placement_type, 'pos': pos}
+        self.placed_monkeys[name] = MonkeyData(type=placement_type, name=name, pos=pos)
         if placement_type != 'hero':
             self.selected_monkey = self._get_closest_monkey(pos)['monkey']
 
         self._record('place', type=placement_type, name=name, pos=pos)
 
     @BaseRecorder.on(Action.UPGRADE, requires_selected_monkey=True)
-    def _handle_upgrade(self, pos: Point, e: RecordingEventData, selected_monkey: dict[str, str]) -> None:
-        self._record('upgrade', name=selected_monkey['name'], path=e.path)
+    def _handle_upgrade(self, pos: Point, e: RecordingEventData, selected_monkey: MonkeyData) -> None:
+        self._record('upgrade', name=selected_monkey.name, path=e.path)
 
     @BaseRecorder.on(Action.AWAIT_ROUND)
     def _handle_await_round(self, pos: Point, e: RecordingEventData) -> None:
@@ -252,13 +244,13 @@ class PlaythroughRecorder(BaseRecorder):
         closest_monkey, closest_dist = None, float('inf')
         dist = None
         for monkey in self.placed_monkeys:
-            dist = math.dist(pos, self.placed_monkeys[monkey]['pos'])
+            dist = math.dist(pos, self.placed_monkeys[monkey].pos)
             if dist < closest_dist:
                 closest_monkey = self.placed_monkeys[monkey]
                 closest_dist = dist
 
         for name, monkey in self.placed_monkeys.items():
-            dist = math.dist(pos, monkey['pos'])
+            dist = math.dist(pos, monkey.pos)
             if dist < closest_dist:
                 closest_monkey = monkey
                 closest_dist = dist
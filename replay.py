@@ -1,4 +1,5 @@
 import copy
+import hashlib
 import json
 import os
 import random
@@ -9,22 +10,24 @@ from enum import Enum
 from os.path import exists
 from typing import Any, NotRequired, TypedDict
 
-import ahk
 import cv2
-import keyboard
 import numpy as np
 import pyautogui
 
 # TODO: refactor this atrocity
+from action_plan import ActionPlan
 from helper import (
     PlaythroughResult,
     ValidatedPlaythroughs,
     category_pages,
+    clear_compiled_playthroughs,
     filter_all_available_playthroughs,
     find_map_for_px_pos,
     gamemodes,
     get_all_available_playthroughs,
+    get_compiled_playthrough,
     get_highest_value_playthrough,
+    get_image_areas,
     get_ingame_ocr_segments,
     get_monkey_knowledge_enabled,
     image_areas,
@@ -34,6 +37,7 @@ from helper import (
     maps,
     maps_by_category,
     playthroughs_to_list,
+    set_image_areas_resolution,
     set_medal_unlocked,
     set_monkey_knowledge_enabled,
     sort_playthroughs_by_monkey_money_gain,
@@ -45,11 +49,14 @@ from helper import (
 )
 
 # TODO circular imports!
-from instructions_file_manager import parse_btd6_instruction_file_name, parse_btd6_instructions_file
-from ocr import custom_ocr
-from step_types import Step
+from instructions_file_manager import parse_btd6_instruction_file_name
+from ocr import ocr_cache, ocr_segments
+from utils.asset_bundle import AssetBundle, save_asset_bundle
+from utils.capture import FrameSource, LiveFrameSource, RecordedFrameSource
 from utils.image import cut_image, find_image_in_image
-from utils.utils import create_resolution_string, custom_print, load_json_file, save_json_file, scale_string_coordinate_pairs, send_key, tuple_to_str
+from utils.input_backend import InputBackend, LiveInputBackend, RecordingInputBackend
+from utils.screen_classifier import ScreenClassifier
+from utils.utils import create_resolution_string, custom_print, get_for_resolution, save_json_file, tuple_to_str
 
 # if gamemodes is None:
 # sys.exit('gamemodes is None! did you run setup.py?')
@@ -59,21 +66,133 @@ action_delay = 0.2
 menu_change_delay = 1
 
 
-def get_resolution_dependent_data(monitor_resolution=pyautogui.size()) -> dict[str, Any] | None:
+# all reference images of a resolution in a single memory mapped file, created by pack_assets.py
+ASSET_BUNDLE_FILE = 'assets.npy'
+# resolutions with captured reference images used for deriving the images of other resolutions, in order of preference
+MASTER_RESOLUTIONS = [(2560, 1440), (1920, 1080)]
+DERIVED_ASSETS_DIR = 'cache/assets'
+
+GAME_STATES = ['game_playing_fast', 'game_playing_slow', 'game_paused']
+# maximum number of instas collected from a single collection chest
+MAX_COLLECTION_INSTAS = 20
+
+
+def get_comparison_area(image_areas: dict, category: str, name: str) -> tuple[int, int, int, int]:
+    """Returns the area compared for a comparison image: game state images share one area, screens have their own."""
+    area = image_areas['compare'][category]
+    return tuple(area[name] if isinstance(area, dict) else area)
+
+
+def get_derived_asset_bundle_path(resolution) -> str:
+    return f'{DERIVED_ASSETS_DIR}/{create_resolution_string(resolution)}.npy'
+
+
+def get_master_image_files(master_dir: str) -> list[str]:
+    """Returns the png files of a resolution (relative to its directory) including collection event images."""
+    collection_dir = master_dir + 'collection_events'
+    return [f for f in sorted(os.listdir(master_dir)) if f.endswith('.png')] + [f'collection_events/{f}' for f in (sorted(os.listdir(collection_dir)) if exists(collection_dir) else []) if f.endswith('.png')]
+
+
+def get_derived_assets_fingerprint(resolution) -> str:
+    """Returns a hash of everything the derived asset bundle of a resolution is created from: the images of the master resolutions and the image areas of the resolution."""
+    digest = hashlib.blake2b(json.dumps(get_image_areas(resolution), sort_keys=True).encode(), digest_size=16)
+    for master_resolution in MASTER_RESOLUTIONS:
+        master_dir = f'images/{create_resolution_string(master_resolution)}/'
+        if not exists(master_dir):
+            continue
+        for filename in get_master_image_files(master_dir):
+            digest.update((master_dir + filename).encode())
+            with open(master_dir + filename, 'rb') as fp:
+                digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def get_reference_images_fingerprint(images_dir: str) -> str:
+    """Returns a hash of the names, sizes and modification times of the reference images of a resolution, stored in its asset bundle to detect images changed after packing."""
+    digest = hashlib.blake2b(digest_size=16)
+    for filename in get_master_image_files(images_dir):
+        stat = os.stat(images_dir + filename)
+        digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def derive_asset_bundle(resolution, file_path: str) -> int:
+    """
+    Creates an asset bundle for a resolution without captured reference images by rescaling the images of the master resolutions.
+
+    Each image is taken from the first master resolution having it. Comparison images are rescaled as whole screenshot and cut using the scaled image areas (see helper.get_image_areas), all other images are rescaled by the ratio of the resolutions (masks without interpolation).
+
+    The bundle stores the fingerprint of its sources (see get_derived_assets_fingerprint), so outdated bundles are recreated.
+
+    Returns:
+        int: The number of derived images.
+    """
+    fingerprint = get_derived_assets_fingerprint(resolution)
+    target_image_areas = get_image_areas(resolution)
+    images = {}
+    metadata = {}
+
+    for master_resolution in MASTER_RESOLUTIONS:
+        master_dir = f'images/{create_resolution_string(master_resolution)}/'
+        if not exists(master_dir):
+            continue
+        scale = (resolution[0] / master_resolution[0], resolution[1] / master_resolution[1])
+
+        for filename in get_master_image_files(master_dir):
+            name = filename.removesuffix('.png')
+            if name.startswith('collection_events/'):
+                key = 'collection/' + name.removeprefix('collection_events/')
+            elif name in target_image_areas['compare']['screens']:
+                key = f'compare/screens/{name}'
+            elif name in GAME_STATES:
+                key = f'compare/game_state/{name}'
+            else:
+                key = f'locate/{name}'
+            if key in images:
+                continue
+
+            img = cv2.imread(master_dir + filename)
+            # other full screenshots (e. g. gamemodes_easy.png) aren't used by the script
+            if not key.startswith('compare/') and img.shape[:2] == (master_resolution[1], master_resolution[0]):
+                continue
+            if key.startswith('compare/'):
+                area = get_comparison_area(target_image_areas, *key.split('/')[1:])
+                images[key] = cut_image(cv2.resize(img, tuple(resolution), interpolation=cv2.INTER_AREA), area)
+                metadata[key] = {'area': list(area)}
+            else:
+                size = (max(1, round(img.shape[1] * scale[0])), max(1, round(img.shape[0] * scale[1])))
+                images[key] = cv2.resize(img, size, interpolation=cv2.INTER_NEAREST if name.endswith('_mask') else cv2.INTER_AREA)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    save_asset_bundle(file_path, images, metadata, info={'source': fingerprint})
+    return len(images)
+
+
+def get_resolution_dependent_data(monitor_resolution=pyautogui.size(), use_asset_bundle: bool = True) -> dict[str, Any] | None:
     """
     Loads and returns image data and metadata required for screen and game state recognition,
     based on the provided monitor resolution.
     This function attempts to load required and optional images from a directory corresponding
     to the given resolution. It organizes images into categories for comparison and location
     tasks, and determines which game modes are supported based on the presence of required images.
+    Comparison images are only kept cropped to their compared area. Images are read from the asset
+    bundle if it exists and the reference images didn't change since it was packed (comparison images
+    only if they were cut from the same areas).
+    Resolutions without captured images use images derived from the master resolutions.
+
+    Args:
+        monitor_resolution (tuple[int, int], optional): The resolution to load the images for.
+        use_asset_bundle (bool, optional): Whether to use the asset bundle, if False all images are read from the png files.
 
     Returns:
         dict[str, Any] | None: A dictionary containing:
-            - 'comparisonImages': dict of categorized comparison images loaded as numpy arrays.
+            - 'comparisonImages': dict of categorized comparison images cropped to their compared area (see get_comparison_area).
             - 'locateImages': dict of images for locating UI elements, loaded as numpy arrays.
             - 'supportedModes': dict mapping supported mode names to True.
             - 'resolution': The monitor resolution used.
-        Returns None if required images or directories are missing.
+            - 'screenClassifier': ScreenClassifier recognizing the Screen from a screenshot.
+            - 'gameStateClassifier': ScreenClassifier recognizing the game speed/pause state while ingame.
+        Returns None if required images are missing.
     """
     ComparisonImage = TypedDict('ComparisonImage', {'category': str, 'name': str, 'for': NotRequired[list[str]]})
     LocateImage = TypedDict('LocateImage', {'name': str, 'for': NotRequired[list[str]]})
@@ -90,20 +209,43 @@ def get_resolution_dependent_data(monitor_resolution=pyautogui.size()) -> dict[s
     optional_locate_images: list[LocateImage] = [{'name': 'unknown_insta', 'for': [Mode.CHASE_REWARDS.name]}, {'name': 'unknown_insta_mask', 'for': [Mode.CHASE_REWARDS.name]}]
 
     images_dir = f'images/{create_resolution_string(monitor_resolution)}/'
+    bundle_path = images_dir + ASSET_BUNDLE_FILE
 
     comparison_images: dict[str, dict[str, np.ndarray]] = {}
     locate_images: dict[str, np.ndarray | dict[str, np.ndarray | None]] = {}
 
     if not exists(images_dir):
-        return None
+        # no captured reference images: use images derived from the master resolutions, cached until the master images or image areas change
+        bundle_path = get_derived_asset_bundle_path(monitor_resolution)
+        if not exists(bundle_path) or not use_asset_bundle or AssetBundle(bundle_path).info.get('source') != get_derived_assets_fingerprint(monitor_resolution):
+            print(f'no (up to date) reference images for {create_resolution_string(monitor_resolution)}! deriving them from {", ".join(create_resolution_string(r) for r in MASTER_RESOLUTIONS)}')
+            derive_asset_bundle(monitor_resolution, bundle_path)
 
     supported_modes = dict.fromkeys([e.name for e in Mode], True)
 
+    resolution_image_areas = get_image_areas(monitor_resolution)
+    bundle = AssetBundle(bundle_path) if (use_asset_bundle or not exists(images_dir)) and exists(bundle_path) else None
+    if bundle is not None and exists(images_dir) and bundle.info.get('source') != get_reference_images_fingerprint(images_dir):
+        print(f'{bundle_path} is outdated! reading the reference images instead. rerun pack_assets.py')
+        bundle = None
+
+    def read_image(key: str, full_path: str, area: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
+        if bundle is not None and key in bundle and (area is None or tuple(bundle.get_metadata(key)['area']) == area):
+            return bundle.get(key)
+        if not exists(full_path):
+            return None
+        return cut_image(cv2.imread(full_path), area) if area is not None else cv2.imread(full_path)
+
     def load_images_or_fail(image_meta_list: list[ComparisonImage] | list[LocateImage], target_dict: dict) -> bool:
         for image_info in image_meta_list:
             filename = f'{image_info["name"]}.png'
             full_path = images_dir + filename
-            if not exists(full_path):
+            if 'category' in image_info:
+                area = get_comparison_area(resolution_image_areas, image_info['category'], image_info['name'])
+                img = read_image(f'compare/{image_info["category"]}/{image_info["name"]}', full_path, area)
+            else:
+                img = read_image(f'locate/{image_info["name"]}', full_path)
+            if img is None:
                 # remove modes that are unsupported due to missing images
                 if supported_modes is not None and 'for' in image_info:
                     for mode in image_info['for']:
@@ -111,11 +253,10 @@ def get_resolution_dependent_data(monitor_resolution=pyautogui.size()) -> dict[s
                 else:
                     print(f'{filename} missing!')
                     return False
+            elif 'category' in image_info:
+                target_dict.setdefault(image_info['category'], {})[image_info['name']] = img
             else:
-                if 'category' in image_info:
-                    target_dict.setdefault(image_info['category'], {})[image_info['name']] = cv2.imread(full_path)
-                else:
-                    target_dict[image_info['name']] = cv2.imread(full_path)
+                target_dict[image_info['name']] = img
         return True
 
     if not load_images_or_fail(required_comparison_images, comparison_images):
@@ -128,10 +269,16 @@ def get_resolution_dependent_data(monitor_resolution=pyautogui.size()) -> dict[s
     load_images_or_fail(optional_locate_images, locate_images)
 
     dir_path = images_dir + 'collection_events'
-    if exists(dir_path):
+    if bundle is not None and bundle.keys('collection/'):
+        locate_images['collection'] = {key.removeprefix('collection/'): bundle.get(key) for key in bundle.keys('collection/')}
+    elif exists(dir_path):
         locate_images['collection'] = {f.replace('.png', ''): cv2.imread(f'{dir_path}/{f}') for f in os.listdir(dir_path) if f.endswith('.png')}
 
-    return {'comparisonImages': comparison_images, 'locateImages': locate_images, 'supportedModes': supported_modes, 'resolution': monitor_resolution}
+    screen_classifier = ScreenClassifier([(screen, comparison_images['screens'][name], resolution_image_areas['compare']['screens'][name]) for screen, name in SCREEN_COMPARISONS if name in comparison_images['screens']], successors=SCREEN_TRANSITIONS)
+    # the game state is always one of the references
+    game_state_classifier = ScreenClassifier([(name, comparison_images['game_state'][name], resolution_image_areas['compare']['game_state']) for name in GAME_STATES], threshold=np.inf, confident_threshold=0)
+
+    return {'comparisonImages': comparison_images, 'locateImages': locate_images, 'supportedModes': supported_modes, 'resolution': monitor_resolution, 'screenClassifier': screen_classifier, 'gameStateClassifier': game_state_classifier}
 
 
 class State(Enum):
@@ -166,6 +313,46 @@ class Screen(Enum):
     BTD6_UNFOCUSED = 17
 
 
+# screens recognized by comparing an area of the screenshot to the reference image of the same name
+SCREEN_COMPARISONS = [
+    (Screen.STARTMENU, 'startmenu'),
+    (Screen.MAP_SELECTION, 'map_selection'),
+    (Screen.DIFFICULTY_SELECTION, 'difficulty_selection'),
+    (Screen.GAMEMODE_SELECTION, 'gamemode_selection'),
+    (Screen.HERO_SELECTION, 'hero_selection'),
+    (Screen.INGAME, 'ingame'),
+    (Screen.INGAME_PAUSED, 'ingame_paused'),
+    (Screen.VICTORY_SUMMARY, 'victory_summary'),
+    (Screen.VICTORY, 'victory'),
+    (Screen.DEFEAT, 'defeat'),
+    (Screen.OVERWRITE_SAVE, 'overwrite_save'),
+    (Screen.LEVELUP, 'levelup'),
+    (Screen.APOPALYPSE_HINT, 'apopalypse_hint'),
+    (Screen.ROUND_100_INSTA, 'round_100_insta'),
+    (Screen.COLLECTION_CLAIM_CHEST, 'collection_claim_chest'),
+]
+
+# screens that can follow a screen (besides itself), checked before all other screens
+# maintained by hand, keep it in sync when adding screens or changing the state handlers in main. missing transitions only cost speed: the classifier adds every observed transition and checks all screens if none of the likely ones matches confidently
+SCREEN_TRANSITIONS = {
+    Screen.STARTMENU: [Screen.MAP_SELECTION, Screen.HERO_SELECTION, Screen.COLLECTION_CLAIM_CHEST, Screen.LEVELUP],
+    Screen.MAP_SELECTION: [Screen.DIFFICULTY_SELECTION, Screen.STARTMENU],
+    Screen.DIFFICULTY_SELECTION: [Screen.GAMEMODE_SELECTION, Screen.MAP_SELECTION],
+    Screen.GAMEMODE_SELECTION: [Screen.INGAME, Screen.OVERWRITE_SAVE, Screen.APOPALYPSE_HINT, Screen.DIFFICULTY_SELECTION],
+    Screen.HERO_SELECTION: [Screen.STARTMENU],
+    Screen.INGAME: [Screen.INGAME_PAUSED, Screen.VICTORY_SUMMARY, Screen.DEFEAT, Screen.LEVELUP, Screen.ROUND_100_INSTA],
+    Screen.INGAME_PAUSED: [Screen.INGAME, Screen.STARTMENU],
+    Screen.VICTORY_SUMMARY: [Screen.VICTORY],
+    Screen.VICTORY: [Screen.STARTMENU, Screen.LEVELUP, Screen.COLLECTION_CLAIM_CHEST],
+    Screen.DEFEAT: [Screen.STARTMENU, Screen.INGAME],
+    Screen.OVERWRITE_SAVE: [Screen.INGAME, Screen.APOPALYPSE_HINT, Screen.GAMEMODE_SELECTION],
+    Screen.LEVELUP: [Screen.INGAME, Screen.STARTMENU, Screen.VICTORY_SUMMARY, Screen.VICTORY],
+    Screen.APOPALYPSE_HINT: [Screen.INGAME],
+    Screen.ROUND_100_INSTA: [Screen.INGAME, Screen.VICTORY_SUMMARY],
+    Screen.COLLECTION_CLAIM_CHEST: [Screen.STARTMENU],
+}
+
+
 class Mode(Enum):
     ERROR = 0
     SINGLE_MAP = 1
@@ -193,36 +380,13 @@ def get_gamemode_position(gamemode: str) -> tuple[int, int]:
     return positions[gamemode]
 
 
-def get_next_non_sell_action(steps: list[Step]) -> Step:
-    for step in steps:
-        if step['action'] != 'sell' and step['action'] != 'await_round':
-            return step
-    return {'action': 'nop', 'cost': 0}
-
-
-def get_next_costing_action(steps: list[Step]) -> Step:
-    for step in steps:
-        if step.get('cost', 0) > 0:
-            return step
-    return {'action': 'nop', 'cost': 0}
-
-
-def sum_adjacent_sells(steps: list[Step]) -> int:
-    gain = 0
-    for step in steps:
-        if step['action'] != 'sell':
-            return gain
-        gain += -step.get('cost', 0)
-    return gain
-
-
 exit_after_game = False
 
 
-def set_exit_after_game():
+def set_exit_after_game(input_backend: InputBackend):
     global exit_after_game
-    active_window = ahk.get_active_window()
-    if not active_window or not is_btd6_window(active_window.title):
+    active_window_title = input_backend.get_active_window_title()
+    if not active_window_title or not is_btd6_window(active_window_title):
         return
     custom_print('script will stop after finishing the current game!')
     exit_after_game = True
@@ -236,16 +400,6 @@ def on_signal_interrupt(signum, frame):
 def main():
     signal.signal(signal.SIGINT, on_signal_interrupt)
 
-    rd_data = get_resolution_dependent_data()
-    if not rd_data:
-        print('unsupported resolution! reference images missing!')
-        return
-
-    comparison_images = rd_data['comparisonImages']
-    locate_images = rd_data['locateImages']
-    supported_modes = rd_data['supportedModes']
-    resolution = rd_data['resolution']
-
     all_available_playthroughs = get_all_available_playthroughs(['own_playthroughs'], consider_user_config=True)
     all_available_playthroughs_list = playthroughs_to_list(all_available_playthroughs)
 
@@ -309,6 +463,49 @@ def main():
         parsed_arguments.append('-nv')
         handle_playthrough_validation = ValidatedPlaythroughs.INCLUDE_ALL
 
+    # -frames <path>: play back recorded frames (directory of images or video file) instead of capturing the screen
+    # everything resolution dependent is loaded for the resolution of the frames, so neither the game nor a monitor of that resolution is required
+    frame_source: FrameSource | None = None
+    if len(np.where(argv == '-frames')[0]):
+        i_frames = np.where(argv == '-frames')[0][0]
+        if len(argv) <= i_frames + 1:
+            custom_print('requested playing back recorded frames but no path provided! exiting!')
+            return
+        parsed_arguments += ['-frames', argv[i_frames + 1]]
+        try:
+            frame_source = RecordedFrameSource(str(argv[i_frames + 1]))
+        except FileNotFoundError as e:
+            custom_print(str(e) + ' exiting!')
+            return
+        custom_print('playing back recorded frames (' + create_resolution_string(frame_source.resolution) + ') from ' + str(argv[i_frames + 1]) + '!')
+
+    resolution = frame_source.resolution if frame_source is not None else tuple(pyautogui.size())
+    rd_data = get_resolution_dependent_data(resolution)
+    if not rd_data:
+        print('unsupported resolution! reference images missing!')
+        return
+
+    locate_images = rd_data['locateImages']
+    supported_modes = rd_data['supportedModes']
+    screen_classifier = rd_data['screenClassifier']
+    game_state_classifier = rd_data['gameStateClassifier']
+
+    if frame_source is not None:
+        set_image_areas_resolution(resolution)
+    else:
+        frame_source = LiveFrameSource(resolution)
+
+    # -mockinput <log file>: don't send any input, log it (and the decision latency per iteration) to the log file instead. delays are skipped
+    input_backend: InputBackend = LiveInputBackend()
+    if len(np.where(argv == '-mockinput')[0]):
+        i_mockinput = np.where(argv == '-mockinput')[0][0]
+        if len(argv) <= i_mockinput + 1:
+            custom_print('requested mocking input but no log file provided! exiting!')
+            return
+        parsed_arguments += ['-mockinput', argv[i_mockinput + 1]]
+        input_backend = RecordingInputBackend(str(argv[i_mockinput + 1]))
+        custom_print('mocking input! actions will be logged to ' + str(argv[i_mockinput + 1]) + '!')
+
     i_arg = 1
     if len(argv) <= i_arg:
         custom_print('arguments missing! Usage: py replay.py <mode> <mode arguments...> <flags>')
@@ -379,7 +576,7 @@ def main():
         else:
             custom_print('requested playthrough ' + str(argv[i_arg + 1]) + ' not found! exiting!')
             return
-        map_config = parse_btd6_instructions_file(filename, gamemode=gamemode)
+        map_config = get_compiled_playthrough(filename, resolution, gamemode=gamemode)
 
         mode = Mode.SINGLE_MAP
         if instruction_offset == -1:
@@ -580,12 +777,7 @@ def main():
 
         custom_print('Mode: validating monkey costs' + (' including heroes' if include_heroes else '') + '!')
 
-        all_test_positions = load_json_file('test_positions.json')
-
-        if create_resolution_string() in all_test_positions:
-            test_positions = all_test_positions[create_resolution_string()]
-        else:
-            test_positions = json.loads(scale_string_coordinate_pairs(json.dumps(all_test_positions['2560x1440']), (2560, 1440), pyautogui.size()))
+        test_positions = get_for_resolution('test_positions.json', frame_source.resolution)
 
         selected_map = None
         for map_name in test_positions:
@@ -700,7 +892,7 @@ def main():
     if uses_all_available_playthroughs_list and len(all_available_playthroughs_list) == 0:
         custom_print('no playthroughs matching requirements found!')
 
-    keyboard.add_hotkey('ctrl+space', set_exit_after_game)
+    input_backend.add_hotkey('ctrl+space', set_exit_after_game, args=(input_backend,))
 
     objectives = copy.deepcopy(original_objectives)
 
@@ -737,135 +929,108 @@ def main():
     unknown_screen_has_waited = False
 
     segment_coordinates = None
+    action_plan = None
 
-    while True:
-        screenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
+    # only the areas used for screen/game state recognition and ocr are captured each iteration
+    recognition_regions = [*image_areas['compare']['screens'].values(), image_areas['compare']['game_state']]
+
+    # the input log of -mockinput is also written when the loop is left early (e. g. exits on errors)
+    try:
+        while True:
+            if not frame_source.advance():
+                custom_print(f'no recorded frames left after {frame_source.frames_played} frames! exiting!')
+                break
+            screenshot = frame_source.grab_regions(recognition_regions + (list(segment_coordinates.values()) if segment_coordinates else []))
+            input_backend.start_tick()
 
-        screen = Screen.UNKNOWN
-        active_window = ahk.get_active_window()
-        if not active_window or not is_btd6_window(active_window.title):
             screen = Screen.BTD6_UNFOCUSED
-        else:
-            best_match_diff = None
-            for screen_cfg in [
-                (Screen.STARTMENU, comparison_images['screens']['startmenu'], image_areas['compare']['screens']['startmenu']),
-                (Screen.MAP_SELECTION, comparison_images['screens']['map_selection'], image_areas['compare']['screens']['map_selection']),
-                (Screen.DIFFICULTY_SELECTION, comparison_images['screens']['difficulty_selection'], image_areas['compare']['screens']['difficulty_selection']),
-                (Screen.GAMEMODE_SELECTION, comparison_images['screens']['gamemode_selection'], image_areas['compare']['screens']['gamemode_selection']),
-                (Screen.HERO_SELECTION, comparison_images['screens']['hero_selection'], image_areas['compare']['screens']['hero_selection']),
-                (Screen.INGAME, comparison_images['screens']['ingame'], image_areas['compare']['screens']['ingame']),
-                (Screen.INGAME_PAUSED, comparison_images['screens']['ingame_paused'], image_areas['compare']['screens']['ingame_paused']),
-                (Screen.VICTORY_SUMMARY, comparison_images['screens']['victory_summary'], image_areas['compare']['screens']['victory_summary']),
-                (Screen.VICTORY, comparison_images['screens']['victory'], image_areas['compare']['screens']['victory']),
-                (Screen.DEFEAT, comparison_images['screens']['defeat'], image_areas['compare']['screens']['defeat']),
-                (Screen.OVERWRITE_SAVE, comparison_images['screens']['overwrite_save'], image_areas['compare']['screens']['overwrite_save']),
-                (Screen.LEVELUP, comparison_images['screens']['levelup'], image_areas['compare']['screens']['levelup']),
-                (Screen.APOPALYPSE_HINT, comparison_images['screens']['apopalypse_hint'], image_areas['compare']['screens']['apopalypse_hint']),
-                (Screen.ROUND_100_INSTA, comparison_images['screens']['round_100_insta'], image_areas['compare']['screens']['round_100_insta']),
-                (Screen.COLLECTION_CLAIM_CHEST, comparison_images['screens']['collection_claim_chest'], image_areas['compare']['screens']['collection_claim_chest']),
-            ]:
-                diff = cv2.matchTemplate(cut_image(screenshot, screen_cfg[2]), cut_image(screen_cfg[1], screen_cfg[2]), cv2.TM_SQDIFF_NORMED)[0][0]
-                if diff < 0.05 and (best_match_diff is None or diff < best_match_diff):
-                    best_match_diff = diff
-                    screen = screen_cfg[0]
-
-        if screen != last_screen:
-            custom_print('screen ' + screen.name + '!')
-
-        if screen == Screen.BTD6_UNFOCUSED:
-            pass
-        # don't do anything when ctrl is pressed: useful for alt + tab / sending SIGINT(ctrl + c) to the script
-        elif keyboard.is_pressed('ctrl'):
-            pass
-        elif state == State.MANAGE_OBJECTIVES:
-            custom_print('entered objective management!')
-
-            if exit_after_game:
-                state = State.EXIT
-                continue
+            active_window_title = input_backend.get_active_window_title()
+            if active_window_title and is_btd6_window(active_window_title):
+                screen = screen_classifier.classify(screenshot, last_screen, Screen.UNKNOWN)
 
-            if mode == Mode.VALIDATE_PLAYTHROUGHS:
-                if validation_result is not None:
-                    custom_print('validation result: playthrough ' + last_playthrough['filename'] + ' is ' + ('valid' if validation_result else 'invalid') + '!')
-                    update_playthrough_validation_status(last_playthrough['filename'], validation_result)
-                if len(all_available_playthroughs_list):
-                    playthrough = all_available_playthroughs_list.pop(0)
-                    custom_print('validation playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
-
-                    gamemode = is_sandbox_unlocked(playthrough['fileConfig']['map'])
-                    if gamemode:
-                        map_config = parse_btd6_instructions_file(playthrough['filename'], gamemode=gamemode)
-                        objectives = []
-                        objectives.append({'type': State.GOTO_HOME})
-                        if 'hero' in map_config and last_hero_selected != map_config['hero']:
-                            objectives.append({'type': State.SELECT_HERO, 'mapConfig': map_config})
-                            objectives.append({'type': State.GOTO_HOME})
-                        objectives.append({'type': State.GOTO_INGAME, 'mapConfig': map_config})
-                        objectives.append({'type': State.INGAME, 'mapConfig': map_config})
-                        objectives.append({'type': State.MANAGE_OBJECTIVES})
+            if screen != last_screen:
+                custom_print('screen ' + screen.name + '!')
 
-                        validation_result = True
-                        last_playthrough = playthrough
+            if screen == Screen.BTD6_UNFOCUSED:
+                pass
+            # don't do anything when ctrl is pressed: useful for alt + tab / sending SIGINT(ctrl + c) to the script
+            elif input_backend.is_ctrl_pressed():
+                pass
+            elif state == State.MANAGE_OBJECTIVES:
+                custom_print('entered objective management!')
+
+                if exit_after_game:
+                    state = State.EXIT
+                    continue
+
+                if mode == Mode.VALIDATE_PLAYTHROUGHS:
+                    if validation_result is not None:
+                        custom_print('validation result: playthrough ' + last_playthrough['filename'] + ' is ' + ('valid' if validation_result else 'invalid') + '!')
+                        update_playthrough_validation_status(last_playthrough['filename'], validation_result, create_resolution_string(resolution))
+                    if len(all_available_playthroughs_list):
+                        playthrough = all_available_playthroughs_list.pop(0)
+                        custom_print('validation playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
+
+                        gamemode = is_sandbox_unlocked(playthrough['fileConfig']['map'])
+                        if gamemode:
+                            map_config = get_compiled_playthrough(playthrough['filename'], resolution, gamemode=gamemode)
+                            objectives = []
+                            objectives.append({'type': State.GOTO_HOME})
+                            if 'hero' in map_config and last_hero_selected != map_config['hero']:
+                                objectives.append({'type': State.SELECT_HERO, 'mapConfig': map_config})
+                                objectives.append({'type': State.GOTO_HOME})
+                            objectives.append({'type': State.GOTO_INGAME, 'mapConfig': map_config})
+                            objectives.append({'type': State.INGAME, 'mapConfig': map_config})
+                            objectives.append({'type': State.MANAGE_OBJECTIVES})
+
+                            validation_result = True
+                            last_playthrough = playthrough
+                        else:
+                            custom_print('missing sandbox access for ' + playthrough['fileConfig']['map'])
+                            objectives = []
+                            objectives.append({'type': State.MANAGE_OBJECTIVES})
                     else:
-                        custom_print('missing sandbox access for ' + playthrough['fileConfig']['map'])
                         objectives = []
-                        objectives.append({'type': State.MANAGE_OBJECTIVES})
-                else:
-                    objectives = []
-                    objectives.append({'type': State.EXIT})
-            elif mode == Mode.VALIDATE_COSTS:
-                old_towers = copy.deepcopy(towers)
-                changes = 0
-                for monkey_type in costs['monkeys']:
-                    if costs['monkeys'][monkey_type]['base'] and costs['monkeys'][monkey_type]['base'] != old_towers['monkeys'][monkey_type]['base']:
-                        print(f'{monkey_type} base cost: {old_towers["monkeys"][monkey_type]["base"]} -> {int(costs["monkeys"][monkey_type]["base"])}')
-                        towers['monkeys'][monkey_type]['base'] = int(costs['monkeys'][monkey_type]['base'])
-                        changes += 1
-                    for i_path in range(0, 3):
-                        for i_upgrade in range(0, 5):
-                            if costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] and costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] != old_towers['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade]:
-                                print(f'{monkey_type} path {i_path + 1} upgrade {i_upgrade + 1} cost: {old_towers["monkeys"][monkey_type]["upgrades"][i_path][i_upgrade]} -> {int(costs["monkeys"][monkey_type]["upgrades"][i_path][i_upgrade])}')
-                                towers['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] = int(costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade])
-                                changes += 1
-                if 'heroes' in costs:
-                    for hero in costs['heroes']:
-                        if costs['heroes'][hero]['base'] and costs['heroes'][hero]['base'] != old_towers['heroes'][hero]['base']:
-                            print(f'hero {hero} base cost: {old_towers["heroes"][hero]["base"]} -> {int(costs["heroes"][hero]["base"])}')
-                            towers['heroes'][hero]['base'] = int(costs['heroes'][hero]['base'])
+                        objectives.append({'type': State.EXIT})
+                elif mode == Mode.VALIDATE_COSTS:
+                    old_towers = copy.deepcopy(towers)
+                    changes = 0
+                    for monkey_type in costs['monkeys']:
+                        if costs['monkeys'][monkey_type]['base'] and costs['monkeys'][monkey_type]['base'] != old_towers['monkeys'][monkey_type]['base']:
+                            print(f'{monkey_type} base cost: {old_towers["monkeys"][monkey_type]["base"]} -> {int(costs["monkeys"][monkey_type]["base"])}')
+                            towers['monkeys'][monkey_type]['base'] = int(costs['monkeys'][monkey_type]['base'])
                             changes += 1
+                        for i_path in range(0, 3):
+                            for i_upgrade in range(0, 5):
+                                if costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] and costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] != old_towers['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade]:
+                                    print(f'{monkey_type} path {i_path + 1} upgrade {i_upgrade + 1} cost: {old_towers["monkeys"][monkey_type]["upgrades"][i_path][i_upgrade]} -> {int(costs["monkeys"][monkey_type]["upgrades"][i_path][i_upgrade])}')
+                                    towers['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade] = int(costs['monkeys'][monkey_type]['upgrades'][i_path][i_upgrade])
+                                    changes += 1
+                    if 'heroes' in costs:
+                        for hero in costs['heroes']:
+                            if costs['heroes'][hero]['base'] and costs['heroes'][hero]['base'] != old_towers['heroes'][hero]['base']:
+                                print(f'hero {hero} base cost: {old_towers["heroes"][hero]["base"]} -> {int(costs["heroes"][hero]["base"])}')
+                                towers['heroes'][hero]['base'] = int(costs['heroes'][hero]['base'])
+                                changes += 1
 
-                if changes:
-                    print(f'updating "towers.json" with {changes} changes!')
-
-                    save_json_file('towers.json', towers)
-                    save_json_file('towers_backup.json', old_towers)
-                else:
-                    print('no price changes in comparison to "towers.json" detected!')
+                    if changes:
+                        print(f'updating "towers.json" with {changes} changes!')
 
-                return
-            elif repeat_objectives or games_played == 0:
-                if mode == Mode.SINGLE_MAP:
-                    objectives = copy.deepcopy(original_objectives)
-                elif mode == Mode.RANDOM_MAP or mode == Mode.XP_FARMING or mode == Mode.MM_FARMING:
-                    objectives = []
-                    playthrough = random.choice(all_available_playthroughs_list)
-                    custom_print('random playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
-                    map_config = parse_btd6_instructions_file(playthrough['filename'], gamemode=playthrough['gamemode'])
+                        save_json_file('towers.json', towers)
+                        clear_compiled_playthroughs()
+                        save_json_file('towers_backup.json', old_towers)
+                    else:
+                        print('no price changes in comparison to "towers.json" detected!')
 
-                    objectives.append({'type': State.GOTO_HOME})
-                    if 'hero' in map_config and last_hero_selected != map_config['hero']:
-                        objectives.append({'type': State.SELECT_HERO, 'mapConfig': map_config})
-                        objectives.append({'type': State.GOTO_HOME})
-                    objectives.append({'type': State.GOTO_INGAME, 'mapConfig': map_config})
-                    objectives.append({'type': State.INGAME, 'mapConfig': map_config})
-                    objectives.append({'type': State.MANAGE_OBJECTIVES})
-                    last_playthrough = playthrough
-                elif mode == Mode.CHASE_REWARDS:
-                    objectives = []
-                    if increased_rewards_playthrough:
-                        playthrough = increased_rewards_playthrough
-                        custom_print('highest reward playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
-                        map_config = parse_btd6_instructions_file(playthrough['filename'], gamemode=playthrough['gamemode'])
+                    return
+                elif repeat_objectives or games_played == 0:
+                    if mode == Mode.SINGLE_MAP:
+                        objectives = copy.deepcopy(original_objectives)
+                    elif mode == Mode.RANDOM_MAP or mode == Mode.XP_FARMING or mode == Mode.MM_FARMING:
+                        objectives = []
+                        playthrough = random.choice(all_available_playthroughs_list)
+                        custom_print('random playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
+                        map_config = get_compiled_playthrough(playthrough['filename'], resolution, gamemode=playthrough['gamemode'])
 
                         objectives.append({'type': State.GOTO_HOME})
                         if 'hero' in map_config and last_hero_selected != map_config['hero']:
@@ -874,473 +1039,481 @@ def main():
                         objectives.append({'type': State.GOTO_INGAME, 'mapConfig': map_config})
                         objectives.append({'type': State.INGAME, 'mapConfig': map_config})
                         objectives.append({'type': State.MANAGE_OBJECTIVES})
-                        increased_rewards_playthrough = None
                         last_playthrough = playthrough
+                    elif mode == Mode.CHASE_REWARDS:
+                        objectives = []
+                        if increased_rewards_playthrough:
+                            playthrough = increased_rewards_playthrough
+                            custom_print('highest reward playthrough chosen: ' + playthrough['fileConfig']['map'] + ' on ' + playthrough['gamemode'] + ' (' + playthrough['filename'] + ')')
+                            map_config = get_compiled_playthrough(playthrough['filename'], resolution, gamemode=playthrough['gamemode'])
+
+                            objectives.append({'type': State.GOTO_HOME})
+                            if 'hero' in map_config and last_hero_selected != map_config['hero']:
+                                objectives.append({'type': State.SELECT_HERO, 'mapConfig': map_config})
+                                objectives.append({'type': State.GOTO_HOME})
+                            objectives.append({'type': State.GOTO_INGAME, 'mapConfig': map_config})
+                            objectives.append({'type': State.INGAME, 'mapConfig': map_config})
+                            objectives.append({'type': State.MANAGE_OBJECTIVES})
+                            increased_rewards_playthrough = None
+                            last_playthrough = playthrough
+                        else:
+                            objectives.append({'type': State.GOTO_HOME})
+                            objectives.append({'type': State.FIND_HARDEST_INCREASED_REWARDS_MAP})
+                            objectives.append({'type': State.MANAGE_OBJECTIVES})
                     else:
-                        objectives.append({'type': State.GOTO_HOME})
-                        objectives.append({'type': State.FIND_HARDEST_INCREASED_REWARDS_MAP})
-                        objectives.append({'type': State.MANAGE_OBJECTIVES})
+                        objectives = copy.deepcopy(original_objectives)
                 else:
-                    objectives = copy.deepcopy(original_objectives)
-            else:
-                objectives = []
-                objectives.append({'type': State.EXIT})
-
-            state = objectives[0]['type']
-            last_state_transition_successful = True
-            objective_failed = False
-        elif state == State.UNDEFINED:
-            custom_print('entered state management!')
-            if exit_after_game:
-                state = State.EXIT
-            if objective_failed:
-                custom_print('objective failed on step ' + objectives[0]['type'].name + '(screen ' + last_screen.name + ')!')
-                state = State.MANAGE_OBJECTIVES if repeat_objectives else State.EXIT
-            elif not last_state_transition_successful:
+                    objectives = []
+                    objectives.append({'type': State.EXIT})
+
                 state = objectives[0]['type']
-                if 'mapConfig' in objectives[0]:
-                    map_config = objectives[0]['mapConfig']
                 last_state_transition_successful = True
-            elif last_state_transition_successful and len(objectives):
-                objectives.pop(0)
-                state = objectives[0]['type']
-                if 'mapConfig' in objectives[0]:
-                    map_config = objectives[0]['mapConfig']
-            else:
-                state = State.EXIT
-        elif state == State.IDLE:
-            pass
-        elif state == State.EXIT:
-            custom_print('goal EXIT! exiting!')
-            return
-        elif state == State.GOTO_HOME:
-            custom_print('current screen: ' + screen.name)
-            if screen == Screen.STARTMENU:
-                custom_print('goal GOTO_HOME fulfilled!')
-                state = State.UNDEFINED
-            elif screen == Screen.UNKNOWN:
-                if last_screen == Screen.UNKNOWN and unknown_screen_has_waited:
-                    unknown_screen_has_waited = False
-                    send_key('{Esc}')
+                objective_failed = False
+            elif state == State.UNDEFINED:
+                custom_print('entered state management!')
+                if exit_after_game:
+                    state = State.EXIT
+                if objective_failed:
+                    custom_print('objective failed on step ' + objectives[0]['type'].name + '(screen ' + last_screen.name + ')!')
+                    state = State.MANAGE_OBJECTIVES if repeat_objectives else State.EXIT
+                elif not last_state_transition_successful:
+                    state = objectives[0]['type']
+                    if 'mapConfig' in objectives[0]:
+                        map_config = objectives[0]['mapConfig']
+                    last_state_transition_successful = True
+                elif last_state_transition_successful and len(objectives):
+                    objectives.pop(0)
+                    state = objectives[0]['type']
+                    if 'mapConfig' in objectives[0]:
+                        map_config = objectives[0]['mapConfig']
                 else:
-                    unknown_screen_has_waited = True
-                    time.sleep(2)
-            elif screen == Screen.INGAME:
-                send_key('{Esc}')
-            elif screen == Screen.INGAME_PAUSED:
-                pyautogui.click(image_areas['click']['screen_ingame_paused_button_home'])
-            elif screen in [Screen.HERO_SELECTION, Screen.GAMEMODE_SELECTION, Screen.DIFFICULTY_SELECTION, Screen.MAP_SELECTION]:
-                send_key('{Esc}')
-            elif screen == Screen.DEFEAT:
-                result = cv2.matchTemplate(screenshot, locate_images['button_home'], cv2.TM_SQDIFF_NORMED)
-                pyautogui.click(cv2.minMaxLoc(result)[2])
-            elif screen == Screen.VICTORY_SUMMARY:
-                pyautogui.click(image_areas['click']['screen_victory_summary_button_next'])
-            elif screen == Screen.VICTORY:
-                pyautogui.click(image_areas['click']['screen_victory_button_home'])
-            elif screen == Screen.OVERWRITE_SAVE:
-                send_key('{Esc}')
-            elif screen == Screen.LEVELUP:
-                pyautogui.click(100, 100)
-                time.sleep(menu_change_delay)
-                pyautogui.click(100, 100)
-            elif screen == Screen.ROUND_100_INSTA:
-                pyautogui.click(100, 100)
-                time.sleep(menu_change_delay)
-            elif screen == Screen.COLLECTION_CLAIM_CHEST:
-                pyautogui.click(image_areas['click']['collection_claim_chest'])
-                time.sleep(menu_change_delay * 2)
-                while True:
-                    new_screenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
-                    result = [cv2.minMaxLoc(cv2.matchTemplate(new_screenshot, locate_images['unknown_insta'], cv2.TM_SQDIFF_NORMED, mask=locate_images['unknown_insta_mask']))[i] for i in [0, 2]]
-                    if result[0] < 0.01:
-                        pyautogui.click(result[1])
-                        time.sleep(menu_change_delay)
-                        pyautogui.click(result[1])
-                        time.sleep(menu_change_delay)
-                    else:
-                        break
-                pyautogui.click(round(resolution[0] / 2), round(resolution[1] / 2))
-                time.sleep(menu_change_delay)
-                send_key('{Esc}')
-            elif screen == Screen.APOPALYPSE_HINT:
-                pyautogui.click(image_areas['click']['gamemode_apopalypse_message_confirmation'])
-        elif state == State.GOTO_INGAME:
-            if map_config is None:
-                custom_print('Error: mapConfig is None in GOTO_INGAME state!')
-                sys.exit(1)
-
-            if screen == Screen.STARTMENU:
-                pyautogui.click(image_areas['click']['screen_startmenu_button_play'])
-                time.sleep(menu_change_delay)
-                if map_config['category'] == 'beginner':
-                    pyautogui.click(image_areas['click']['map_categories']['advanced'])
-                    time.sleep(menu_change_delay)
-                    pyautogui.click(image_areas['click']['map_categories'][map_config['category']])
-                    time.sleep(menu_change_delay)
-                else:
-                    pyautogui.click(image_areas['click']['map_categories']['beginner'])
-                    time.sleep(menu_change_delay)
-                    pyautogui.click(image_areas['click']['map_categories'][map_config['category']])
-                    time.sleep(menu_change_delay)
-                tmp_clicks = map_config['page']
-                while tmp_clicks > 0:
-                    pyautogui.click(image_areas['click']['map_categories'][map_config['category']])
-                    tmp_clicks -= 1
-                    time.sleep(menu_change_delay)
-                pyautogui.click(image_areas['click']['map_positions'][map_config['pos']])
-                time.sleep(menu_change_delay)
-                pyautogui.click(image_areas['click']['gamedifficulty_positions'][map_config['difficulty']])
-                time.sleep(menu_change_delay)
-                pyautogui.click(get_gamemode_position(map_config['gamemode']))
-            elif screen == Screen.OVERWRITE_SAVE:
-                pyautogui.click(image_areas['click']['screen_overwrite_save_button_ok'])
-            elif screen == Screen.APOPALYPSE_HINT:
-                pyautogui.click(image_areas['click']['gamemode_apopalypse_message_confirmation'])
-            elif screen == Screen.INGAME:
-                custom_print('goal GOTO_INGAME fulfilled!')
-                custom_print('game: ' + map_config['map'] + ' - ' + map_config['difficulty'])
-                segment_coordinates = get_ingame_ocr_segments(map_config)
-                iteration_balances = []
-                if log_stats:
-                    last_playthrough_stats = {'gamemode': map_config['gamemode'], 'time': [], 'result': PlaythroughResult.UNDEFINED}
-                    last_playthrough_stats['time'].append(('start', time.time()))
-                last_iteration_balance = -1
-                last_iteration_cost = 0
-                state = State.UNDEFINED
-            elif screen == Screen.UNKNOWN:
-                pass
-            else:
-                custom_print('task GOTO_INGAME, but not in startmenu!')
-                state = State.GOTO_HOME
-                last_state_transition_successful = False
-        elif state == State.SELECT_HERO:
-            if map_config is None:
-                custom_print('Error: mapConfig is None in SELECT_HERO state!')
-                sys.exit(1)
-
-            if screen == Screen.STARTMENU:
-                pyautogui.click(image_areas['click']['screen_startmenu_button_hero_selection'])
-                time.sleep(menu_change_delay)
-                pyautogui.click(image_areas['click']['hero_positions'][map_config['hero']])
-                time.sleep(menu_change_delay)
-                pyautogui.click(image_areas['click']['screen_hero_selection_select_hero'])
-                custom_print('goal SELECT_HERO ' + map_config['hero'] + ' fulfilled!')
-                last_hero_selected = map_config['hero']
-                state = State.UNDEFINED
-            elif screen == Screen.UNKNOWN:
+                    state = State.EXIT
+            elif state == State.IDLE:
                 pass
-            else:
-                custom_print('task SELECT_HERO, but not in startmenu!')
-                state = State.GOTO_HOME
-                last_state_transition_successful = False
-        elif state == State.FIND_HARDEST_INCREASED_REWARDS_MAP:
-            if screen == Screen.STARTMENU:
-                pyautogui.click(image_areas['click']['screen_startmenu_button_play'])
-                time.sleep(menu_change_delay)
-
-                if category_restriction:
-                    pyautogui.click(image_areas['click']['map_categories'][('advanced' if category_restriction == 'beginner' else 'beginner')])
-                    time.sleep(menu_change_delay)
-
-                    map_name = None
-                    for page in range(0, category_pages[category_restriction]):
-                        pyautogui.click(image_areas['click']['map_categories'][category_restriction])
-                        if collection_event == 'golden_bloon':
-                            time.sleep(4)
+            elif state == State.EXIT:
+                custom_print('goal EXIT! exiting!')
+                break
+            elif state == State.GOTO_HOME:
+                custom_print('current screen: ' + screen.name)
+                if screen == Screen.STARTMENU:
+                    custom_print('goal GOTO_HOME fulfilled!')
+                    state = State.UNDEFINED
+                elif screen == Screen.UNKNOWN:
+                    if last_screen == Screen.UNKNOWN and unknown_screen_has_waited:
+                        unknown_screen_has_waited = False
+                        input_backend.send_key('{Esc}')
+                    else:
+                        unknown_screen_has_waited = True
+                        input_backend.sleep(2)
+                elif screen == Screen.INGAME:
+                    input_backend.send_key('{Esc}')
+                elif screen == Screen.INGAME_PAUSED:
+                    input_backend.click(image_areas['click']['screen_ingame_paused_button_home'])
+                elif screen in [Screen.HERO_SELECTION, Screen.GAMEMODE_SELECTION, Screen.DIFFICULTY_SELECTION, Screen.MAP_SELECTION]:
+                    input_backend.send_key('{Esc}')
+                elif screen == Screen.DEFEAT:
+                    result = cv2.matchTemplate(frame_source.grab(), locate_images['button_home'], cv2.TM_SQDIFF_NORMED)
+                    input_backend.click(cv2.minMaxLoc(result)[2])
+                elif screen == Screen.VICTORY_SUMMARY:
+                    input_backend.click(image_areas['click']['screen_victory_summary_button_next'])
+                elif screen == Screen.VICTORY:
+                    input_backend.click(image_areas['click']['screen_victory_button_home'])
+                elif screen == Screen.OVERWRITE_SAVE:
+                    input_backend.send_key('{Esc}')
+                elif screen == Screen.LEVELUP:
+                    input_backend.click((100, 100))
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click((100, 100))
+                elif screen == Screen.ROUND_100_INSTA:
+                    input_backend.click((100, 100))
+                    input_backend.sleep(menu_change_delay)
+                elif screen == Screen.COLLECTION_CLAIM_CHEST:
+                    input_backend.click(image_areas['click']['collection_claim_chest'])
+                    input_backend.sleep(menu_change_delay * 2)
+                    # bounded, so a frame that keeps showing an insta (e. g. recorded frames) can't stall the bot
+                    for _ in range(MAX_COLLECTION_INSTAS):
+                        new_screenshot = frame_source.grab(advance=True)
+                        result = [cv2.minMaxLoc(cv2.matchTemplate(new_screenshot, locate_images['unknown_insta'], cv2.TM_SQDIFF_NORMED, mask=locate_images['unknown_insta_mask']))[i] for i in [0, 2]]
+                        if result[0] < 0.01:
+                            input_backend.click(result[1])
+                            input_backend.sleep(menu_change_delay)
+                            input_backend.click(result[1])
+                            input_backend.sleep(menu_change_delay)
                         else:
-                            time.sleep(menu_change_delay)
-                        new_screenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
-                        result = find_image_in_image(new_screenshot, locate_images['collection'][collection_event])
-                        if result[0] < 0.05:
-                            map_name = find_map_for_px_pos(category_restriction, page, result[1])
                             break
-                    if not map_name:
-                        custom_print('no maps with increased rewards found! exiting!')
-                        return
-                    custom_print('best map: ' + map_name)
-                    increased_rewards_playthrough = get_highest_value_playthrough(all_available_playthroughs, map_name, playthrough_log)
-                    if not increased_rewards_playthrough:
-                        custom_print('no playthroughs for map found! exiting!')
-                        return
+                    input_backend.click((round(resolution[0] / 2), round(resolution[1] / 2)))
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.send_key('{Esc}')
+                elif screen == Screen.APOPALYPSE_HINT:
+                    input_backend.click(image_areas['click']['gamemode_apopalypse_message_confirmation'])
+            elif state == State.GOTO_INGAME:
+                if map_config is None:
+                    custom_print('Error: mapConfig is None in GOTO_INGAME state!')
+                    sys.exit(1)
+
+                if screen == Screen.STARTMENU:
+                    input_backend.click(image_areas['click']['screen_startmenu_button_play'])
+                    input_backend.sleep(menu_change_delay)
+                    if map_config['category'] == 'beginner':
+                        input_backend.click(image_areas['click']['map_categories']['advanced'])
+                        input_backend.sleep(menu_change_delay)
+                        input_backend.click(image_areas['click']['map_categories'][map_config['category']])
+                        input_backend.sleep(menu_change_delay)
+                    else:
+                        input_backend.click(image_areas['click']['map_categories']['beginner'])
+                        input_backend.sleep(menu_change_delay)
+                        input_backend.click(image_areas['click']['map_categories'][map_config['category']])
+                        input_backend.sleep(menu_change_delay)
+                    tmp_clicks = map_config['page']
+                    while tmp_clicks > 0:
+                        input_backend.click(image_areas['click']['map_categories'][map_config['category']])
+                        tmp_clicks -= 1
+                        input_backend.sleep(menu_change_delay)
+                    input_backend.click(image_areas['click']['map_positions'][map_config['pos']])
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click(image_areas['click']['gamedifficulty_positions'][map_config['difficulty']])
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click(get_gamemode_position(map_config['gamemode']))
+                elif screen == Screen.OVERWRITE_SAVE:
+                    input_backend.click(image_areas['click']['screen_overwrite_save_button_ok'])
+                elif screen == Screen.APOPALYPSE_HINT:
+                    input_backend.click(image_areas['click']['gamemode_apopalypse_message_confirmation'])
+                elif screen == Screen.INGAME:
+                    custom_print('goal GOTO_INGAME fulfilled!')
+                    custom_print('game: ' + map_config['map'] + ' - ' + map_config['difficulty'])
+                    segment_coordinates = get_ingame_ocr_segments(map_config)
+                    ocr_cache.clear()
+                    iteration_balances = []
+                    if log_stats:
+                        last_playthrough_stats = {'gamemode': map_config['gamemode'], 'time': [], 'result': PlaythroughResult.UNDEFINED}
+                        last_playthrough_stats['time'].append(('start', time.time()))
+                    last_iteration_balance = -1
+                    last_iteration_cost = 0
+                    state = State.UNDEFINED
+                elif screen == Screen.UNKNOWN:
+                    pass
+                else:
+                    custom_print('task GOTO_INGAME, but not in startmenu!')
+                    state = State.GOTO_HOME
+                    last_state_transition_successful = False
+            elif state == State.SELECT_HERO:
+                if map_config is None:
+                    custom_print('Error: mapConfig is None in SELECT_HERO state!')
+                    sys.exit(1)
+
+                if screen == Screen.STARTMENU:
+                    input_backend.click(image_areas['click']['screen_startmenu_button_hero_selection'])
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click(image_areas['click']['hero_positions'][map_config['hero']])
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click(image_areas['click']['screen_hero_selection_select_hero'])
+                    custom_print('goal SELECT_HERO ' + map_config['hero'] + ' fulfilled!')
+                    last_hero_selected = map_config['hero']
+                    state = State.UNDEFINED
+                elif screen == Screen.UNKNOWN:
+                    pass
                 else:
-                    for i, category in enumerate(reversed(list(maps_by_category.keys()))):
-                        if i == 0:
-                            pyautogui.click(image_areas['click']['map_categories'][('advanced' if category == 'beginner' else 'beginner')])
-                            time.sleep(menu_change_delay)
+                    custom_print('task SELECT_HERO, but not in startmenu!')
+                    state = State.GOTO_HOME
+                    last_state_transition_successful = False
+            elif state == State.FIND_HARDEST_INCREASED_REWARDS_MAP:
+                if screen == Screen.STARTMENU:
+                    input_backend.click(image_areas['click']['screen_startmenu_button_play'])
+                    input_backend.sleep(menu_change_delay)
+
+                    if category_restriction:
+                        input_backend.click(image_areas['click']['map_categories'][('advanced' if category_restriction == 'beginner' else 'beginner')])
+                        input_backend.sleep(menu_change_delay)
 
                         map_name = None
-                        for page in range(0, category_pages[category]):
-                            pyautogui.click(image_areas['click']['map_categories'][category])
+                        for page in range(0, category_pages[category_restriction]):
+                            input_backend.click(image_areas['click']['map_categories'][category_restriction])
                             if collection_event == 'golden_bloon':
-                                time.sleep(4)
+                                input_backend.sleep(4)
                             else:
-                                time.sleep(menu_change_delay)
-                            new_screenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
+                                input_backend.sleep(menu_change_delay)
+                            new_screenshot = frame_source.grab(advance=True)
                             result = find_image_in_image(new_screenshot, locate_images['collection'][collection_event])
                             if result[0] < 0.05:
-                                map_name = find_map_for_px_pos(category, page, result[1])
+                                map_name = find_map_for_px_pos(category_restriction, page, result[1])
                                 break
                         if not map_name:
                             custom_print('no maps with increased rewards found! exiting!')
                             return
-                        custom_print('best map in ' + category + ': ' + map_name)
+                        custom_print('best map: ' + map_name)
                         increased_rewards_playthrough = get_highest_value_playthrough(all_available_playthroughs, map_name, playthrough_log)
-                        if increased_rewards_playthrough:
-                            break
-                        else:
-                            custom_print('no playthroughs for map found! searching lower map tiers!')
+                        if not increased_rewards_playthrough:
+                            custom_print('no playthroughs for map found! exiting!')
+                            return
+                    else:
+                        for i, category in enumerate(reversed(list(maps_by_category.keys()))):
+                            if i == 0:
+                                input_backend.click(image_areas['click']['map_categories'][('advanced' if category == 'beginner' else 'beginner')])
+                                input_backend.sleep(menu_change_delay)
+
+                            map_name = None
+                            for page in range(0, category_pages[category]):
+                                input_backend.click(image_areas['click']['map_categories'][category])
+                                if collection_event == 'golden_bloon':
+                                    input_backend.sleep(4)
+                                else:
+                                    input_backend.sleep(menu_change_delay)
+                                new_screenshot = frame_source.grab(advance=True)
+                                result = find_image_in_image(new_screenshot, locate_images['collection'][collection_event])
+                                if result[0] < 0.05:
+                                    map_name = find_map_for_px_pos(category, page, result[1])
+                                    break
+                            if not map_name:
+                                custom_print('no maps with increased rewards found! exiting!')
+                                return
+                            custom_print('best map in ' + category + ': ' + map_name)
+                            increased_rewards_playthrough = get_highest_value_playthrough(all_available_playthroughs, map_name, playthrough_log)
+                            if increased_rewards_playthrough:
+                                break
+                            else:
+                                custom_print('no playthroughs for map found! searching lower map tiers!')
 
-                    if not increased_rewards_playthrough:
-                        custom_print('no available playthrough found! exiting!')
-                        return
-                state = State.UNDEFINED
-            elif screen == Screen.UNKNOWN:
-                pass
-            else:
-                custom_print('task FIND_HARDEST_INCREASED_REWARDS_MAP, but not in startmenu!')
-                state = State.GOTO_HOME
-                last_state_transition_successful = False
-        elif state == State.INGAME:
-            if map_config is None:
-                custom_print('Error: mapConfig is None in INGAME state!')
-                sys.exit(1)
-
-            if screen == Screen.INGAME_PAUSED:
-                if last_screen != screen and log_stats:
-                    last_playthrough_stats['time'].append(('stop', time.time()))
-                time.sleep(2)
-                if is_btd6_window(ahk.get_active_window().title):
-                    send_key('{Esc}')
-            elif screen == Screen.UNKNOWN:
-                if last_screen == Screen.UNKNOWN and unknown_screen_has_waited:
-                    unknown_screen_has_waited = False
-                    send_key('{Esc}')
+                        if not increased_rewards_playthrough:
+                            custom_print('no available playthrough found! exiting!')
+                            return
+                    state = State.UNDEFINED
+                elif screen == Screen.UNKNOWN:
+                    pass
                 else:
-                    unknown_screen_has_waited = True
-                    time.sleep(2)
-            elif screen == Screen.LEVELUP:
-                pyautogui.click(100, 100)
-                time.sleep(menu_change_delay)
-                pyautogui.click(100, 100)
-            elif screen == Screen.ROUND_100_INSTA:
-                pyautogui.click(100, 100)
-                time.sleep(menu_change_delay)
-            elif screen == Screen.VICTORY_SUMMARY:
-                if log_stats:
-                    last_playthrough_stats['time'].append(('stop', time.time()))
-                    last_playthrough_stats['result'] = PlaythroughResult.WIN
-                    update_stats_file(map_config['filename'], last_playthrough_stats)
-                games_played += 1
-                if map_config['filename'] not in playthrough_log:
-                    playthrough_log[map_config['filename']] = {}
-                if map_config['gamemode'] not in playthrough_log[map_config['filename']]:
-                    playthrough_log[map_config['filename']][map_config['gamemode']] = {'attempts': 0, 'wins': 0, 'defeats': 0}
-                playthrough_log[map_config['filename']][map_config['gamemode']]['attempts'] += 1
-                playthrough_log[map_config['filename']][map_config['gamemode']]['wins'] += 1
-
-                if not is_continue:
-                    set_medal_unlocked(map_config['map'], map_config['gamemode'])
-
-                state = State.UNDEFINED
-            elif screen == Screen.DEFEAT:
-                if log_stats:
-                    last_playthrough_stats['time'].append(('stop', time.time()))
-                    last_playthrough_stats['result'] = PlaythroughResult.DEFEAT
-                    update_stats_file(map_config['filename'], last_playthrough_stats)
-                objective_failed = True
-                games_played += 1
-                if map_config['filename'] not in playthrough_log:
-                    playthrough_log[map_config['filename']] = {}
-                if map_config['gamemode'] not in playthrough_log[map_config['filename']]:
-                    playthrough_log[map_config['filename']][map_config['gamemode']] = {'attempts': 0, 'wins': 0, 'defeats': 0}
-                playthrough_log[map_config['filename']][map_config['gamemode']]['attempts'] += 1
-                playthrough_log[map_config['filename']][map_config['gamemode']]['defeats'] += 1
-
-                state = State.UNDEFINED
-            elif screen == Screen.INGAME:
-                if last_screen != screen and log_stats:
-                    last_playthrough_stats['time'].append(('start', time.time()))
-
-                images = [screenshot[segment_coordinates[segment][1] : segment_coordinates[segment][3], segment_coordinates[segment][0] : segment_coordinates[segment][2]] for segment in segment_coordinates]
-
-                current_values = {}
-                this_iteration_cost = 0
-                this_iteration_action = None
-                skipping_iteration = False
-
-                try:
-                    current_values['money'] = int(custom_ocr(images[2]))
-                    current_values['round'] = int(custom_ocr(images[3]).split('/')[0])
-                except ValueError:
-                    current_values['money'] = -1
-                    current_values['round'] = -1
-
-                # to prevent random explosion particles that were recognized as digits from messing up the game
-                # still possible: if it happens 2 times in a row
-                # potential solution: when placing: check if pixel changed colour(or even is of correct colour) - potentially blocked by particles/projectiles
-                # when upgrading: check if corresponding box turned green(for left and right menu)
-                # remove obstacle: colour change?
-
-                if len(map_config['steps']):
-                    if map_config['steps'][0]['action'] == 'sell':
-                        custom_print(
-                            'detected money: '
-                            + str(current_values['money'])
-                            + ', required: '
-                            + str(get_next_non_sell_action(map_config['steps'])['cost'] - sum_adjacent_sells(map_config['steps']))
-                            + ' ('
-                            + str(get_next_non_sell_action(map_config['steps'])['cost'])
-                            + ' - '
-                            + str(sum_adjacent_sells(map_config['steps']))
-                            + ')'
-                            + '          ',
-                            end='',
-                            rewrite_line=True,
-                        )
-                    if map_config['steps'][0]['action'] == 'await_round':
-                        custom_print('detected round: ' + str(current_values['round']) + ', awaiting: ' + str(map_config['steps'][0]['round']) + '          ', end='', rewrite_line=True)
+                    custom_print('task FIND_HARDEST_INCREASED_REWARDS_MAP, but not in startmenu!')
+                    state = State.GOTO_HOME
+                    last_state_transition_successful = False
+            elif state == State.INGAME:
+                if map_config is None:
+                    custom_print('Error: mapConfig is None in INGAME state!')
+                    sys.exit(1)
+                if action_plan is None or action_plan.steps is not map_config['steps']:
+                    action_plan = ActionPlan(map_config['steps'])
+
+                if screen == Screen.INGAME_PAUSED:
+                    if last_screen != screen and log_stats:
+                        last_playthrough_stats['time'].append(('stop', time.time()))
+                    input_backend.sleep(2)
+                    if is_btd6_window(input_backend.get_active_window_title() or ''):
+                        input_backend.send_key('{Esc}')
+                elif screen == Screen.UNKNOWN:
+                    if last_screen == Screen.UNKNOWN and unknown_screen_has_waited:
+                        unknown_screen_has_waited = False
+                        input_backend.send_key('{Esc}')
                     else:
-                        custom_print('detected money: ' + str(current_values['money']) + ', required: ' + str(map_config['steps'][0]['cost']) + '          ', end='', rewrite_line=True)
+                        unknown_screen_has_waited = True
+                        input_backend.sleep(2)
+                elif screen == Screen.LEVELUP:
+                    input_backend.click((100, 100))
+                    input_backend.sleep(menu_change_delay)
+                    input_backend.click((100, 100))
+                elif screen == Screen.ROUND_100_INSTA:
+                    input_backend.click((100, 100))
+                    input_backend.sleep(menu_change_delay)
+                elif screen == Screen.VICTORY_SUMMARY:
+                    if log_stats:
+                        last_playthrough_stats['time'].append(('stop', time.time()))
+                        last_playthrough_stats['result'] = PlaythroughResult.WIN
+                        update_stats_file(map_config['filename'], last_playthrough_stats, create_resolution_string(resolution))
+                    games_played += 1
+                    if map_config['filename'] not in playthrough_log:
+                        playthrough_log[map_config['filename']] = {}
+                    if map_config['gamemode'] not in playthrough_log[map_config['filename']]:
+                        playthrough_log[map_config['filename']][map_config['gamemode']] = {'attempts': 0, 'wins': 0, 'defeats': 0}
+                    playthrough_log[map_config['filename']][map_config['gamemode']]['attempts'] += 1
+                    playthrough_log[map_config['filename']][map_config['gamemode']]['wins'] += 1
+
+                    if not is_continue:
+                        set_medal_unlocked(map_config['map'], map_config['gamemode'])
 
-                if mode == Mode.VALIDATE_PLAYTHROUGHS:
-                    if last_iteration_balance != -1 and current_values['money'] != last_iteration_balance - last_iteration_cost:
-                        if current_values['money'] == last_iteration_balance:
-                            custom_print('action: ' + str(last_iteration_action) + ' failed!')
-                            validation_result = False
-                            map_config['steps'] = []
-                        else:
-                            custom_print('pricing error! expected cost: ' + str(last_iteration_cost) + ', detected cost: ' + str(last_iteration_balance - current_values['money']) + '. Is monkey knowledge disabled?')
-                elif mode == Mode.VALIDATE_COSTS:
-                    if last_iteration_balance != -1 and last_iteration_action:
-                        if last_iteration_action['action'] == 'place':
-                            costs[last_iteration_action['extra']['group']][last_iteration_action['extra']['type']]['base'] = int(last_iteration_balance - current_values['money'])
-                        elif last_iteration_action['action'] == 'upgrade':
-                            costs[last_iteration_action['extra']['group']][last_iteration_action['extra']['type']]['upgrades'][last_iteration_action['extra']['upgrade'][0]][last_iteration_action['extra']['upgrade'][1] - 1] = int(last_iteration_balance - current_values['money'])
-
-                if mode == Mode.VALIDATE_PLAYTHROUGHS and len(map_config['steps']) and (map_config['steps'][0]['action'] == 'await_round' or map_config['steps'][0]['action'] == 'speed'):
-                    map_config['steps'].pop(0)
-                elif current_values['money'] == -1 or current_values['round'] == -1 and len(map_config['steps']) and map_config['steps'][0]['action'] == 'await_round':
-                    custom_print('recognition error. money: ' + str(current_values['money']) + ', round: ' + str(current_values['round']))
-                elif mode != Mode.VALIDATE_COSTS and last_iteration_balance - last_iteration_cost > current_values['money']:
-                    custom_print('potential cash recognition error: ' + str(last_iteration_balance) + ' - ' + str(last_iteration_cost) + ' -> ' + str(current_values['money']))
-                    # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(lastIterationBalance) + '.png', lastIterationScreenshotAreas[2])
-                    # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(currentValues['money']) + '.png', images[2])
-                    skipping_iteration = True
-                elif mode != Mode.VALIDATE_COSTS and (current_values['round'] - last_iteration_round > 1 or last_iteration_round > current_values['round']) and len(map_config['steps']) and map_config['steps'][0]['action'] == 'await_round':
-                    custom_print('potential round recognition error: ' + str(last_iteration_round) + ' -> ' + str(current_values['round']))
-                    skipping_iteration = True
-                elif len(map_config['steps']) and (
-                    (map_config['steps'][0]['action'] != 'sell' and map_config['steps'][0]['action'] != 'await_round' and min(current_values['money'], last_iteration_balance - last_iteration_cost) >= map_config['steps'][0]['cost'])
-                    or map_config['gamemode'] == 'deflation'
-                    or map_config['steps'][0]['action'] == 'await_round'
-                    and current_values['round'] >= map_config['steps'][0]['round']
-                    or map_config['steps'][0]['action'] == 'await_round'
-                    and mode == Mode.VALIDATE_PLAYTHROUGHS
-                    or ((map_config['steps'][0]['action'] == 'sell') and min(current_values['money'], last_iteration_balance - last_iteration_cost) + sum_adjacent_sells(map_config['steps']) >= get_next_non_sell_action(map_config['steps'])['cost'])
-                ):
-                    action = map_config['steps'].pop(0)
-                    this_iteration_action = action
-                    if action['action'] != 'sell' and action['action'] != 'await_round':
-                        this_iteration_cost = action['cost']
-                    custom_print('performing action: ' + str(action))
-                    if action['action'] == 'place':
-                        pyautogui.moveTo(action['pos'])
-                        time.sleep(action_delay)
-                        send_key(action['key'])
-                        time.sleep(action_delay)
-                        pyautogui.click()
-                    elif action['action'] == 'upgrade' or action['action'] == 'retarget' or action['action'] == 'special':
-                        # game hints potentially blocking monkeys
-                        pyautogui.click(action['pos'])
-                        time.sleep(action_delay)
-                        action_tmp = None
-                        while action:
-                            if 'to' in action:
-                                pyautogui.moveTo(action['to'])
-                                time.sleep(small_action_delay)
-                            if action['action'] == 'click':
-                                time.sleep(action_delay)
-                                pyautogui.moveTo(action['pos'])
-                                pyautogui.click()
-                                time.sleep(action_delay)
-                            else:
-                                send_key(action['key'])
-                            if 'to' in action and map_config['monkeys'][action['name']]['type'] == 'mortar':
-                                pyautogui.click()
-                            time.sleep(small_action_delay)
-                            action_tmp = action
-                            if len(map_config['steps']) and 'name' in map_config['steps'][0] and map_config['steps'][0]['name'] == action['name'] and (map_config['steps'][0]['action'] == 'retarget' or map_config['steps'][0]['action'] == 'special' or map_config['steps'][0]['action'] == 'click'):
-                                action = map_config['steps'].pop(0)
-                                custom_print('+' + action['action'])
-                            else:
-                                action = None
-                        action = action_tmp
-                        send_key('{Esc}')
-                    elif action['action'] == 'sell':
-                        pyautogui.moveTo(action['pos'])
-                        pyautogui.click()
-                        time.sleep(action_delay)
-                        send_key(action['key'])
-                    elif action['action'] == 'remove':
-                        custom_print('removing obstacle at ' + tuple_to_str(action['pos']) + ' for ' + str(action['cost']))
-                        pyautogui.moveTo(action['pos'])
-                        pyautogui.click()
-                        time.sleep(menu_change_delay)
-                        result = cv2.matchTemplate(np.array(pyautogui.screenshot())[:, :, ::-1].copy(), locate_images['remove_obstacle_confirm_button'], cv2.TM_SQDIFF_NORMED)
-                        pyautogui.click(cv2.minMaxLoc(result)[2])
-                    elif action['action'] == 'click':
-                        pyautogui.moveTo(action['pos'])
-                        pyautogui.click()
-                    elif action['action'] == 'press':
-                        send_key(action['key'])
-                    elif action['action'] == 'speed':
-                        if action['speed'] == 'fast':
-                            fast = True
-                        elif action['speed'] == 'slow':
-                            fast = False
-
-                elif mode in [Mode.VALIDATE_PLAYTHROUGHS, Mode.VALIDATE_COSTS] and len(map_config['steps']) == 0 and last_iteration_cost == 0:
                     state = State.UNDEFINED
+                elif screen == Screen.DEFEAT:
+                    if log_stats:
+                        last_playthrough_stats['time'].append(('stop', time.time()))
+                        last_playthrough_stats['result'] = PlaythroughResult.DEFEAT
+                        update_stats_file(map_config['filename'], last_playthrough_stats, create_resolution_string(resolution))
+                    objective_failed = True
+                    games_played += 1
+                    if map_config['filename'] not in playthrough_log:
+                        playthrough_log[map_config['filename']] = {}
+                    if map_config['gamemode'] not in playthrough_log[map_config['filename']]:
+                        playthrough_log[map_config['filename']][map_config['gamemode']] = {'attempts': 0, 'wins': 0, 'defeats': 0}
+                    playthrough_log[map_config['filename']][map_config['gamemode']]['attempts'] += 1
+                    playthrough_log[map_config['filename']][map_config['gamemode']]['defeats'] += 1
 
-                if (not do_all_steps_before_start and map_config['gamemode'] != 'deflation' and not skipping_iteration and get_next_costing_action(map_config['steps'])['cost'] > min(current_values['money'], last_iteration_balance - last_iteration_cost)) or len(map_config['steps']) == 0:
-                    best_match_diff = None
-                    game_state = None
-                    for screen_cfg in [
-                        ('game_playing_fast', comparison_images['game_state']['game_playing_fast'], image_areas['compare']['game_state']),
-                        ('game_playing_slow', comparison_images['game_state']['game_playing_slow'], image_areas['compare']['game_state']),
-                        ('game_paused', comparison_images['game_state']['game_paused'], image_areas['compare']['game_state']),
-                    ]:
-                        diff = cv2.matchTemplate(cut_image(screenshot, screen_cfg[2]), cut_image(screen_cfg[1], screen_cfg[2]), cv2.TM_SQDIFF_NORMED)[0][0]
-                        if best_match_diff is None or diff < best_match_diff:
-                            best_match_diff = diff
-                            game_state = screen_cfg[0]
-
-                    if game_state == 'game_playing_fast' and not fast or game_state == 'game_playing_slow' and fast or game_state == 'game_paused':
-                        send_key(keybinds['others']['play'])
-
-                last_iteration_balance = current_values['money']
-                last_iteration_cost = this_iteration_cost
-                last_iteration_action = this_iteration_action
-
-                last_iteration_round = current_values['round']
-
-                iteration_balances.append((current_values['money'], this_iteration_cost))
+                    state = State.UNDEFINED
+                elif screen == Screen.INGAME:
+                    if last_screen != screen and log_stats:
+                        last_playthrough_stats['time'].append(('start', time.time()))
+
+                    ocr_values = ocr_segments(screenshot, segment_coordinates, resolution)
+
+                    current_values = {}
+                    this_iteration_cost = 0
+                    this_iteration_action = None
+                    skipping_iteration = False
+
+                    try:
+                        current_values['money'] = int(ocr_values['money'])
+                        current_values['round'] = int(ocr_values['round'].split('/')[0])
+                    except ValueError:
+                        current_values['money'] = -1
+                        current_values['round'] = -1
+
+                    # to prevent random explosion particles that were recognized as digits from messing up the game
+                    # still possible: if it happens 2 times in a row
+                    # potential solution: when placing: check if pixel changed colour(or even is of correct colour) - potentially blocked by particles/projectiles
+                    # when upgrading: check if corresponding box turned green(for left and right menu)
+                    # remove obstacle: colour change?
+
+                    if len(action_plan):
+                        if action_plan.current_action() == 'sell':
+                            custom_print(
+                                'detected money: ' + str(current_values['money']) + ', required: ' + str(action_plan.get_next_non_sell_action()['cost'] - action_plan.sum_adjacent_sells()) + ' (' + str(action_plan.get_next_non_sell_action()['cost']) + ' - ' + str(action_plan.sum_adjacent_sells()) + ')' + '          ',
+                                end='',
+                                rewrite_line=True,
+                            )
+                        if action_plan.current_action() == 'await_round':
+                            custom_print('detected round: ' + str(current_values['round']) + ', awaiting: ' + str(action_plan.current()['round']) + '          ', end='', rewrite_line=True)
+                        else:
+                            custom_print('detected money: ' + str(current_values['money']) + ', required: ' + str(action_plan.current()['cost']) + '          ', end='', rewrite_line=True)
+
+                    if mode == Mode.VALIDATE_PLAYTHROUGHS:
+                        if last_iteration_balance != -1 and current_values['money'] != last_iteration_balance - last_iteration_cost:
+                            if current_values['money'] == last_iteration_balance:
+                                custom_print('action: ' + str(last_iteration_action) + ' failed!')
+                                validation_result = False
+                                action_plan.clear()
+                            else:
+                                custom_print('pricing error! expected cost: ' + str(last_iteration_cost) + ', detected cost: ' + str(last_iteration_balance - current_values['money']) + '. Is monkey knowledge disabled?')
+                    elif mode == Mode.VALIDATE_COSTS:
+                        if last_iteration_balance != -1 and last_iteration_action:
+                            if last_iteration_action['action'] == 'place':
+                                costs[last_iteration_action['extra']['group']][last_iteration_action['extra']['type']]['base'] = int(last_iteration_balance - current_values['money'])
+                            elif last_iteration_action['action'] == 'upgrade':
+                                costs[last_iteration_action['extra']['group']][last_iteration_action['extra']['type']]['upgrades'][last_iteration_action['extra']['upgrade'][0]][last_iteration_action['extra']['upgrade'][1] - 1] = int(last_iteration_balance - current_values['money'])
+
+                    if mode == Mode.VALIDATE_PLAYTHROUGHS and len(action_plan) and (action_plan.current_action() == 'await_round' or action_plan.current_action() == 'speed'):
+                        action_plan.pop()
+                    elif current_values['money'] == -1 or current_values['round'] == -1 and len(action_plan) and action_plan.current_action() == 'await_round':
+                        custom_print('recognition error. money: ' + str(current_values['money']) + ', round: ' + str(current_values['round']))
+                    elif mode != Mode.VALIDATE_COSTS and last_iteration_balance - last_iteration_cost > current_values['money']:
+                        custom_print('potential cash recognition error: ' + str(last_iteration_balance) + ' - ' + str(last_iteration_cost) + ' -> ' + str(current_values['money']))
+                        # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(lastIterationBalance) + '.png', lastIterationScreenshotAreas[2])
+                        # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(currentValues['money']) + '.png', images[2])
+                        skipping_iteration = True
+                    elif mode != Mode.VALIDATE_COSTS and (current_values['round'] - last_iteration_round > 1 or last_iteration_round > current_values['round']) and len(action_plan) and action_plan.current_action() == 'await_round':
+                        custom_print('potential round recognition error: ' + str(last_iteration_round) + ' -> ' + str(current_values['round']))
+                        skipping_iteration = True
+                    elif len(action_plan) and (
+                        (action_plan.current_action() != 'sell' and action_plan.current_action() != 'await_round' and min(current_values['money'], last_iteration_balance - last_iteration_cost) >= action_plan.current()['cost'])
+                        or map_config['gamemode'] == 'deflation'
+                        or action_plan.current_action() == 'await_round'
+                        and current_values['round'] >= action_plan.current()['round']
+                        or action_plan.current_action() == 'await_round'
+                        and mode == Mode.VALIDATE_PLAYTHROUGHS
+                        or ((action_plan.current_action() == 'sell') and min(current_values['money'], last_iteration_balance - last_iteration_cost) + action_plan.sum_adjacent_sells() >= action_plan.get_next_non_sell_action()['cost'])
+                    ):
+                        action = action_plan.pop()
+                        this_iteration_action = action
+                        if action['action'] != 'sell' and action['action'] != 'await_round':
+                            this_iteration_cost = action['cost']
+                        custom_print('performing action: ' + str(action))
+                        if action['action'] == 'place':
+                            input_backend.move_to(action['pos'])
+                            input_backend.sleep(action_delay)
+                            input_backend.send_key(action['key'])
+                            input_backend.sleep(action_delay)
+                            input_backend.click()
+                        elif action['action'] == 'upgrade' or action['action'] == 'retarget' or action['action'] == 'special':
+                            # game hints potentially blocking monkeys
+                            input_backend.click(action['pos'])
+                            input_backend.sleep(action_delay)
+                            action_tmp = None
+                            while action:
+                                if 'to' in action:
+                                    input_backend.move_to(action['to'])
+                                    input_backend.sleep(small_action_delay)
+                                if action['action'] == 'click':
+                                    input_backend.sleep(action_delay)
+                                    input_backend.move_to(action['pos'])
+                                    input_backend.click()
+                                    input_backend.sleep(action_delay)
+                                else:
+                                    input_backend.send_key(action['key'])
+                                if 'to' in action and map_config['monkeys'][action['name']]['type'] == 'mortar':
+                                    input_backend.click()
+                                input_backend.sleep(small_action_delay)
+                                action_tmp = action
+                                if action_plan.next_continues_current():
+                                    action = action_plan.pop()
+                                    custom_print('+' + action['action'])
+                                else:
+                                    action = None
+                            action = action_tmp
+                            input_backend.send_key('{Esc}')
+                        elif action['action'] == 'sell':
+                            input_backend.move_to(action['pos'])
+                            input_backend.click()
+                            input_backend.sleep(action_delay)
+                            input_backend.send_key(action['key'])
+                        elif action['action'] == 'remove':
+                            custom_print('removing obstacle at ' + tuple_to_str(action['pos']) + ' for ' + str(action['cost']))
+                            input_backend.move_to(action['pos'])
+                            input_backend.click()
+                            input_backend.sleep(menu_change_delay)
+                            result = cv2.matchTemplate(frame_source.grab(advance=True), locate_images['remove_obstacle_confirm_button'], cv2.TM_SQDIFF_NORMED)
+                            input_backend.click(cv2.minMaxLoc(result)[2])
+                        elif action['action'] == 'click':
+                            input_backend.move_to(action['pos'])
+                            input_backend.click()
+                        elif action['action'] == 'press':
+                            input_backend.send_key(action['key'])
+                        elif action['action'] == 'speed':
+                            if action['speed'] == 'fast':
+                                fast = True
+                            elif action['speed'] == 'slow':
+                                fast = False
+
+                    elif mode in [Mode.VALIDATE_PLAYTHROUGHS, Mode.VALIDATE_COSTS] and len(action_plan) == 0 and last_iteration_cost == 0:
+                        state = State.UNDEFINED
+
+                    if (not do_all_steps_before_start and map_config['gamemode'] != 'deflation' and not skipping_iteration and action_plan.get_next_costing_action()['cost'] > min(current_values['money'], last_iteration_balance - last_iteration_cost)) or len(action_plan) == 0:
+                        game_state = game_state_classifier.classify(screenshot)
+
+                        if game_state == 'game_playing_fast' and not fast or game_state == 'game_playing_slow' and fast or game_state == 'game_paused':
+                            input_backend.send_key(keybinds['others']['play'])
+
+                    last_iteration_balance = current_values['money']
+                    last_iteration_cost = this_iteration_cost
+                    last_iteration_action = this_iteration_action
+
+                    last_iteration_round = current_values['round']
+
+                    iteration_balances.append((current_values['money'], this_iteration_cost))
+                else:
+                    custom_print('task INGAME, but not in related screen!')
+                    state = State.GOTO_HOME
+                    last_state_transition_successful = False
             else:
-                custom_print('task INGAME, but not in related screen!')
-                state = State.GOTO_HOME
+                state = State.UNDEFINED
                 last_state_transition_successful = False
-        else:
-            state = State.UNDEFINED
-            last_state_transition_successful = False
 
-        if state != last_state:
-            custom_print('new state ' + state.name + '!')
+            if last_state == State.INGAME and state != State.INGAME:
+                ocr_stats = ocr_cache.get_stats()
+                custom_print(f'ocr cache: {ocr_stats["hits"]} hits, {ocr_stats["misses"]} misses ({ocr_stats["hit_rate"]:.0%} hit rate)')
+            if state != last_state:
+                custom_print('new state ' + state.name + '!')
+
+            last_screen = screen
+            last_state = state
 
-        last_screen = screen
-        last_state = state
+            input_backend.sleep(action_delay if state == State.INGAME else menu_change_delay)
 
-        time.sleep(action_delay if state == State.INGAME else menu_change_delay)
+        classifier_stats = screen_classifier.stats
+        custom_print(f'screen recognition: {classifier_stats["fast_path_hits"]} of {classifier_stats["classifications"]} screens recognized by checking the last screen and its successors only')
+    finally:
+        input_backend.close()
 
 
 if __name__ == '__main__':
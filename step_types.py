@@ -1,4 +1,5 @@
-from typing import TypedDict, NotRequired, Literal, Tuple, Union
+from dataclasses import MISSING, dataclass, field, fields
+from typing import ClassVar, TypedDict, NotRequired, Literal, Tuple, Union
 
 # TODO: fix "action" overrides symbol of same name in class "StepBase"
 # TODO: use this class instead of the nasty dictionary that is created in helper.py
@@ -71,3 +72,162 @@ Step = Union[
     ClickStep,
     StepBase,  # default "empty" step
 ]
+
+
+# slotted counterparts of the step dictionaries, used where many compiled playthroughs are held (e. g. the compiled playthrough cache)
+# to_dict()/step_from_dict() convert from/to the dictionaries created by the parser, keys keep the order of the parser
+
+
+@dataclass(slots=True, kw_only=True)
+class StepData:
+    ACTION: ClassVar[str] = ''
+
+    def to_dict(self) -> Step:
+        step = {'action': self.ACTION}
+        for step_field in fields(self):
+            value = getattr(self, step_field.name)
+            if value is not None or step_field.default is MISSING:
+                step[step_field.name] = value
+        return step
+
+
+@dataclass(slots=True, kw_only=True)
+class PlaceStepData(StepData):
+    ACTION: ClassVar[str] = 'place'
+
+    type: str
+    name: str
+    key: str
+    pos: tuple[int, int]
+    cost: int
+    discount: str | None = None
+    extra: dict | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class UpgradeStepData(StepData):
+    ACTION: ClassVar[str] = 'upgrade'
+
+    name: str
+    key: str
+    pos: tuple[int, int]
+    path: int
+    cost: int
+    discount: str | None = None
+    extra: dict | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class RetargetStepData(StepData):
+    ACTION: ClassVar[str] = 'retarget'
+
+    name: str
+    key: str
+    pos: tuple[int, int]
+    cost: int
+    to: tuple[int, int] | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class SpecialStepData(StepData):
+    ACTION: ClassVar[str] = 'special'
+
+    name: str
+    key: str
+    pos: tuple[int, int]
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class SellStepData(StepData):
+    ACTION: ClassVar[str] = 'sell'
+
+    name: str
+    key: str
+    pos: tuple[int, int]
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class RemoveStepData(StepData):
+    ACTION: ClassVar[str] = 'remove'
+
+    pos: tuple[int, int]
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class AwaitRoundStepData(StepData):
+    ACTION: ClassVar[str] = 'await_round'
+
+    round: int
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class SpeedStepData(StepData):
+    ACTION: ClassVar[str] = 'speed'
+
+    speed: str
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class ClickStepData(StepData):
+    ACTION: ClassVar[str] = 'click'
+
+    name: str | None = None
+    pos: tuple[int, int]
+    cost: int
+
+
+@dataclass(slots=True, kw_only=True)
+class PressStepData(StepData):
+    ACTION: ClassVar[str] = 'press'
+
+    key: str
+    cost: int
+
+
+STEP_DATA_CLASSES: dict[str, type[StepData]] = {cls.ACTION: cls for cls in [PlaceStepData, UpgradeStepData, RetargetStepData, SpecialStepData, SellStepData, RemoveStepData, AwaitRoundStepData, SpeedStepData, ClickStepData, PressStepData]}
+
+
+def step_from_dict(step: Step) -> StepData:
+    """Converts a step dictionary to the dataclass of its action."""
+    return STEP_DATA_CLASSES[step['action']](**{key: value for key, value in step.items() if key != 'action'})
+
+
+@dataclass(slots=True, kw_only=True)
+class MonkeyData:
+    """A placed monkey or hero, tracked while parsing or recording a playthrough."""
+
+    type: str
+    name: str
+    upgrades: list[int] = field(default_factory=lambda: [0, 0, 0])
+    pos: tuple[int, int]
+    value: int | float = 0
+
+    def to_dict(self) -> dict:
+        return {'type': self.type, 'name': self.name, 'upgrades': list(self.upgrades), 'pos': self.pos, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, monkey: dict) -> 'MonkeyData':
+        return cls(**{**monkey, 'upgrades': list(monkey.get('upgrades', [0, 0, 0]))})
+
+
+def map_config_to_dataclasses(map_config: dict) -> dict:
+    """Returns a copy of a parsed map config with steps and monkeys converted to dataclasses."""
+    return {
+        **map_config,
+        'steps': [step_from_dict(step) for step in map_config['steps']],
+        'monkeys': {name: MonkeyData.from_dict(monkey) for name, monkey in map_config['monkeys'].items()},
+    }
+
+
+def map_config_from_dataclasses(map_config: dict) -> dict:
+    """Returns a copy of a map config converted by map_config_to_dataclasses in the dictionary form of the parser."""
+    return {
+        **map_config,
+        'steps': [step.to_dict() for step in map_config['steps']],
+        'monkeys': {name: monkey.to_dict() for name, monkey in map_config['monkeys'].items()},
+    }
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+
+from utils.image import RawImage
+
+# layout of the bundle (a 1D uint8 .npy file): 8 byte little endian index length, JSON index, image data
+INDEX_LENGTH_BYTES = 8
+
+
+def save_asset_bundle(file_path: str, images: dict[str, RawImage], metadata: dict[str, dict] | None = None, info: dict | None = None) -> None:
+    """
+    Saves images into a single .npy file that can be memory mapped by AssetBundle.
+
+    Args:
+        file_path (str): Path of the bundle.
+        images (dict[str, RawImage]): Images by key (e. g. "compare/screens/startmenu").
+        metadata (dict[str, dict] | None, optional): Additional JSON serializable data per key (e. g. the area an image was cut from).
+        info (dict | None, optional): Additional JSON serializable data about the whole bundle (e. g. what it was created from).
+    """
+    metadata = metadata or {}
+    entries = {}
+    offset = 0
+    for key, img in images.items():
+        entries[key] = {'offset': offset, 'shape': list(img.shape), 'dtype': str(img.dtype), **metadata.get(key, {})}
+        offset += img.nbytes
+
+    index = json.dumps({'version': 1, 'info': info or {}, 'entries': entries}).encode()
+    header = np.frombuffer(len(index).to_bytes(INDEX_LENGTH_BYTES, 'little') + index, dtype=np.uint8)
+    data_start = len(header)
+
+    bundle = np.empty(data_start + offset, dtype=np.uint8)
+    bundle[:data_start] = header
+    for key, img in images.items():
+        start = data_start + entries[key]['offset']
+        bundle[start : start + img.nbytes] = np.ascontiguousarray(img).reshape(-1).view(np.uint8)
+    np.save(file_path, bundle)
+
+
+class AssetBundle:
+    """
+    Read only access to the images of a bundle written by save_asset_bundle. The file is memory mapped, images are views into it and are only read from disk when accessed.
+
+    Args:
+        file_path (str): Path of the bundle.
+    """
+
+    def __init__(self, file_path: str):
+        self.data = np.load(file_path, mmap_mode='r')
+        index_length = int.from_bytes(self.data[:INDEX_LENGTH_BYTES].tobytes(), 'little')
+        self.data_start = INDEX_LENGTH_BYTES + index_length
+        index = json.loads(self.data[INDEX_LENGTH_BYTES : self.data_start].tobytes())
+        self.entries: dict[str, dict] = index['entries']
+        self.info: dict = index.get('info', {})
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def keys(self, prefix: str = '') -> list[str]:
+        return [key for key in self.entries if key.startswith(prefix)]
+
+    def get_metadata(self, key: str) -> dict:
+        return self.entries[key]
+
+    def get(self, key: str) -> RawImage:
+        entry = self.entries[key]
+        dtype = np.dtype(entry['dtype'])
+        start = self.data_start + entry['offset']
+        return self.data[start : start + int(np.prod(entry['shape'])) * dtype.itemsize].view(dtype).reshape(entry['shape'])
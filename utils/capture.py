@@ -0,0 +1,201 @@
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from os.path import isdir, join
+
+import cv2
+import numpy as np
+import pyautogui
+
+from utils.image import BoundingBox, RawImage
+
+
+def merge_regions(regions: Iterable[BoundingBox]) -> list[BoundingBox]:
+    """Merges overlapping or adjacent bounding boxes (inclusive coordinates) until all remaining boxes are disjoint."""
+    merged = [tuple(region) for region in regions]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for box in merged:
+            for i, other in enumerate(result):
+                if box[0] <= other[2] + 1 and other[0] <= box[2] + 1 and box[1] <= other[3] + 1 and other[1] <= box[3] + 1:
+                    result[i] = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    changed = True
+                    break
+            else:
+                result.append(box)
+        merged = result
+    return merged
+
+
+def get_bounding_box(regions: list[BoundingBox]) -> BoundingBox:
+    return min(r[0] for r in regions), min(r[1] for r in regions), max(r[2] for r in regions), max(r[3] for r in regions)
+
+
+def get_area(box: BoundingBox) -> int:
+    return (box[2] - box[0] + 1) * (box[3] - box[1] + 1)
+
+
+def cluster_regions(regions: list[BoundingBox], call_cost: int) -> list[tuple[BoundingBox, list[BoundingBox]]]:
+    """
+    Groups regions into capture boxes, so that few calls capture few pixels besides the regions.
+
+    Starting with one box per region, the two boxes whose bounding box adds the fewest pixels are combined as long as it adds at most call_cost pixels.
+
+    Args:
+        regions (list[BoundingBox]): Disjoint regions, e. g. the result of merge_regions.
+        call_cost (int): The cost of one capture call in pixels.
+    Returns:
+        list[tuple[BoundingBox, list[BoundingBox]]]: The capture boxes with the regions they contain.
+    """
+    clusters = [(region, [region]) for region in regions]
+    while len(clusters) > 1:
+        best = None
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                box = get_bounding_box([clusters[i][0], clusters[j][0]])
+                added = get_area(box) - get_area(clusters[i][0]) - get_area(clusters[j][0])
+                if best is None or added < best[0]:
+                    best = (added, i, j, box)
+        added, i, j, box = best
+        if added > call_cost:
+            break
+        clusters[i] = (box, clusters[i][1] + clusters[j][1])
+        del clusters[j]
+    return clusters
+
+
+class FrameSource(ABC):
+    """
+    Provides BGR frames of the screen in a persistent buffer of the screen's size.
+
+    `grab_regions` only updates the requested regions, everything else keeps the pixels of earlier grabs. The returned buffer is reused for the next grab, copy it if it has to be kept.
+
+    Args:
+        resolution (tuple[int, int]): Width and height of the frames.
+    """
+
+    # whether _capture returns RGB (True) or BGR (False) pixels
+    rgb: bool = False
+    # fixed cost of a _capture call in captured pixels, decides how regions are grouped into captures (see cluster_regions)
+    capture_call_cost: int = 0
+
+    def __init__(self, resolution):
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.buffer = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
+        self.frames_played = 0
+        # capture boxes by requested regions, the main loop requests the same regions every tick
+        self.clusters: dict[tuple, list[tuple[BoundingBox, list[BoundingBox]]]] = {}
+
+    def advance(self) -> bool:
+        """Moves on to the next frame, called once per iteration of the main loop. Returns False if no frames are left."""
+        self.frames_played += 1
+        return True
+
+    @abstractmethod
+    def _capture(self, area: BoundingBox) -> RawImage:
+        """Returns the pixels of the area (inclusive coordinates) of the current frame."""
+
+    def grab_regions(self, regions: Iterable[BoundingBox]) -> RawImage:
+        """Captures the (merged) regions grouped into a few boxes (see cluster_regions) and copies only the regions into the frame buffer."""
+        regions = tuple(tuple(region) for region in regions)
+        if regions not in self.clusters:
+            self.clusters[regions] = cluster_regions(merge_regions(regions), self.capture_call_cost)
+
+        for area, area_regions in self.clusters[regions]:
+            captured = self._capture(area)
+            if self.rgb:
+                captured = captured[:, :, ::-1]
+            for region in area_regions:
+                self.buffer[region[1] : region[3] + 1, region[0] : region[2] + 1] = captured[region[1] - area[1] : region[3] - area[1] + 1, region[0] - area[0] : region[2] - area[0] + 1]
+
+        return self.buffer
+
+    def grab(self, advance: bool = False) -> RawImage:
+        """
+        Captures the whole frame into the frame buffer.
+
+        Args:
+            advance (bool, optional): Move on to the next frame first, for grabs that wait for the reaction to an input within one iteration of the main loop. Recorded frames otherwise keep returning the frame of the iteration. If no frames are left the last frame is captured again.
+        """
+        if advance:
+            self.advance()
+        return self.grab_regions([(0, 0, self.resolution[0] - 1, self.resolution[1] - 1)])
+
+
+class LiveFrameSource(FrameSource):
+    """Captures the screen using pyautogui."""
+
+    rgb = True
+    # each screenshot call has a fixed overhead, capturing some unneeded pixels is cheaper than many small calls
+    capture_call_cost = 250_000
+
+    def __init__(self, resolution=pyautogui.size()):
+        super().__init__(resolution)
+
+    def _capture(self, area: BoundingBox) -> RawImage:
+        return np.asarray(pyautogui.screenshot(region=(area[0], area[1], area[2] - area[0] + 1, area[3] - area[1] + 1)))
+
+
+class ImageFileFrameSource(FrameSource):
+    """
+    Serves the same still image for every grab, e. g. a screenshot taken with make_screenshot.py.
+
+    Args:
+        file_path (str): Path of the image.
+    """
+
+    def __init__(self, file_path: str):
+        self.image = cv2.imread(file_path)
+        if self.image is None:
+            raise FileNotFoundError(f'{file_path} not found or not an image!')
+        super().__init__((self.image.shape[1], self.image.shape[0]))
+
+    def _capture(self, area: BoundingBox) -> RawImage:
+        return self.image[area[1] : area[3] + 1, area[0] : area[2] + 1]
+
+
+class RecordedFrameSource(FrameSource):
+    """
+    Plays back recorded frames, e. g. to run the state machine offline. Every `advance` (and `grab(advance=True)`) moves on to the next frame, all grabs in between see the same frame.
+
+    Args:
+        path (str): Directory of images (played in filename order) or a video file.
+    """
+
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, path: str):
+        self.files = None
+        self.video = None
+        if isdir(path):
+            self.files = [join(path, filename) for filename in sorted(os.listdir(path)) if filename.lower().endswith(self.IMAGE_EXTENSIONS)]
+        else:
+            self.video = cv2.VideoCapture(path)
+
+        self.frames_played = 0
+        self.frame = None
+        self.next_frame = self._read_frame()
+        if self.next_frame is None:
+            raise FileNotFoundError(f'no frames found in {path}!')
+        super().__init__((self.next_frame.shape[1], self.next_frame.shape[0]))
+
+    def _read_frame(self) -> RawImage | None:
+        if self.video is not None:
+            success, frame = self.video.read()
+            return frame if success else None
+        if self.frames_played < len(self.files):
+            return cv2.imread(self.files[self.frames_played])
+        return None
+
+    def advance(self) -> bool:
+        if self.next_frame is None:
+            return False
+        self.frame = self.next_frame
+        self.frames_played += 1
+        self.next_frame = self._read_frame()
+        return True
+
+    def _capture(self, area: BoundingBox) -> RawImage:
+        return self.frame[area[1] : area[3] + 1, area[0] : area[2] + 1]
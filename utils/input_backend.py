@@ -0,0 +1,151 @@
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+import ahk
+import keyboard
+import pyautogui
+
+from utils.utils import save_json_file, send_key
+
+
+class InputBackend(ABC):
+    """Sends clicks and key presses to the game and answers questions about the input state (focused window, pressed keys)."""
+
+    @abstractmethod
+    def click(self, pos: tuple[int, int] | None = None) -> None:
+        """Clicks at pos or at the current mouse position if no position is provided."""
+
+    @abstractmethod
+    def move_to(self, pos: tuple[int, int]) -> None:
+        pass
+
+    @abstractmethod
+    def send_key(self, key: str | int) -> None:
+        """Sends a key using its AHK key name or its scancode."""
+
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        pass
+
+    @abstractmethod
+    def get_active_window_title(self) -> str | None:
+        pass
+
+    @abstractmethod
+    def is_ctrl_pressed(self) -> bool:
+        pass
+
+    @abstractmethod
+    def add_hotkey(self, hotkey: str, callback: Callable, args: tuple = ()) -> None:
+        """Calls callback with args whenever hotkey (keyboard library format, e. g. 'ctrl+space') is pressed."""
+
+    def start_tick(self) -> None:
+        """Called once per iteration of the main loop after the frame has been captured."""
+
+    def close(self) -> None:
+        """Called when the main loop exits."""
+
+
+class LiveInputBackend(InputBackend):
+    """Controls the game using pyautogui for the mouse and AHK for keys."""
+
+    def click(self, pos: tuple[int, int] | None = None) -> None:
+        if pos is None:
+            pyautogui.click()
+        else:
+            pyautogui.click(pos)
+
+    def move_to(self, pos: tuple[int, int]) -> None:
+        pyautogui.moveTo(pos)
+
+    def send_key(self, key: str | int) -> None:
+        send_key(key)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def get_active_window_title(self) -> str | None:
+        active_window = ahk.get_active_window()
+        return active_window.title if active_window else None
+
+    def is_ctrl_pressed(self) -> bool:
+        return keyboard.is_pressed('ctrl')
+
+    def add_hotkey(self, hotkey: str, callback: Callable, args: tuple = ()) -> None:
+        keyboard.add_hotkey(hotkey, callback, args=args)
+
+
+class RecordingInputBackend(InputBackend):
+    """
+    Headless backend logging all actions with timestamps instead of executing them, e. g. to run replay.py with recorded frames.
+
+    Also measures the decision latency of each main loop iteration: the time from `start_tick` to the first action of the iteration.
+
+    Args:
+        log_file (str | None, optional): File the action log and latency statistics are written to on `close`.
+        skip_sleeps (bool, optional): Whether sleeps return immediately (they are still logged).
+        window_title (str, optional): Title reported as active window.
+    """
+
+    def __init__(self, log_file: str | None = None, skip_sleeps: bool = True, window_title: str = 'BloonsTD6'):
+        self.log_file = log_file
+        self.skip_sleeps = skip_sleeps
+        self.window_title = window_title
+        self.actions: list[dict] = []
+        self.tick_latencies: list[float] = []
+        self.ticks = 0
+        self.tick_start = None
+        self.start_time = time.perf_counter()
+
+    def _record(self, action: str, **kwargs) -> None:
+        now = time.perf_counter()
+        if self.tick_start is not None:
+            self.tick_latencies.append(now - self.tick_start)
+            self.tick_start = None
+        self.actions.append({'time': now - self.start_time, 'tick': self.ticks, 'action': action, **kwargs})
+
+    def click(self, pos: tuple[int, int] | None = None) -> None:
+        self._record('click', pos=list(pos) if pos is not None else None)
+
+    def move_to(self, pos: tuple[int, int]) -> None:
+        self._record('move_to', pos=list(pos))
+
+    def send_key(self, key: str | int) -> None:
+        self._record('send_key', key=key)
+
+    def sleep(self, seconds: float) -> None:
+        self.actions.append({'time': time.perf_counter() - self.start_time, 'tick': self.ticks, 'action': 'sleep', 'seconds': seconds})
+        if not self.skip_sleeps:
+            time.sleep(seconds)
+
+    def get_active_window_title(self) -> str | None:
+        return self.window_title
+
+    def is_ctrl_pressed(self) -> bool:
+        return False
+
+    def add_hotkey(self, hotkey: str, callback: Callable, args: tuple = ()) -> None:
+        # no keyboard hook, registering one requires root on Linux
+        self._record('add_hotkey', hotkey=hotkey)
+
+    def start_tick(self) -> None:
+        self.ticks += 1
+        self.tick_start = time.perf_counter()
+
+    def get_latency_stats(self) -> dict[str, float | int]:
+        """Returns count, mean, median, p95 and max of the decision latencies in milliseconds."""
+        if not self.tick_latencies:
+            return {'count': 0}
+        latencies = sorted(self.tick_latencies)
+        return {
+            'count': len(latencies),
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'median_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+
+    def close(self) -> None:
+        if self.log_file:
+            save_json_file(self.log_file, {'ticks': self.ticks, 'latency': self.get_latency_stats(), 'actions': self.actions})
@@ -0,0 +1,150 @@
+import json
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    exp = np.exp(x - x.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+    'softmax': softmax,
+}
+
+
+def _same_padding(size: int, kernel: int, stride: int) -> tuple[int, int]:
+    """Returns the (before, after) padding Keras/TensorFlow use for padding='same'."""
+    total = max((math.ceil(size / stride) - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad_spatial(x: np.ndarray, kernel: tuple[int, int], strides: tuple[int, int], padding: str, value: float = 0) -> np.ndarray:
+    if padding == 'valid':
+        return x
+    pad_h = _same_padding(x.shape[1], kernel[0], strides[0])
+    pad_w = _same_padding(x.shape[2], kernel[1], strides[1])
+    return np.pad(x, ((0, 0), pad_h, pad_w, (0, 0)), constant_values=value)
+
+
+def conv2d(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray | None, strides: tuple[int, int], padding: str) -> np.ndarray:
+    """Channels last 2D convolution (cross-correlation like Keras) of x (N, H, W, C) with kernel (kh, kw, C, F)."""
+    x = _pad_spatial(x, kernel.shape[:2], strides, padding)
+    windows = sliding_window_view(x, kernel.shape[:2], axis=(1, 2))[:, :: strides[0], :: strides[1]]
+    out = np.tensordot(windows, kernel, axes=([3, 4, 5], [2, 0, 1]))
+    return out + bias if bias is not None else out
+
+
+def pool2d(x: np.ndarray, pool_size: tuple[int, int], strides: tuple[int, int], padding: str, reduce) -> np.ndarray:
+    x = _pad_spatial(x, pool_size, strides, padding, -np.inf if reduce is np.max else 0)
+    windows = sliding_window_view(x, pool_size, axis=(1, 2))[:, :: strides[0], :: strides[1]]
+    return reduce(windows, axis=(4, 5))
+
+
+class NumpyNet:
+    """
+    Minimal inference engine for sequential Keras models exported with `export_keras_model`.
+
+    Supports the layers used by small image classifiers: Conv2D, MaxPooling2D, AveragePooling2D, Flatten, Reshape, Dense, Dropout, Activation and BatchNormalization.
+    """
+
+    def __init__(self, input_shape: tuple[int, ...], layers: list[dict], weights: list[list[np.ndarray]]):
+        self.input_shape = tuple(input_shape)
+        self.layers = layers
+        self.weights = weights
+
+    @classmethod
+    def load(cls, file_path: str) -> 'NumpyNet':
+        with np.load(file_path, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            weights = [[data[f'layer{i}_w{j}'].astype(np.float32) for j in range(layer['weights'])] for i, layer in enumerate(spec['layers'])]
+        return cls(spec['input_shape'], spec['layers'], weights)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32).reshape((-1, *self.input_shape))
+
+        for layer, weights in zip(self.layers, self.weights, strict=True):
+            config = layer['config']
+            class_name = layer['class_name']
+
+            if class_name == 'Conv2D':
+                x = conv2d(x, weights[0], weights[1] if len(weights) > 1 else None, tuple(config['strides']), config['padding'])
+            elif class_name == 'MaxPooling2D':
+                x = pool2d(x, tuple(config['pool_size']), tuple(config['strides']), config['padding'], np.max)
+            elif class_name == 'AveragePooling2D':
+                x = pool2d(x, tuple(config['pool_size']), tuple(config['strides']), config['padding'], np.mean)
+            elif class_name == 'Flatten':
+                x = x.reshape((x.shape[0], -1))
+            elif class_name == 'Reshape':
+                x = x.reshape((x.shape[0], *config['target_shape']))
+            elif class_name == 'Dense':
+                x = x @ weights[0]
+                if len(weights) > 1:
+                    x = x + weights[1]
+            elif class_name == 'BatchNormalization':
+                gamma, beta, mean, variance = weights
+                x = (x - mean) / np.sqrt(variance + config['epsilon']) * gamma + beta
+            elif class_name in ['Dropout', 'InputLayer']:
+                pass
+            elif class_name != 'Activation':
+                raise ValueError(f'unsupported layer type: {class_name}')
+
+            if 'activation' in config:
+                x = ACTIVATIONS[config['activation']](x)
+
+        return x
+
+
+def export_keras_model(model, file_path: str) -> None:
+    """
+    Exports the weights and layer configuration of a sequential Keras model into a `.npz` file readable by `NumpyNet`.
+
+    Raises:
+        ValueError: If the model contains a layer or option `NumpyNet` can't evaluate.
+    """
+    layers = []
+    arrays = {}
+
+    for i, layer in enumerate(model.layers):
+        class_name = layer.__class__.__name__
+        config = layer.get_config()
+        exported_config = {}
+
+        if config.get('data_format', 'channels_last') != 'channels_last':
+            raise ValueError(f'{layer.name}: only channels_last is supported')
+
+        if class_name == 'Conv2D':
+            if tuple(config['dilation_rate']) != (1, 1) or config.get('groups', 1) != 1:
+                raise ValueError(f'{layer.name}: dilated and grouped convolutions are not supported')
+            exported_config = {'strides': config['strides'], 'padding': config['padding'], 'activation': config['activation']}
+        elif class_name in ['MaxPooling2D', 'AveragePooling2D']:
+            if class_name == 'AveragePooling2D' and config['padding'] != 'valid':
+                raise ValueError(f'{layer.name}: AveragePooling2D only supports padding="valid"')
+            exported_config = {'pool_size': config['pool_size'], 'strides': config['strides'] or config['pool_size'], 'padding': config['padding']}
+        elif class_name == 'Reshape':
+            exported_config = {'target_shape': config['target_shape']}
+        elif class_name in ['Dense', 'Activation']:
+            exported_config = {'activation': config['activation']}
+        elif class_name == 'BatchNormalization':
+            if not config['center'] or not config['scale']:
+                raise ValueError(f'{layer.name}: BatchNormalization without center and scale is not supported')
+            exported_config = {'epsilon': config['epsilon']}
+        elif class_name not in ['Flatten', 'Dropout', 'InputLayer']:
+            raise ValueError(f'{layer.name}: unsupported layer type {class_name}')
+
+        if exported_config.get('activation', 'linear') not in ACTIVATIONS:
+            raise ValueError(f'{layer.name}: unsupported activation {exported_config["activation"]}')
+
+        layer_weights = layer.get_weights()
+        for j, weight in enumerate(layer_weights):
+            arrays[f'layer{i}_w{j}'] = weight
+        layers.append({'class_name': class_name, 'config': exported_config, 'weights': len(layer_weights)})
+
+    spec = {'input_shape': list(model.input_shape[1:]), 'layers': layers}
+    np.savez(file_path, spec=np.array(json.dumps(spec)), **arrays)
@@ -0,0 +1,95 @@
+import math
+import random
+
+# KLL quantile sketch (Karnin, Lang, Liberty): a hierarchy of compactors, items at level h stand for 2^h of the added values
+# the number of stored items is bounded by about 3 * k independent of the number of added values, the rank error is about 1.7 / k
+
+
+class QuantileSketch:
+    """
+    Approximates quantiles of a stream of values in bounded memory.
+
+    Args:
+        k (int, optional): Capacity of the top compactor, controls the accuracy and size of the sketch.
+    """
+
+    def __init__(self, k: int = 64):
+        self.k = k
+        self.count = 0
+        self.compactors: list[list[float]] = [[]]
+
+    def __len__(self) -> int:
+        """Returns the number of values added to the sketch."""
+        return self.count
+
+    def get_capacity(self, level: int) -> int:
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.compactors) - level - 1)))
+
+    def get_size(self) -> int:
+        return sum(len(compactor) for compactor in self.compactors)
+
+    def get_max_size(self) -> int:
+        return sum(self.get_capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        if self.get_size() >= self.get_max_size():
+            self.compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Adds the values of another sketch (e.g. of another resolution or machine) to this sketch."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level] += compactor
+        self.count += other.count
+        while self.get_size() >= self.get_max_size():
+            self.compress()
+
+    def compress(self) -> None:
+        """Halves the first full compactor by promoting every second of its sorted items to the next level."""
+        for level, compactor in enumerate(self.compactors):
+            if len(compactor) >= self.get_capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                compactor.sort()
+                # an odd item stays at this level
+                kept = [compactor.pop()] if len(compactor) % 2 else []
+                self.compactors[level + 1] += compactor[random.getrandbits(1) :: 2]
+                self.compactors[level] = kept
+                return
+
+    def get_weighted_items(self) -> list[tuple[float, int]]:
+        """Returns the stored items with their weights sorted by value."""
+        return sorted((value, 1 << level) for level, compactor in enumerate(self.compactors) for value in compactor)
+
+    def quantile(self, q: float) -> float:
+        """Returns the approximate q-quantile (0 <= q <= 1) of the added values or -1 if the sketch is empty."""
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: list[float]) -> list[float]:
+        """Returns the approximate quantiles of the added values (-1 for each if the sketch is empty)."""
+        if not self.count:
+            return [-1 for _ in qs]
+        items = self.get_weighted_items()
+        total = sum(weight for _, weight in items)
+        result = []
+        for q in qs:
+            cumulative = 0
+            for value, weight in items:
+                cumulative += weight
+                if cumulative >= q * total:
+                    break
+            result.append(value)
+        return result
+
+    def to_dict(self) -> dict:
+        return {'k': self.k, 'count': self.count, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'QuantileSketch':
+        sketch = cls(data['k'])
+        sketch.count = data['count']
+        sketch.compactors = [list(compactor) for compactor in data['compactors']]
+        return sketch
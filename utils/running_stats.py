@@ -0,0 +1,55 @@
+import math
+from dataclasses import dataclass, field
+
+from utils.quantile_sketch import QuantileSketch
+
+# weight of the latest value in the exponentially weighted moving average, game updates change how fast playthroughs are, so recent wins count more
+EWMA_ALPHA = 0.3
+
+
+@dataclass(slots=True)
+class RunningStats:
+    """Aggregates of a stream of values (e.g. the win times of a playthrough) updated in O(1) per value."""
+
+    count: int = 0
+    mean: float = 0.0
+    # sum of squared differences from the mean (Welford)
+    m2: float = 0.0
+    ewma: float = 0.0
+    sketch: QuantileSketch = field(default_factory=lambda: QuantileSketch(32))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ewma = value if self.count == 1 else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * self.ewma
+        self.sketch.add(value)
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Adds the values of other (e.g. of another machine), which are assumed to be more recent than the values of this instance."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        # parallel variant of Welford (Chan et al.)
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        # the values of other weigh as much as if they were added one by one after the values of this instance
+        other_weight = 1 - (1 - EWMA_ALPHA) ** other.count
+        self.ewma = other.ewma if not self.count else other_weight * other.ewma + (1 - other_weight) * self.ewma
+        self.count = count
+        self.sketch.merge(other.sketch)
+
+    def get_variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def get_stddev(self) -> float:
+        return math.sqrt(self.get_variance())
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'ewma': self.ewma, 'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RunningStats':
+        return cls(data['count'], data['mean'], data['m2'], data['ewma'], QuantileSketch.from_dict(data['sketch']))
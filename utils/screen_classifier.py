@@ -0,0 +1,112 @@
+from collections import Counter
+from collections.abc import Hashable
+
+import numpy as np
+
+from utils.image import BoundingBox, RawImage, cut_image
+
+
+def sqdiff_normed(img: np.ndarray, reference: np.ndarray, reference_sq_sum: float) -> float:
+    """Equivalent of cv2.matchTemplate(img, reference, cv2.TM_SQDIFF_NORMED) for images of equal size (float32 inputs)."""
+    diff = img - reference
+    numerator = float(np.vdot(diff, diff))
+    denominator = float(np.sqrt(np.vdot(img, img) * reference_sq_sum))
+    # same handling of (near) zero denominators as OpenCV
+    return numerator / denominator if numerator < denominator else 1.0
+
+
+class ScreenClassifier:
+    """
+    Recognizes screens by comparing fixed areas of a screenshot to the same areas of reference screenshots.
+
+    Checks are ordered by how often each screen followed the previous screen so far and stop early on a confident match.
+    Before comparing pixels a lower bound of the difference is computed from the mean colors, references that can't match are skipped.
+    The previous screen and its likely successors (the provided successors plus every screen observed to follow it) are checked first.
+    A match among them is only accepted without checking the remaining references if it is confident, otherwise the remaining references are checked as well and the best match wins.
+
+    Args:
+        references (list[tuple[Hashable, RawImage, BoundingBox]]): Label, reference image cropped to the compared area and the compared area (inclusive) per screen.
+        threshold (float, optional): Maximum TM_SQDIFF_NORMED difference of a match.
+        confident_threshold (float, optional): Difference at or below which a match is accepted without checking the remaining references.
+        successors (dict[Hashable, list[Hashable]] | None, optional): Labels known to follow a label, extended by the observed transitions. Labels without entry or observed transition always get a full scan.
+    """
+
+    def __init__(self, references: list[tuple[Hashable, RawImage, BoundingBox]], threshold: float = 0.05, confident_threshold: float = 0.005, successors: dict[Hashable, list[Hashable]] | None = None):
+        self.labels = [label for label, _, _ in references]
+        self.areas = [tuple(area) for _, _, area in references]
+        self.crops = [crop.astype(np.float32) for _, crop, _ in references]
+        self.sq_sums = [float(np.vdot(crop, crop)) for crop in self.crops]
+        self.means = [crop.reshape(-1, crop.shape[-1]).mean(axis=0) for crop in self.crops]
+        self.threshold = threshold
+        self.confident_threshold = confident_threshold
+        self.successors = successors or {}
+        self.transitions: dict[Hashable, Counter] = {}
+        self.stats = {'classifications': 0, 'comparisons': 0, 'prefiltered': 0, 'fast_path_hits': 0, 'fast_path_misses': 0}
+
+    def get_order(self, previous: Hashable | None) -> list[int]:
+        """Returns reference indices, the previous screen first followed by screens in order of how often they followed it."""
+        counts = self.transitions.get(previous, Counter())
+        return sorted(range(len(self.labels)), key=lambda i: (self.labels[i] != previous, -counts[self.labels[i]], i))
+
+    def get_likely_successors(self, previous: Hashable | None) -> set[Hashable]:
+        """Returns the labels that followed previous so far or are known to follow it, empty if there are none."""
+        successors = {*self.successors.get(previous, []), *self.transitions.get(previous, Counter())}
+        return {previous, *successors} if successors else set()
+
+    def _scan(self, screenshot: RawImage, indices: list[int]) -> tuple[int | None, float | None]:
+        """Returns the index and difference of the best matching reference among indices or (None, None) if none matches."""
+        best_index = None
+        best_diff = None
+
+        for i in indices:
+            img = cut_image(screenshot, self.areas[i]).astype(np.float32)
+
+            # lower bound of the squared difference by the difference of the mean colors
+            mean_diff = img.reshape(-1, img.shape[-1]).mean(axis=0) - self.means[i]
+            lower_bound = img.size / img.shape[-1] * float(np.vdot(mean_diff, mean_diff))
+            denominator = float(np.sqrt(np.vdot(img, img) * self.sq_sums[i]))
+            if denominator > 0 and lower_bound / denominator >= min(self.threshold, best_diff if best_diff is not None else self.threshold):
+                self.stats['prefiltered'] += 1
+                continue
+
+            self.stats['comparisons'] += 1
+            diff = sqdiff_normed(img, self.crops[i], self.sq_sums[i])
+            if diff < self.threshold and (best_diff is None or diff < best_diff):
+                best_diff = diff
+                best_index = i
+                if diff <= self.confident_threshold:
+                    break
+
+        return best_index, best_diff
+
+    def classify(self, screenshot: RawImage, previous: Hashable | None = None, default: Hashable | None = None) -> Hashable | None:
+        """
+        Returns the label of the best matching reference with a difference below the threshold or default if none matches.
+
+        Args:
+            screenshot (RawImage): The BGR screenshot, only the compared areas have to be up to date.
+            previous (Hashable | None, optional): Label returned for the previous screenshot, used for ordering the checks and learning transitions.
+            default (Hashable | None, optional): Returned if no reference matches.
+        """
+        self.stats['classifications'] += 1
+        order = self.get_order(previous)
+
+        likely = self.get_likely_successors(previous)
+        if likely:
+            best_index, best_diff = self._scan(screenshot, [i for i in order if self.labels[i] in likely])
+            if best_index is not None and best_diff <= self.confident_threshold:
+                self.stats['fast_path_hits'] += 1
+            else:
+                # no confident match among the likely screens, the remaining screens may match better
+                self.stats['fast_path_misses'] += 1
+                other_index, other_diff = self._scan(screenshot, [i for i in order if self.labels[i] not in likely])
+                if other_index is not None and (best_index is None or other_diff < best_diff):
+                    best_index = other_index
+        else:
+            best_index, _ = self._scan(screenshot, order)
+
+        best_label = self.labels[best_index] if best_index is not None else default
+        if previous is not None:
+            self.transitions.setdefault(previous, Counter())[best_label] += 1
+
+        return best_label
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from os.path import exists
+
+from utils.quantile_sketch import QuantileSketch
+from utils.running_stats import RunningStats
+from utils.utils import load_json_file
+
+# journal layout (JSON lines): a header {"base": <hash of the snapshot the events apply to>} followed by one event per line
+# after compaction the snapshot changes and the header of the journal no longer matches, so a journal that was already compacted into the snapshot (crash before it was reset) is never applied twice
+
+# number of most recent win times kept per gamemode, older ones are only represented by the win time sketch and the win time stats
+# win_time_stats holds the running aggregates (count, mean, variance, EWMA) of all win times of a file per gamemode across all resolutions
+MAX_WIN_TIMES = 100
+
+
+def get_win_time_sketch(mode_stats: dict) -> QuantileSketch:
+    """Returns the sketch of all win times of a gamemode entry of the playthrough stats, built from win_times for entries without one."""
+    if mode_stats.get('win_time_sketch'):
+        return QuantileSketch.from_dict(mode_stats['win_time_sketch'])
+    sketch = QuantileSketch()
+    for time in mode_stats['win_times']:
+        sketch.add(time)
+    return sketch
+
+
+def get_win_time_stats(file_stats: dict, gamemode: str) -> RunningStats:
+    """Returns the running aggregates of all win times of a playthrough in a gamemode across all resolutions, rebuilt from win_times for entries without them (stats written by older versions)."""
+    if gamemode in file_stats.get('win_time_stats', {}):
+        return RunningStats.from_dict(file_stats['win_time_stats'][gamemode])
+    stats = RunningStats()
+    for resolution, resolution_stats in file_stats.items():
+        if resolution not in ['version', 'win_time_stats'] and gamemode in resolution_stats:
+            for time in resolution_stats[gamemode]['win_times']:
+                stats.add(time)
+    return stats
+
+
+def apply_stats_event(stats: dict, event: dict) -> None:
+    """
+    Applies a journal event to playthrough stats (the content of playthrough_stats.json).
+
+    Args:
+        stats (dict): The playthrough stats, modified in place.
+        event (dict): Either {'type': 'validation', 'file', 'resolution', 'result'} or {'type': 'game', 'file', 'resolution', 'gamemode', 'win', 'time', 'version'}.
+    """
+    file_stats = stats.setdefault(event['file'], {})
+    resolution_stats = file_stats.setdefault(event['resolution'], {'validation_result': False})
+
+    if event['type'] == 'validation':
+        resolution_stats['validation_result'] = event['result']
+    elif event['type'] == 'game':
+        mode_stats = resolution_stats.setdefault(event['gamemode'], {'attempts': 0, 'wins': 0, 'win_times': []})
+        mode_stats['attempts'] += 1
+        if event['win']:
+            mode_stats['wins'] += 1
+            file_stats['version'] = event['version']
+            sketch = get_win_time_sketch(mode_stats)
+            sketch.add(event['time'])
+            mode_stats['win_time_sketch'] = sketch.to_dict()
+            win_time_stats = get_win_time_stats(file_stats, event['gamemode'])
+            win_time_stats.add(event['time'])
+            file_stats.setdefault('win_time_stats', {})[event['gamemode']] = win_time_stats.to_dict()
+            mode_stats['win_times'] = [*mode_stats['win_times'], event['time']][-MAX_WIN_TIMES:]
+
+
+class StatsJournal:
+    """
+    Playthrough stats stored as a snapshot (playthrough_stats.json) and an append-only journal of the changes since the snapshot was written.
+
+    Recording a game or validation appends a single line instead of rewriting the snapshot. Every compact_after events and on load the journal is compacted into the snapshot, which is replaced atomically.
+
+    Args:
+        snapshot_path (str): Path of the snapshot.
+        journal_path (str | None, optional): Path of the journal, defaults to the snapshot path with the extension .journal.jsonl.
+        compact_after (int, optional): Number of appended events after which the journal is compacted.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str | None = None, compact_after: int = 50):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + '.journal.jsonl'
+        self.compact_after = compact_after
+        self.stats: dict = {}
+        self.pending_events = 0
+        self.journal_is_current = False
+
+    def get_snapshot_hash(self) -> str | None:
+        if not exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, 'rb') as fp:
+            return hashlib.blake2b(fp.read(), digest_size=16).hexdigest()
+
+    def read_journal(self) -> list[dict]:
+        """Returns the events of the journal that apply to the current snapshot."""
+        return list(self.iter_journal())
+
+    def iter_journal(self, check_base: bool = True) -> Iterator[dict]:
+        """
+        Yields the events of the journal one at a time.
+
+        Args:
+            check_base (bool, optional): Only yield events if the journal applies to the current snapshot. Disable for journals without their snapshot.
+        """
+        self.journal_is_current = False
+        if not exists(self.journal_path):
+            return
+
+        with open(self.journal_path, 'r') as fp:
+            try:
+                if json.loads(fp.readline()).get('base') != self.get_snapshot_hash() and check_base:
+                    return
+            except json.JSONDecodeError:
+                return
+            self.journal_is_current = True
+
+            for line in fp:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # last line of a write interrupted by a crash
+                    return
+
+    def reset_journal(self) -> None:
+        """Starts an empty journal for the current snapshot."""
+        with open(self.journal_path + '.tmp', 'w') as fp:
+            fp.write(json.dumps({'base': self.get_snapshot_hash()}) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(self.journal_path + '.tmp', self.journal_path)
+        self.pending_events = 0
+        self.journal_is_current = True
+
+    def load(self, compact: bool = True) -> dict:
+        """Loads the snapshot, replays the journal and compacts it if it contained events (and compact is set). Returns the stats, which are updated in place by append."""
+        self.stats.clear()
+        self.stats.update(load_json_file(self.snapshot_path))
+
+        events = self.read_journal()
+        for event in events:
+            apply_stats_event(self.stats, event)
+
+        if events and compact:
+            self.compact()
+        return self.stats
+
+    def append(self, event: dict) -> None:
+        """Applies an event to the stats and appends it to the journal."""
+        apply_stats_event(self.stats, event)
+
+        if not self.journal_is_current:
+            self.reset_journal()
+        with open(self.journal_path, 'a') as fp:
+            fp.write(json.dumps(event) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        self.pending_events += 1
+        if self.pending_events >= self.compact_after:
+            self.compact()
+
+    def compact(self) -> None:
+        """Writes the stats to the snapshot (atomically) and resets the journal."""
+        with open(self.snapshot_path + '.tmp', 'w') as fp:
+            json.dump(self.stats, fp, indent=4)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(self.snapshot_path + '.tmp', self.snapshot_path)
+        self.reset_journal()
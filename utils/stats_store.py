@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from utils.quantile_sketch import QuantileSketch
+from utils.running_stats import RunningStats
+from utils.stats_journal import MAX_WIN_TIMES, get_win_time_sketch, get_win_time_stats
+
+# playthrough stats (the content of playthrough_stats.json) as sqlite tables, so queries over all files, resolutions or gamemodes are single statements
+# playthrough_stats.json (and its journal, see utils.stats_journal) stays the source of truth, the database is rebuilt from it whenever the snapshot changed
+# like in playthrough_stats.json, win_times only holds the most recent MAX_WIN_TIMES win times per resolution and gamemode, averages are taken from the aggregates of all win times (win_time_stats)
+
+# increase when the schema changes, databases of other versions are recreated
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS versions (file TEXT PRIMARY KEY, version REAL);
+CREATE TABLE IF NOT EXISTS validations (file TEXT NOT NULL, resolution TEXT NOT NULL, result INTEGER, PRIMARY KEY (file, resolution));
+CREATE TABLE IF NOT EXISTS attempts (file TEXT NOT NULL, resolution TEXT NOT NULL, gamemode TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, wins INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (file, resolution, gamemode));
+CREATE TABLE IF NOT EXISTS win_times (file TEXT NOT NULL, resolution TEXT NOT NULL, gamemode TEXT NOT NULL, time REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS win_times_file_resolution_gamemode ON win_times (file, resolution, gamemode);
+CREATE INDEX IF NOT EXISTS win_times_file_gamemode ON win_times (file, gamemode);
+CREATE TABLE IF NOT EXISTS win_time_sketches (file TEXT NOT NULL, resolution TEXT NOT NULL, gamemode TEXT NOT NULL, sketch TEXT NOT NULL, PRIMARY KEY (file, resolution, gamemode));
+CREATE TABLE IF NOT EXISTS win_time_stats (file TEXT NOT NULL, gamemode TEXT NOT NULL, stats TEXT NOT NULL, PRIMARY KEY (file, gamemode));
+"""
+
+
+class StatsStore:
+    """
+    Playthrough stats stored in a sqlite database.
+
+    Args:
+        db_path (str): Path of the database file, created if it doesn't exist.
+        read_only (bool, optional): Opens an existing database (e.g. of another machine) without modifying it. Raises a ValueError if it has a different schema version.
+    """
+
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.db_path = db_path
+        if read_only:
+            self.connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=30, isolation_level=None)
+            if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                self.connection.close()
+                raise ValueError(f'{db_path}: unsupported stats store version')
+            self.win_time_stats = self.load_win_time_stats()
+            return
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            with self.transaction():
+                for (table,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                    self.connection.execute(f'DROP TABLE {table}')
+                self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.connection.executescript(SCHEMA)
+        # running aggregates of the win times across all resolutions by (file, gamemode), kept in memory for the rankings
+        self.win_time_stats: dict[tuple[str, str], RunningStats] = self.load_win_time_stats()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_source(self) -> str | None:
+        """Returns the identifier of the stats the database was imported from."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return row[0] if row else None
+
+    def import_json(self, stats: dict, source: str | None = None) -> bool:
+        """
+        Replaces the content of the database by the given playthrough stats.
+
+        Args:
+            stats (dict): The playthrough stats in the format of playthrough_stats.json.
+            source (str | None, optional): Identifier of the stats (e.g. a hash of the file). If the database already contains stats from the same source, nothing is imported.
+
+        Returns:
+            bool: Whether the stats were imported.
+        """
+        versions = []
+        validations = []
+        attempts = []
+        win_times = []
+        win_time_sketches = []
+        win_time_stats: dict[tuple[str, str], RunningStats] = {}
+        for file, file_stats in stats.items():
+            if 'version' in file_stats:
+                versions.append((file, file_stats['version']))
+            for resolution, resolution_stats in file_stats.items():
+                if not re.fullmatch(r'\d+x\d+', resolution) or not isinstance(resolution_stats, dict):
+                    continue
+                if 'validation_result' in resolution_stats:
+                    validations.append((file, resolution, resolution_stats['validation_result']))
+                for gamemode, mode_stats in resolution_stats.items():
+                    if gamemode == 'validation_result':
+                        continue
+                    attempts.append((file, resolution, gamemode, mode_stats['attempts'], mode_stats['wins']))
+                    win_times += [(file, resolution, gamemode, time) for time in mode_stats['win_times']]
+                    win_time_sketches.append((file, resolution, gamemode, json.dumps(get_win_time_sketch(mode_stats).to_dict())))
+                    if mode_stats['wins'] and (file, gamemode) not in win_time_stats:
+                        win_time_stats[(file, gamemode)] = get_win_time_stats(file_stats, gamemode)
+
+        # entries of older versions without win_time_stats whose win_times are empty
+        win_time_stats = {key: stats for key, stats in win_time_stats.items() if stats.count}
+
+        # the check happens inside the write transaction, so processes starting at the same time import only once
+        with self.transaction():
+            if source is not None and self.get_source() == source:
+                return False
+            for table in ['versions', 'validations', 'attempts', 'win_times', 'win_time_sketches', 'win_time_stats']:
+                self.connection.execute(f'DELETE FROM {table}')
+            self.connection.executemany('INSERT INTO versions VALUES (?, ?)', versions)
+            self.connection.executemany('INSERT INTO validations VALUES (?, ?, ?)', validations)
+            self.connection.executemany('INSERT INTO attempts VALUES (?, ?, ?, ?, ?)', attempts)
+            self.connection.executemany('INSERT INTO win_times VALUES (?, ?, ?, ?)', win_times)
+            self.connection.executemany('INSERT INTO win_time_sketches VALUES (?, ?, ?, ?)', win_time_sketches)
+            self.connection.executemany('INSERT INTO win_time_stats VALUES (?, ?, ?)', [(*key, json.dumps(stats.to_dict())) for key, stats in win_time_stats.items()])
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+        self.win_time_stats = win_time_stats
+        return True
+
+    def export_json(self) -> dict:
+        """Returns the content of the database in the format of playthrough_stats.json."""
+        return dict(self.iter_json())
+
+    def iter_json(self) -> Iterator[tuple[str, dict]]:
+        """Yields the stats of one playthrough file at a time in the format of playthrough_stats.json, so only a single entry is kept in memory."""
+        files = [row[0] for row in self.connection.execute('SELECT file FROM validations UNION SELECT file FROM attempts UNION SELECT file FROM versions')]
+        for file in files:
+            yield file, self.get_json_entry(file)
+
+    def get_json_entry(self, file: str) -> dict:
+        """Returns the stats of a playthrough file in the format of playthrough_stats.json."""
+        entry = {}
+        for resolution, result in self.connection.execute('SELECT resolution, result FROM validations WHERE file = ? ORDER BY rowid', (file,)):
+            entry.setdefault(resolution, {})['validation_result'] = None if result is None else bool(result)
+        for resolution, gamemode, attempts, wins in self.connection.execute('SELECT resolution, gamemode, attempts, wins FROM attempts WHERE file = ? ORDER BY rowid', (file,)):
+            entry.setdefault(resolution, {})[gamemode] = {'attempts': attempts, 'wins': wins, 'win_times': []}
+        for resolution, gamemode, time in self.connection.execute('SELECT resolution, gamemode, time FROM win_times WHERE file = ? ORDER BY rowid', (file,)):
+            entry[resolution][gamemode]['win_times'].append(time)
+        for resolution, gamemode, sketch in self.connection.execute('SELECT resolution, gamemode, sketch FROM win_time_sketches WHERE file = ?', (file,)):
+            entry[resolution][gamemode]['win_time_sketch'] = json.loads(sketch)
+        for (version,) in self.connection.execute('SELECT version FROM versions WHERE file = ?', (file,)):
+            entry['version'] = version
+        for gamemode, stats in self.connection.execute('SELECT gamemode, stats FROM win_time_stats WHERE file = ?', (file,)):
+            entry.setdefault('win_time_stats', {})[gamemode] = json.loads(stats)
+        return entry
+
+    def apply_event(self, event: dict) -> None:
+        """Applies an event of the stats journal (see utils.stats_journal.apply_stats_event) to the database."""
+        with self.transaction():
+            self.connection.execute('INSERT OR IGNORE INTO validations VALUES (?, ?, 0)', (event['file'], event['resolution']))
+            if event['type'] == 'validation':
+                self.connection.execute('UPDATE validations SET result = ? WHERE file = ? AND resolution = ?', (event['result'], event['file'], event['resolution']))
+            elif event['type'] == 'game':
+                key = (event['file'], event['resolution'], event['gamemode'])
+                self.connection.execute('INSERT OR IGNORE INTO attempts VALUES (?, ?, ?, 0, 0)', key)
+                self.connection.execute('UPDATE attempts SET attempts = attempts + 1, wins = wins + ? WHERE file = ? AND resolution = ? AND gamemode = ?', (int(event['win']), *key))
+                if event['win']:
+                    self.connection.execute('INSERT INTO win_times VALUES (?, ?, ?, ?)', (*key, event['time']))
+                    self.connection.execute('DELETE FROM win_times WHERE rowid IN (SELECT rowid FROM win_times WHERE file = ? AND resolution = ? AND gamemode = ? ORDER BY rowid DESC LIMIT -1 OFFSET ?)', (*key, MAX_WIN_TIMES))
+                    row = self.connection.execute('SELECT sketch FROM win_time_sketches WHERE file = ? AND resolution = ? AND gamemode = ?', key).fetchone()
+                    sketch = QuantileSketch.from_dict(json.loads(row[0])) if row else QuantileSketch()
+                    sketch.add(event['time'])
+                    self.connection.execute('INSERT OR REPLACE INTO win_time_sketches VALUES (?, ?, ?, ?)', (*key, json.dumps(sketch.to_dict())))
+                    self.connection.execute('INSERT OR REPLACE INTO versions VALUES (?, ?)', (event['file'], event['version']))
+                    stats = self.win_time_stats.setdefault((event['file'], event['gamemode']), RunningStats())
+                    stats.add(event['time'])
+                    self.connection.execute('INSERT OR REPLACE INTO win_time_stats VALUES (?, ?, ?)', (event['file'], event['gamemode'], json.dumps(stats.to_dict())))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Runs the statements of the with block in a single write transaction."""
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def is_validated(self, file: str, resolution: str) -> bool:
+        """Returns whether a playthrough was validated successfully for a resolution."""
+        row = self.connection.execute('SELECT result FROM validations WHERE file = ? AND resolution = ?', (file, resolution)).fetchone()
+        return bool(row and row[0])
+
+    def get_validated_resolutions(self, file: str) -> list[str]:
+        """Returns the resolutions a playthrough was validated successfully for."""
+        return [row[0] for row in self.connection.execute('SELECT resolution FROM validations WHERE file = ? AND result ORDER BY rowid', (file,))]
+
+    def load_win_time_stats(self) -> dict[tuple[str, str], RunningStats]:
+        return {(file, gamemode): RunningStats.from_dict(json.loads(stats)) for file, gamemode, stats in self.connection.execute('SELECT file, gamemode, stats FROM win_time_stats')}
+
+    def get_win_time_stats(self, file: str, gamemode: str) -> RunningStats | None:
+        """Returns the running aggregates of the win times of a playthrough in a gamemode across all resolutions or None if it wasn't won yet."""
+        return self.win_time_stats.get((file, gamemode))
+
+    def get_average_win_time(self, file: str, gamemode: str) -> float:
+        """Returns the average of all win times of a playthrough in a gamemode across all resolutions or -1 if it wasn't won yet."""
+        stats = self.win_time_stats.get((file, gamemode))
+        return stats.mean if stats else -1
+
+    def get_recent_win_time(self, file: str, gamemode: str) -> float:
+        """Returns the exponentially weighted average win time of a playthrough in a gamemode (recent wins weigh more) or -1 if it wasn't won yet."""
+        stats = self.win_time_stats.get((file, gamemode))
+        return stats.ewma if stats else -1
+
+    def get_average_win_times(self) -> dict[tuple[str, str], float]:
+        """Returns the average of all win times across all resolutions of all won playthroughs by (file, gamemode)."""
+        return {key: stats.mean for key, stats in self.win_time_stats.items()}
+
+    def get_win_rates(self) -> dict[tuple[str, str], tuple[int, int]]:
+        """Returns (attempts, wins) across all resolutions by (file, gamemode)."""
+        return {(file, gamemode): (attempts, wins) for file, gamemode, attempts, wins in self.connection.execute('SELECT file, gamemode, SUM(attempts), SUM(wins) FROM attempts GROUP BY file, gamemode')}
+
+    def get_win_time_sketch(self, file: str, gamemode: str, resolution: str | None = None) -> QuantileSketch:
+        """Returns the sketch of the win times of a playthrough in a gamemode, merged across all resolutions if no resolution is given."""
+        sketch = QuantileSketch()
+        query = 'SELECT sketch FROM win_time_sketches WHERE file = ? AND gamemode = ?' + (' AND resolution = ?' if resolution else '')
+        for (data,) in self.connection.execute(query, (file, gamemode, resolution) if resolution else (file, gamemode)):
+            sketch.merge(QuantileSketch.from_dict(json.loads(data)))
+        return sketch
+
+    def get_win_time_percentiles(self, file: str, gamemode: str, percentiles: tuple[float, ...] = (50, 90, 99), resolution: str | None = None) -> dict[float, float]:
+        """Returns the approximate win time percentiles of a playthrough in a gamemode (-1 if it wasn't won yet)."""
+        return dict(zip(percentiles, self.get_win_time_sketch(file, gamemode, resolution).quantiles([p / 100 for p in percentiles])))
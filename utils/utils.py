@@ -1,10 +1,17 @@
+import copy
+import functools
+import hashlib
 import json
+import os
 import re
 import time
+from collections.abc import Iterator
 from os.path import exists
+from typing import Any
 
 import ahk
 import pyautogui
+from pydantic import BaseModel, RootModel
 
 
 def tuple_to_str(tup: tuple) -> str:
@@ -43,6 +50,94 @@ def scale_string_coordinate_pairs(raw_str: str, native_resolution: tuple[int, in
     return re.sub(r'(?P<x>\d+), (?P<y>\d+)', scale_match, raw_str)
 
 
+def scale_coordinates(value: Any, native_resolution: tuple[int, int], resolution: tuple[int, int]) -> Any:
+    """
+    Scales all coordinates in a nested structure of dicts, lists and tuples from the native to the target resolution.
+
+    Integers in a list or tuple are treated as consecutive x, y pairs (e. g. points and rectangles), all other values are returned unchanged.
+    Pydantic models are walked field by field and returned as scaled copies of the same model.
+    Equivalent to scale_string_coordinate_pairs on the JSON representation without the string round trip.
+
+    Args:
+        value (Any): The structure to scale, e. g. the image areas of a resolution.
+        native_resolution (tuple[int, int]): The original resolution of the coordinates.
+        resolution (tuple[int, int]): The target resolution to scale to.
+    """
+    if isinstance(value, RootModel):
+        return type(value)(scale_coordinates(value.root, native_resolution, resolution))
+    if isinstance(value, BaseModel):
+        return value.model_copy(update={name: scale_coordinates(getattr(value, name), native_resolution, resolution) for name in type(value).model_fields})
+    if isinstance(value, dict):
+        return {key: scale_coordinates(item, native_resolution, resolution) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+            # a trailing unpaired integer is kept like scale_string_coordinate_pairs does
+            pairs_end = len(value) - len(value) % 2
+            scaled = [round(item * resolution[i % 2] / native_resolution[i % 2]) if i < pairs_end else item for i, item in enumerate(value)]
+        else:
+            scaled = [scale_coordinates(item, native_resolution, resolution) for item in value]
+        return type(value)(scaled)
+    return value
+
+
+SCALED_CACHE_DIR = 'cache/scaled'
+
+
+def prune_scaled_cache(name: str, source_hash: str):
+    """Removes the cached scaled entries of a source file name (e. g. "image_areas") that were made from another version of the file."""
+    if not exists(SCALED_CACHE_DIR):
+        return
+
+    for file_name in os.listdir(SCALED_CACHE_DIR):
+        matches = re.fullmatch(re.escape(name) + r'_\d+x\d+_([0-9a-f]+)\.json', file_name)
+        if matches and matches.group(1) != source_hash:
+            os.remove(f'{SCALED_CACHE_DIR}/{file_name}')
+
+
+@functools.lru_cache(maxsize=32)
+def _get_for_resolution(file_path: str, mtime_ns: int, resolution: tuple[int, int], native_resolution: tuple[int, int], model_cls: type[RootModel] | None) -> Any:
+    """Uncopied result of get_for_resolution, mtime_ns is only part of the memo key so a changed file is reloaded."""
+    with open(file_path, 'rb') as file:
+        raw = file.read()
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    source_hash = hashlib.blake2b(raw, digest_size=8).hexdigest()
+    cache_file = f'{SCALED_CACHE_DIR}/{name}_{create_resolution_string(resolution)}_{source_hash}.json'
+    if exists(cache_file):
+        return load_json_file(cache_file)
+
+    entries = model_cls.model_validate_json(raw).root if model_cls else json.loads(raw)
+    if create_resolution_string(resolution) in entries:
+        entry = entries[create_resolution_string(resolution)]
+        return entry.model_dump(mode='json') if isinstance(entry, BaseModel) else entry
+
+    scaled = scale_coordinates(entries[create_resolution_string(native_resolution)], native_resolution, resolution)
+    if isinstance(scaled, BaseModel):
+        scaled = scaled.model_dump(mode='json')
+    prune_scaled_cache(name, source_hash)
+    os.makedirs(SCALED_CACHE_DIR, exist_ok=True)
+    save_json_file(cache_file, scaled)
+    return scaled
+
+
+def get_for_resolution(file_path: str, resolution: tuple[int, int], native_resolution: tuple[int, int] = (2560, 1440), model_cls: type[RootModel] | None = None) -> Any:
+    """
+    Returns the entry for a resolution of a JSON file keyed by resolution strings (e. g. image_areas.json).
+
+    If the file has no entry for the resolution the entry of the native resolution is scaled using scale_coordinates.
+    Scaled entries are memoized in cache/scaled keyed by the hash of the file and the resolution, a changed file is rescaled and its outdated entries are removed.
+    Within a process results are additionally memoized by path, modification time and resolution, each call returns its own copy.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        resolution (tuple[int, int]): The target resolution.
+        native_resolution (tuple[int, int], optional): The resolution to scale from.
+        model_cls (type[RootModel] | None, optional): Typed model of the whole file (e. g. ImageAreas), the file is validated and the typed entry is scaled if provided.
+    """
+    result = _get_for_resolution(file_path, os.stat(file_path).st_mtime_ns, tuple(resolution), tuple(native_resolution), model_cls)
+    return copy.deepcopy(result)
+
+
 _last_line_rewrite = False
 
 
@@ -90,6 +185,67 @@ def load_json_file(file_path: str, check_exists: bool = True, default: dict = {}
         return json.load(file)
 
 
+def iter_json_object_items(file_path: str, chunk_size: int = 1 << 16) -> Iterator[tuple[str, Any]]:
+    """
+    Yields the key-value pairs of a JSON file containing an object without loading the whole file.
+    Args:
+        file_path (str): The path to the JSON file.
+        chunk_size (int, optional): Number of characters read at once.
+    Returns:
+        Iterator[tuple[str, Any]]: The keys and the parsed values of the top level object, only one value is kept in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as file:
+        buffer = ''
+
+        def read_more() -> bool:
+            nonlocal buffer
+            chunk = file.read(chunk_size)
+            buffer += chunk
+            return bool(chunk)
+
+        def next_char() -> str:
+            nonlocal buffer
+            buffer = buffer.lstrip()
+            while not buffer:
+                if not read_more():
+                    raise ValueError(f'{file_path}: unexpected end of file')
+                buffer = buffer.lstrip()
+            return buffer[0]
+
+        def expect(chars: str) -> str:
+            nonlocal buffer
+            char = next_char()
+            if char not in chars:
+                raise ValueError(f'{file_path}: expected one of {chars!r}, found {char!r}')
+            buffer = buffer[1:]
+            return char
+
+        def decode() -> Any:
+            nonlocal buffer
+            next_char()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer)
+                    # a value ending with the buffer (e.g. a number) may continue in the next chunk
+                    if end < len(buffer) or not read_more():
+                        buffer = buffer[end:]
+                        return value
+                except json.JSONDecodeError:
+                    if not read_more():
+                        raise
+
+        expect('{')
+        if next_char() == '}':
+            return
+        while True:
+            key = decode()
+            expect(':')
+            yield key, decode()
+            if expect(',}') == '}':
+                return
+
+
 def save_json_file(file_path: str, data: dict):
     """
     Saves a dictionary to a JSON file at the specified file path.
@@ -0,0 +1,53 @@
+import os
+import re
+import sys
+from os.path import exists
+
+from utils.quantile_sketch import QuantileSketch
+from utils.stats_journal import StatsJournal, get_win_time_sketch
+
+# prints win time percentiles per map and gamemode. the win time sketches of all given stats files (e.g. of several machines) and resolutions are merged
+
+argv = sys.argv
+stats_files = []
+gamemode_filter = None
+resolution_filter = None
+percentiles = [50, 90, 99]
+
+i_arg = 1
+while i_arg < len(argv):
+    if argv[i_arg] == '-g' and i_arg + 1 < len(argv):
+        gamemode_filter = argv[i_arg + 1]
+        i_arg += 2
+    elif argv[i_arg] == '-r' and i_arg + 1 < len(argv) and re.fullmatch(r'\d+x\d+', argv[i_arg + 1]):
+        resolution_filter = argv[i_arg + 1]
+        i_arg += 2
+    elif argv[i_arg] == '-p' and i_arg + 1 < len(argv) and re.fullmatch(r'\d+(\.\d+)?(,\d+(\.\d+)?)*', argv[i_arg + 1]):
+        percentiles = [float(x) for x in argv[i_arg + 1].split(',')]
+        i_arg += 2
+    elif argv[i_arg].startswith('-') or not exists(argv[i_arg]):
+        print('Usage: py ' + argv[0] + ' [<stats files...>] [-g <gamemode>] [-r <resolution(e. g. 2560x1440)>] [-p <percentiles(e. g. 50,90,99)>]')
+        exit()
+    else:
+        stats_files.append(argv[i_arg])
+        i_arg += 1
+
+sketches: dict[tuple[str, str], QuantileSketch] = {}
+for stats_file in stats_files or ['playthrough_stats.json']:
+    # includes events in the journal of the file that weren't compacted yet, the file itself isn't modified
+    stats = StatsJournal(stats_file).load(compact=False)
+    for file, file_stats in stats.items():
+        map_name = os.path.basename(file).split('#')[0]
+        for resolution, resolution_stats in file_stats.items():
+            if not re.fullmatch(r'\d+x\d+', resolution) or (resolution_filter and resolution != resolution_filter):
+                continue
+            for gamemode, mode_stats in resolution_stats.items():
+                if gamemode == 'validation_result' or (gamemode_filter and gamemode != gamemode_filter) or not mode_stats['wins']:
+                    continue
+                sketches.setdefault((map_name, gamemode), QuantileSketch()).merge(get_win_time_sketch(mode_stats))
+
+columns = ['map', 'gamemode', 'wins', *[f'p{p:g}' for p in percentiles]]
+rows = [[map_name, gamemode, str(len(sketch)), *[f'{value:.0f}s' for value in sketch.quantiles([p / 100 for p in percentiles])]] for (map_name, gamemode), sketch in sorted(sketches.items())]
+widths = [max(len(row[i]) for row in [columns, *rows]) for i in range(len(columns))]
+for row in [columns, *rows]:
+    print('  '.join(value.ljust(width) if i < 2 else value.rjust(width) for i, (value, width) in enumerate(zip(row, widths))))